@@ -0,0 +1,90 @@
+"""
+Micro-benchmark of stop-word filtering in data_chunk_process.
+
+Compares the original per-chunk filtering, which rebuilt the stop-word set
+for every chunk, with the batch API in this process and on a process pool.
+
+Usage:
+    python -m ragctl.benchmark.chunk_process [--chunks 5000] [--workers 4]
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List
+import argparse
+import multiprocessing
+import random
+import time
+from nltk.tokenize import word_tokenize
+from nltk.corpus import stopwords
+from ragctl.data_chunk_process.chunk_process import DataChunkProcess, _ensure_nltk_data
+
+WORDS = ("the document describes a process for the configuration of storage and network "
+         "services in which each node of the cluster is assigned to one of several zones "
+         "and the operator should verify that replication is enabled before it is used").split()
+
+def synthetic_chunks(count: int, chunk_size: int = 500, seed: int = 0) -> List[str]:
+    """Generate chunks of roughly chunk_size characters of English-like text"""
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(count):
+        words = []
+        length = 0
+        while length < chunk_size:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        chunks.append(" ".join(words).capitalize() + ".")
+    return chunks
+
+def _legacy_filter(chunks: List[str]) -> List[str]:
+    # The original DataChunkProcess.process, once per chunk
+    filtered_texts = []
+    for chunk in chunks:
+        tokens = word_tokenize(chunk)
+        stop_words = set(stopwords.words('english'))
+        filtered_texts.append(' '.join(word for word in tokens if word.lower() not in stop_words))
+    return filtered_texts
+
+def _batch_filter(chunks: List[str]) -> List[str]:
+    return [result["filtered_text"] for result in DataChunkProcess.process_batch(chunks)]
+
+def _measure(run: Callable[[List[str]], List[str]], chunks: List[str]) -> float:
+    start = time.perf_counter()
+    run(chunks)
+    return len(chunks) / (time.perf_counter() - start)
+
+def run_benchmark(chunk_count: int = 5000, workers: int = 4) -> Dict[str, float]:
+    """
+    Args:
+        chunk_count (int): Number of synthetic 500-character chunks.
+        workers (int): Worker processes for the process pool variant.
+    Returns:
+        Dict[str, float]: Chunks per second of each variant.
+    """
+    _ensure_nltk_data()
+    chunks = synthetic_chunks(chunk_count)
+    results = {
+        "per_chunk": _measure(_legacy_filter, chunks),
+        "batch": _measure(_batch_filter, chunks),
+    }
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            # Warm the workers up so start-up is not measured
+            list(DataChunkProcess.process_batch(chunks[:workers * 2], executor, batch_size=1))
+            results[f"batch_{workers}_workers"] = _measure(
+                lambda texts: [result["filtered_text"] for result in DataChunkProcess.process_batch(texts, executor)],
+                chunks)
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark stop-word filtering throughput.")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    results = run_benchmark(args.chunks, args.workers)
+    baseline = results["per_chunk"]
+    for name, chunks_per_second in results.items():
+        print(f"{name:>20}: {chunks_per_second:10.0f} chunks/s  ({chunks_per_second / baseline:.1f}x)")
+
+if __name__ == "__main__":
+    main()
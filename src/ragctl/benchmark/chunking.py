@@ -0,0 +1,94 @@
+"""
+Benchmark of the chunking strategies.
+
+Splits the same synthetic pages with each strategy and compares the chunk
+count, the chunk sizes, the split throughput and the embedding requests the
+chunks take. The token strategy needs a tokenizer.json, such as the one of
+the ONNX embedding model.
+
+Usage:
+    python -m ragctl.benchmark.chunking [--pages 200] [--page-kb 4] [--batch-size 32] [--tokenizer PATH]
+"""
+
+from typing import Dict, List, Optional
+import argparse
+import math
+import random
+import time
+from ragctl.benchmark.chunk_process import WORDS
+from ragctl.chunking.splitters import DEFAULT_SIZES, STRATEGIES, STRATEGY_TOKEN, ChunkingSpec, Splitter, \
+    TokenSplitter, get_splitter
+
+def synthetic_pages(count: int, page_kb: int = 4, seed: int = 0) -> List[str]:
+    """Generate pages of roughly page_kb kilobytes of sentences grouped in paragraphs"""
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(count):
+        paragraphs = []
+        length = 0
+        while length < page_kb * 1024:
+            sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30))).capitalize() + "."
+                         for _ in range(rng.randint(2, 6))]
+            paragraphs.append(" ".join(sentences))
+            length += len(paragraphs[-1]) + 2
+        pages.append("\n\n".join(paragraphs))
+    return pages
+
+def _splitter(strategy: str, tokenizer: Optional[str]) -> Splitter:
+    chunk_size, chunk_overlap = DEFAULT_SIZES[strategy]
+    if strategy == STRATEGY_TOKEN:
+        return TokenSplitter(chunk_size, chunk_overlap, tokenizer)
+    return get_splitter(ChunkingSpec(strategy, chunk_size, chunk_overlap))
+
+def run_benchmark(page_count: int = 200, page_kb: int = 4, batch_size: int = 32,
+                  tokenizer: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Args:
+        page_count (int): Number of synthetic pages.
+        page_kb (int): Size of each page in kilobytes.
+        batch_size (int): Chunks per embedding request.
+        tokenizer (str): tokenizer.json used by the token strategy and to count tokens. The token
+            strategy is skipped without one.
+    Returns:
+        Dict[str, Dict[str, float]]: Chunk statistics and throughput of each strategy.
+    """
+    pages = synthetic_pages(page_count, page_kb)
+    size_mb = sum(len(page.encode("utf-8")) for page in pages) / 1024 / 1024
+    counter = TokenSplitter(*DEFAULT_SIZES[STRATEGY_TOKEN], tokenizer).tokenizer if tokenizer else None
+    results = {}
+    for strategy in STRATEGIES:
+        if strategy == STRATEGY_TOKEN and not tokenizer:
+            continue
+        splitter = _splitter(strategy, tokenizer)
+        start = time.perf_counter()
+        chunks = [chunk for page in pages for chunk in splitter.split_text(page)]
+        seconds = time.perf_counter() - start
+        row = {
+            "chunks": len(chunks),
+            "mean_chars": round(sum(map(len, chunks)) / len(chunks), 1),
+            "max_chars": max(map(len, chunks)),
+        }
+        if counter is not None:
+            tokens = [len(encoding.ids) for encoding in counter.encode_batch(chunks, add_special_tokens=False)]
+            row["mean_tokens"] = round(sum(tokens) / len(tokens), 1)
+            row["max_tokens"] = max(tokens)
+        row["mb_per_second"] = round(size_mb / seconds, 2)
+        row["embed_requests"] = math.ceil(len(chunks) / batch_size)
+        results[strategy] = row
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the chunking strategies on synthetic pages.")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--page-kb", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--tokenizer", help="tokenizer.json of the embedding model, enables the token strategy")
+    args = parser.parse_args()
+    results = run_benchmark(args.pages, args.page_kb, args.batch_size, args.tokenizer)
+    columns = list(next(iter(results.values())))
+    print(f"{'strategy':>14} " + " ".join(f"{column:>14}" for column in columns))
+    for strategy, row in results.items():
+        print(f"{strategy:>14} " + " ".join(f"{row[column]:>14}" for column in columns))
+
+if __name__ == "__main__":
+    main()
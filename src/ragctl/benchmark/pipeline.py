@@ -0,0 +1,375 @@
+"""
+Benchmark of every stage of the ragctl pipeline on a synthetic corpus.
+
+Generates TXT, PDF, DOCX, CSV, XLSX and HTML documents of a configurable size, then
+adds, validates, processes and queries them with the local stub embedding
+and LLM backends, in a temporary catalog and vector store. Each stage is
+also measured on its own: loading and splitting, stop-word filtering,
+embedding and writing to each vector store engine. Per-stage throughput and
+latency percentiles are printed as JSON, and compared against a baseline
+saved from an earlier run when one is given.
+
+Usage:
+    python -m ragctl.benchmark.pipeline [--documents 8] [--size-kb 64] [--formats txt,pdf,docx,csv]
+                                        [--queries 20] [--output results.json]
+                                        [--baseline baseline.json] [--tolerance 0.2]
+"""
+
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import argparse
+import configparser
+import csv
+import html
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+from ragctl import __version__, config
+
+FORMATS = ("txt", "pdf", "docx", "csv", "xlsx", "html")
+
+# Formats of the corpus unless others are given
+DEFAULT_FORMATS = ("txt", "pdf", "docx", "csv")
+
+# Characters of text per synthetic paragraph
+PARAGRAPH_SIZE = 400
+
+# Lines of text per page of the synthetic PDFs
+PDF_LINES_PER_PAGE = 50
+PDF_LINE_WIDTH = 90
+
+QUERY_MODES = ("vector", "lexical", "hybrid")
+
+# Relative slowdown of a stage tolerated before it counts as a regression
+DEFAULT_TOLERANCE = 0.2
+
+def _paragraphs(size: int, seed: int) -> List[str]:
+    from ragctl.benchmark.chunk_process import synthetic_chunks
+    return synthetic_chunks(max(1, size // PARAGRAPH_SIZE), PARAGRAPH_SIZE, seed)
+
+def _pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _write_pdf(path: Path, paragraphs: List[str]) -> None:
+    # A minimal PDF with one Helvetica text stream per page
+    import textwrap
+    lines = []
+    for paragraph in paragraphs:
+        lines.extend(textwrap.wrap(paragraph, PDF_LINE_WIDTH))
+        lines.append("")
+    pages = [lines[start:start + PDF_LINES_PER_PAGE] for start in range(0, len(lines), PDF_LINES_PER_PAGE)]
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"",
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in pages:
+        stream = "BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(f"({_pdf_text(line)}) '" for line in page) + " ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream.encode("latin-1")))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects)))
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % page_id for page_id in page_ids), len(page_ids))
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(output)
+
+def _write_docx(path: Path, paragraphs: List[str]) -> None:
+    import docx
+    document = docx.Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(str(path))
+
+def _write_csv(path: Path, paragraphs: List[str]) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["id", "title", "body"])
+        for index, paragraph in enumerate(paragraphs):
+            writer.writerow([index, " ".join(paragraph.split()[:5]), paragraph])
+
+def _write_xlsx(path: Path, paragraphs: List[str]) -> None:
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Paragraphs")
+    sheet.append(["id", "title", "body"])
+    for index, paragraph in enumerate(paragraphs):
+        sheet.append([index, " ".join(paragraph.split()[:5]), paragraph])
+    workbook.save(str(path))
+
+def _write_html(path: Path, paragraphs: List[str]) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("<!DOCTYPE html>\n<html><head><title>Benchmark</title></head><body>\n")
+        for index, paragraph in enumerate(paragraphs):
+            file.write(f"<h2>Section {index}</h2>\n<p>{html.escape(paragraph)}</p>\n")
+        file.write("</body></html>\n")
+
+def synthetic_corpus(directory: Path, documents: int = 8, size_kb: int = 64,
+                     formats: tuple = DEFAULT_FORMATS, seed: int = 0) -> List[Path]:
+    """
+    Args:
+        directory (Path): Folder the documents are written to.
+        documents (int): Number of documents, spread over the formats in turn.
+        size_kb (int): Approximate text size of each document in kilobytes.
+        formats (tuple): Formats among txt, pdf, docx, csv, xlsx and html.
+        seed (int): Seed of the generated text.
+    Returns:
+        List[Path]: The generated documents.
+    """
+    writers = {
+        "txt": lambda path, paragraphs: path.write_text("\n\n".join(paragraphs), encoding="utf-8"),
+        "pdf": _write_pdf,
+        "docx": _write_docx,
+        "csv": _write_csv,
+        "xlsx": _write_xlsx,
+        "html": _write_html,
+    }
+    paths = []
+    for index in range(documents):
+        document_format = formats[index % len(formats)]
+        path = Path(directory) / f"bench-{index:04d}.{document_format}"
+        # Each document gets its own text, so no two share a hash
+        writers[document_format](path, _paragraphs(size_kb * 1024, seed + index))
+        paths.append(path)
+    return paths
+
+def _summarize(latencies: List[float], items: int, unit: str, size: int = 0) -> Dict[str, Any]:
+    # Latencies are in seconds, one per call of the stage
+    seconds = sum(latencies)
+    milliseconds = np.array(latencies) * 1000
+    summary = {
+        "calls": len(latencies),
+        "items": items,
+        "unit": unit,
+        "seconds": round(seconds, 4),
+        "throughput": round(items / seconds, 2) if seconds else None,
+        "p50_ms": round(float(np.percentile(milliseconds, 50)), 3),
+        "p90_ms": round(float(np.percentile(milliseconds, 90)), 3),
+        "p99_ms": round(float(np.percentile(milliseconds, 99)), 3),
+        "max_ms": round(float(milliseconds.max()), 3),
+    }
+    if size:
+        summary["mb_per_second"] = round(size / 2 ** 20 / seconds, 3) if seconds else None
+    return summary
+
+def _timed(run: Callable[[], Any]) -> tuple:
+    start = time.perf_counter()
+    result = run()
+    return time.perf_counter() - start, result
+
+@contextmanager
+def _isolated_config(root: Path) -> Iterator[Path]:
+    # Point ragctl at a configuration using the stub backends and a fresh embedding cache
+    parser = configparser.ConfigParser()
+    parser["General"] = {"database": str(root / "ragctl.db")}
+    parser["Embedding"] = {"backend": "stub"}
+    parser["Query"] = {"llm": "stub"}
+    parser["VectorStore"] = {"engine": "chroma"}
+    config_file = root / "config.ini"
+    with open(config_file, "w") as file:
+        parser.write(file)
+    saved = (config.CONFIG_FILE, config.EMBEDDING_CACHE_FILE)
+    config.CONFIG_FILE, config.EMBEDDING_CACHE_FILE = config_file, root / "embedding_cache.db"
+    try:
+        yield root / "ragctl.db"
+    finally:
+        config.CONFIG_FILE, config.EMBEDDING_CACHE_FILE = saved
+
+def _catalog_stages(root: Path, paths: List[Path], questions: List[str], k: int) -> Dict[str, Dict[str, Any]]:
+    # add, validate, process and query through RagDocOperations, as the CLI runs them
+    from ragctl import SUCCESS, database
+    from ragctl.helper.validate_doc import ValidateDocumentFormat
+    from ragctl.ragctl import RagDocOperations
+    db_path = root / "ragctl.db"
+    database.init_database(db_path)
+    operations = RagDocOperations(db_path, docs_path=root / "documents", vector_db_path=root / "vector_db")
+    stages = {}
+    sizes = [path.stat().st_size for path in paths]
+
+    latencies = [_timed(lambda: operations.add_docs([str(path)]))[0] for path in paths]
+    stages["add_docs"] = _summarize(latencies, len(paths), "documents", sum(sizes))
+    documents = operations.get_docs_list().rag
+    if len(documents) != len(paths):
+        raise RuntimeError(f"{len(paths) - len(documents)} synthetic documents were not added")
+
+    latencies = [_timed(lambda: ValidateDocumentFormat(document["path"]).detect())[0] for document in documents]
+    stages["validate"] = _summarize(latencies, len(documents), "documents", sum(sizes))
+
+    latencies = []
+    for document in documents:
+        elapsed, result = _timed(lambda: operations.process_document(document["id"]))
+        if result.error != SUCCESS:
+            raise RuntimeError(f"processing {document['name']} failed with error {result.error}")
+        latencies.append(elapsed)
+    stages["process"] = _summarize(latencies, len(documents), "documents", sum(sizes))
+
+    for mode in QUERY_MODES:
+        # The first query opens the stores and loads the models
+        operations.query_documents(questions[0], k=k, mode=mode)
+        latencies = []
+        for question in questions:
+            elapsed, result = _timed(lambda: operations.query_documents(question, k=k, mode=mode))
+            if result["error"] != SUCCESS:
+                raise RuntimeError(f"{mode} query failed with error {result['error']}")
+            latencies.append(elapsed)
+        stages[f"query_{mode}"] = _summarize(latencies, len(questions), "queries")
+    return stages
+
+def _component_stages(root: Path, paths: List[Path]) -> Dict[str, Dict[str, Any]]:
+    # Each processing stage on its own, on the documents as added
+    from ragctl.data_chunk_process.dedup import NearDuplicateIndex
+    from ragctl.document_process.process_doc import ProcessDocument
+    from ragctl.embedding.pipeline import get_embedding_pipeline
+    from ragctl.embedding.registry import get_backend
+    from ragctl.helper.fingerprint import file_fingerprint
+    from ragctl.helper.validate_doc import ValidateDocumentFormat
+    from ragctl.vector_store import chroma, flat
+    vector_db_path = root / "stages"
+    backend = get_backend()
+    # Without the cache, every chunk reaches the embedding backend
+    pipeline = get_embedding_pipeline(backend.embeddings, backend.cache_namespace, None, backend.is_retryable)
+    latencies = {stage: [] for stage in ("load_split", "filter", "dedup", "embed", "write_chroma", "write_flat")}
+    chunk_count = 0
+    for path in paths:
+        document = ProcessDocument(str(path), vector_db_path, file_fingerprint(str(path)),
+                                   ValidateDocumentFormat(str(path)).get_document_format())
+        elapsed, chunks = _timed(lambda: list(document._split_data(document._load_document())))
+        latencies["load_split"].append(elapsed)
+        elapsed, chunks = _timed(lambda: document._filter_chunks(chunks))
+        latencies["filter"].append(elapsed)
+        dedup_index = NearDuplicateIndex()
+        elapsed, _ = _timed(lambda: [dedup_index.add(index, chunk.page_content) for index, chunk in enumerate(chunks)])
+        latencies["dedup"].append(elapsed)
+        texts = [chunk.page_content for chunk in chunks]
+        elapsed, batches = _timed(lambda: list(pipeline.embed(texts)))
+        latencies["embed"].append(elapsed)
+        chunk_count += len(chunks)
+
+        for engine, writer in (("chroma", chroma.ChromaDocumentWriter(vector_db_path, document.document_id,
+                                                                     chroma.collection_name(backend.name,
+                                                                                            backend.model_id))),
+                               ("flat", flat.FlatDocumentWriter(vector_db_path, document.document_id))):
+            def write() -> None:
+                writer.reset(0)
+                for batch in batches:
+                    writer.upsert(batch.indexes, batch.vectors, [texts[index] for index in batch.indexes],
+                                  [{"document_id": document.document_id, "chunk_index": index}
+                                   for index in batch.indexes])
+                writer.finish()
+            latencies[f"write_{engine}"].append(_timed(write)[0])
+    return {stage: _summarize(stage_latencies, chunk_count, "chunks")
+            for stage, stage_latencies in latencies.items()}
+
+def _questions(count: int, seed: int) -> List[str]:
+    from ragctl.benchmark.chunk_process import WORDS
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(WORDS, 6)) + "?" for _ in range(count)]
+
+def run_benchmark(documents: int = 8, size_kb: int = 64, formats: tuple = DEFAULT_FORMATS,
+                  query_count: int = 20, k: int = 5, seed: int = 0) -> Dict[str, Any]:
+    """
+    Args:
+        documents (int): Number of synthetic documents.
+        size_kb (int): Approximate text size of each document in kilobytes.
+        formats (tuple): Formats of the documents, among txt, pdf, docx, csv, xlsx and html.
+        query_count (int): Number of questions measured per retrieval mode.
+        k (int): Number of chunks retrieved per question.
+        seed (int): Seed of the generated corpus and questions.
+    Returns:
+        Dict[str, Any]: The run settings and the summary of each stage.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        (root / "corpus").mkdir()
+        paths = synthetic_corpus(root / "corpus", documents, size_kb, formats, seed)
+        # Progress printed by the pipeline goes to stderr, keeping stdout for the results
+        with _isolated_config(root), redirect_stdout(sys.stderr):
+            stages = _catalog_stages(root, paths, _questions(query_count, seed), k)
+            stages.update(_component_stages(root, paths))
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "settings": {"documents": documents, "size_kb": size_kb, "formats": list(formats),
+                     "queries": query_count, "k": k, "seed": seed},
+        "stages": stages,
+    }
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any],
+            tolerance: float = DEFAULT_TOLERANCE) -> Dict[str, Dict[str, Any]]:
+    """
+    Compare the stages measured in both runs. A stage regresses when its
+    median latency grows, or its throughput drops, by more than `tolerance`.
+
+    Args:
+        results (Dict[str, Any]): Results of run_benchmark.
+        baseline (Dict[str, Any]): Results of an earlier run.
+        tolerance (float): Relative change tolerated, 0.2 for 20%.
+    Returns:
+        Dict[str, Dict[str, Any]]: The latency and throughput ratios of each stage, current over baseline.
+    """
+    comparison = {}
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous is None:
+            continue
+        p50_ratio = current["p50_ms"] / previous["p50_ms"] if previous["p50_ms"] else None
+        throughput_ratio = (current["throughput"] / previous["throughput"]
+                            if current["throughput"] and previous["throughput"] else None)
+        comparison[stage] = {
+            "p50_ratio": round(p50_ratio, 3) if p50_ratio is not None else None,
+            "throughput_ratio": round(throughput_ratio, 3) if throughput_ratio is not None else None,
+            "regressed": bool((p50_ratio is not None and p50_ratio > 1 + tolerance)
+                              or (throughput_ratio is not None and throughput_ratio < 1 - tolerance)),
+        }
+    return comparison
+
+def run(documents: int, size_kb: int, formats: tuple, query_count: int, k: int,
+        output: Optional[str], baseline: Optional[str], tolerance: float) -> int:
+    """Run the benchmark, print and save its results and return 1 when a stage regressed"""
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"unknown formats {', '.join(sorted(unknown))}, use {', '.join(FORMATS)}")
+    results = run_benchmark(documents, size_kb, formats, query_count, k)
+    if baseline:
+        with open(baseline) as file:
+            results["baseline"] = {"path": str(baseline), "tolerance": tolerance,
+                                   "stages": compare(results, json.load(file), tolerance)}
+    text = json.dumps(results, indent=2)
+    if output:
+        Path(output).write_text(text + "\n")
+    print(text)
+    regressed = [stage for stage, row in results.get("baseline", {}).get("stages", {}).items() if row["regressed"]]
+    if regressed:
+        print(f"Regressed stages: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark every ragctl pipeline stage on a synthetic corpus.")
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--size-kb", type=int, default=64)
+    parser.add_argument("--formats", default=",".join(DEFAULT_FORMATS))
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this JSON file, to use as a baseline later")
+    parser.add_argument("--baseline", help="Compare against the results of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+    return run(args.documents, args.size_kb, tuple(args.formats.split(",")), args.queries, args.k,
+               args.output, args.baseline, args.tolerance)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Startup-time budget check for the ragctl CLI.
+
+Measures the import cost of what `ragctl list` loads in a fresh interpreter
+and fails if it exceeds the budget or if any heavy subsystem is imported.
+
+Usage:
+    python -m ragctl.benchmark.startup [--budget-ms 500] [--runs 5]
+"""
+
+from typing import List, NamedTuple
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Modules `ragctl list` imports
+LIST_MODULES = ["ragctl.cli", "ragctl.ragctl", "rich.table", "rich.console"]
+
+# Subsystems that only the commands needing them may import
+HEAVY_MODULES = [
+    "langchain", "langchain_core", "langchain_community", "langchain_chroma", "chromadb",
+    "boto3", "botocore", "nltk", "PyPDF2", "docx", "openpyxl", "xlrd", "bs4",
+    "fastapi", "uvicorn",
+]
+
+DEFAULT_BUDGET_MS = 500.0
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+elapsed = (time.perf_counter() - start) * 1000
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"ms": elapsed, "heavy": heavy}}))
+"""
+
+class StartupResult(NamedTuple):
+    import_ms: float
+    budget_ms: float
+    heavy_modules: List[str]
+
+    @property
+    def passed(self) -> bool:
+        return self.import_ms <= self.budget_ms and not self.heavy_modules
+
+def _probe() -> dict:
+    code = _PROBE.format(modules=LIST_MODULES, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def check_startup(budget_ms: float = DEFAULT_BUDGET_MS, runs: int = 5) -> StartupResult:
+    """
+    Args:
+        budget_ms (float): Maximum median import time in milliseconds.
+        runs (int): Number of fresh interpreters to measure.
+    Returns:
+        StartupResult: The median import time and any heavy module imported.
+    """
+    probes = [_probe() for _ in range(max(1, runs))]
+    heavy = sorted({name for probe in probes for name in probe["heavy"]})
+    return StartupResult(statistics.median(probe["ms"] for probe in probes), budget_ms, heavy)
+
+def top_imports(limit: int = 10) -> List[str]:
+    """Return the slowest imports of `ragctl list` as reported by -X importtime"""
+    code = "; ".join(f"import {module}" for module in LIST_MODULES)
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    rows = []
+    for line in output.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return [f"{cumulative / 1000:8.1f} ms {name}" for cumulative, name in sorted(rows, reverse=True)[:limit]]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check the ragctl CLI startup time budget.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    result = check_startup(args.budget_ms, args.runs)
+    print(f"ragctl list import time: {result.import_ms:.1f} ms (budget {result.budget_ms:.0f} ms)")
+    if result.heavy_modules:
+        print(f"Heavy modules imported at startup: {', '.join(result.heavy_modules)}")
+    if not result.passed:
+        print("Slowest imports:")
+        print("\n".join(top_imports()))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Benchmark of the vector store engines on one synthetic document.
+
+Stores the same clustered, normalized vectors in Chroma and in the flat
+engine with each quantization, then measures the store size, the time to
+open it in a fresh process, the search latency and the recall of the top k
+chunks against an exact float32 search. Each engine is measured in its own
+process so open times and memory do not leak between them.
+
+Usage:
+    python -m ragctl.benchmark.vector_store [--chunks 3000] [--dimensions 1536] [--queries 100] [-k 5]
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import numpy as np
+
+# Vectors written to a store at a time
+WRITE_BATCH_SIZE = 500
+
+DOCUMENT_ID = "bench"
+
+def synthetic_vectors(count: int, dimensions: int, clusters: int = 50, seed: int = 0) -> np.ndarray:
+    """Generate L2-normalized vectors grouped around random centers, like chunks of related text"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def _rss_mb() -> float:
+    # Resident set size of this process; 0 where /proc is not available
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return 0.0
+
+def _folder_mb(path: Path) -> float:
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file()) / 2 ** 20
+
+def _write(engine: str, directory: Path, vectors: np.ndarray) -> float:
+    from ragctl.vector_store import chroma, flat
+    start = time.perf_counter()
+    if engine == "chroma":
+        writer = chroma.ChromaDocumentWriter(directory, DOCUMENT_ID)
+    else:
+        writer = flat.FlatDocumentWriter(directory, DOCUMENT_ID, engine.split("-")[1])
+    writer.reset(0)
+    for offset in range(0, len(vectors), WRITE_BATCH_SIZE):
+        batch = vectors[offset:offset + WRITE_BATCH_SIZE]
+        chunk_indexes = list(range(offset, offset + len(batch)))
+        writer.upsert(chunk_indexes, batch.tolist(), [f"chunk {index}" for index in chunk_indexes],
+                      [{"document_id": DOCUMENT_ID, "chunk_index": index} for index in chunk_indexes])
+    writer.finish()
+    return time.perf_counter() - start
+
+def _measure(engine: str, directory: str, queries: np.ndarray, k: int) -> Dict[str, object]:
+    # Runs in a fresh process: open the store, then search it
+    from ragctl.vector_store import chroma, flat
+    directory = Path(directory)
+    rss = _rss_mb()
+    start = time.perf_counter()
+    if engine == "chroma":
+        collection = chroma.get_collection(directory)
+    else:
+        flat.open_store(directory, DOCUMENT_ID)
+    open_ms = (time.perf_counter() - start) * 1000
+    latencies: List[float] = []
+    results: List[List[int]] = []
+    for query in queries:
+        start = time.perf_counter()
+        if engine == "chroma":
+            found = collection.query(query_embeddings=[query.tolist()], n_results=k,
+                                     where={"document_id": DOCUMENT_ID}, include=["metadatas"])
+            chunk_indexes = [metadata["chunk_index"] for metadata in found["metadatas"][0]]
+        else:
+            chunk_indexes = [hit.chunk_index for hit in flat.search(directory, [DOCUMENT_ID], query, k)]
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(chunk_indexes)
+    return {"open_ms": open_ms, "latencies_ms": latencies, "results": results, "rss_mb": _rss_mb() - rss}
+
+def run_benchmark(chunk_count: int = 3000, dimensions: int = 1536, query_count: int = 100,
+                  k: int = 5) -> Dict[str, Dict[str, float]]:
+    """
+    Args:
+        chunk_count (int): Number of chunks in the document.
+        dimensions (int): Embedding dimensions.
+        query_count (int): Number of searches measured.
+        k (int): Number of chunks returned by a search.
+    Returns:
+        Dict[str, Dict[str, float]]: Size, write and open time, latency and recall of each engine.
+    """
+    vectors = synthetic_vectors(chunk_count, dimensions)
+    queries = synthetic_vectors(query_count, dimensions, seed=1)
+    # Ground truth: exact float32 dot-product search
+    exact = [set(np.argsort(-(vectors @ query))[:k].tolist()) for query in queries]
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as root:
+        for engine in ("chroma", "flat-none", "flat-float16", "flat-int8"):
+            directory = Path(root) / engine
+            directory.mkdir()
+            write_seconds = _write(engine, directory, vectors)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                measured = executor.submit(_measure, engine, str(directory), queries, k).result()
+            recall = np.mean([len(exact_ids & set(found)) / k
+                              for exact_ids, found in zip(exact, measured["results"])])
+            results[engine] = {
+                "size_mb": round(_folder_mb(directory), 2),
+                "write_seconds": round(write_seconds, 3),
+                "open_ms": round(measured["open_ms"], 2),
+                "p50_ms": round(float(np.percentile(measured["latencies_ms"], 50)), 3),
+                "p95_ms": round(float(np.percentile(measured["latencies_ms"], 95)), 3),
+                f"recall_at_{k}": round(float(recall), 4),
+                "rss_mb": round(measured["rss_mb"], 1),
+            }
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the vector store engines on one document.")
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    results = run_benchmark(args.chunks, args.dimensions, args.queries, args.k)
+    columns = list(next(iter(results.values())))
+    print(f"{'engine':>14} " + " ".join(f"{column:>14}" for column in columns))
+    for engine, row in results.items():
+        print(f"{engine:>14} " + " ".join(f"{row[column]:>14}" for column in columns))
+
+if __name__ == "__main__":
+    main()
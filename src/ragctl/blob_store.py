@@ -0,0 +1,216 @@
+# ragctl/blob_store.py
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+from ragctl import DB_WRITE_ERROR, ERRORS, config
+from ragctl.database import DatabaseHandler
+from ragctl.helper.fingerprint import file_fingerprint
+import errno
+import os
+import shutil
+import sys
+import time
+import uuid
+
+# Folder of the blobs, inside the documents folder
+BLOBS_DIR = "blobs"
+
+# How a blob holds the content of the file it was added from
+METHOD_REFLINK = "reflink"
+METHOD_HARDLINK = "hardlink"
+METHOD_COPY = "copy"
+
+# [Storage] link modes: auto tries a reflink, then copies. Hard links are
+# only made when asked for, as they share later edits of the added file
+LINK_AUTO = "auto"
+LINK_MODES = (LINK_AUTO, METHOD_REFLINK, METHOD_HARDLINK, METHOD_COPY)
+
+# Compression of the blobs of embedded documents
+COMPRESSION_NONE = "none"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_ZSTD)
+
+ZSTD_SUFFIX = ".zst"
+DEFAULT_ZSTD_LEVEL = 3
+
+# ioctl cloning a file on Linux filesystems with shared extents, such as Btrfs and XFS
+_FICLONE = 0x40049409
+
+def _reflink(source: str, target: Path) -> None:
+    # Copy-on-write clone, so the blob never changes with the source
+    if sys.platform.startswith("linux"):
+        import fcntl
+        with open(source, "rb") as source_file, open(target, "wb") as target_file:
+            fcntl.ioctl(target_file.fileno(), _FICLONE, source_file.fileno())
+    elif sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(source), os.fsencode(str(target)), 0) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+    else:
+        raise OSError(errno.ENOTSUP, "reflinks are not supported on this platform")
+
+def _copy(source: str, target: Path) -> None:
+    shutil.copyfile(source, target)
+
+_STORE = {
+    METHOD_REFLINK: _reflink,
+    METHOD_HARDLINK: lambda source, target: os.link(source, target),
+    METHOD_COPY: _copy,
+}
+
+# Methods tried in turn for each link mode
+_METHODS = {
+    LINK_AUTO: (METHOD_REFLINK, METHOD_COPY),
+    METHOD_REFLINK: (METHOD_REFLINK, METHOD_COPY),
+    METHOD_HARDLINK: (METHOD_HARDLINK, METHOD_COPY),
+    METHOD_COPY: (METHOD_COPY,),
+}
+
+class BlobStore:
+    """
+        Added documents stored once per content hash, under
+        <documents>/blobs/<first two hex digits>/<hash><extension>, and
+        reference-counted in the catalog. A blob shares the content of the
+        added file through a copy-on-write reflink when the filesystem has
+        them, or through a hard link when asked for, and is a copy
+        otherwise. Hard-linked blobs change with the added file, so their
+        hash is checked again before they are read. Copied blobs can be
+        compressed with zstd once their document is embedded, as they are
+        only read again if it is processed again.
+    """
+    def __init__(self, docs_path: Path, db_handler: DatabaseHandler) -> None:
+        self.root = Path(docs_path) / BLOBS_DIR
+        self._db_handler = db_handler
+        self.link = config.get_option("Storage", "link", LINK_AUTO)
+        if self.link not in LINK_MODES:
+            raise ValueError(f"unknown link mode {self.link}, use one of {', '.join(LINK_MODES)}")
+        self.compression = config.get_option("Storage", "compression", COMPRESSION_NONE)
+        if self.compression not in COMPRESSIONS:
+            raise ValueError(f"unknown compression {self.compression}, use one of {', '.join(COMPRESSIONS)}")
+        self.zstd_level = int(config.get_option("Storage", "zstd_level", str(DEFAULT_ZSTD_LEVEL)))
+
+    def _temporary(self, path: Path) -> Path:
+        # Blobs are written next to their final path and renamed, so a reader never sees a partial blob
+        return path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+    def _get(self, blob_hash: str) -> Optional[Dict[str, Any]]:
+        found = self._db_handler.get_blob(blob_hash)
+        if found.error:
+            raise RuntimeError(ERRORS[found.error])
+        return found.data[0] if found.data else None
+
+    def _check(self, written) -> None:
+        if written.error:
+            raise RuntimeError(ERRORS[DB_WRITE_ERROR])
+
+    def add(self, source: str, blob_hash: str) -> Path:
+        """
+            Store a file unless its content is stored already, and take a reference to it
+            Args:
+                source: Path of the added file
+                blob_hash: Hash of its content
+            Return:
+                The path of the blob, as the documents read it
+        """
+        blob = self._get(blob_hash)
+        if blob is not None:
+            self._check(self._db_handler.reference_blob(blob))
+            return Path(blob["path"])
+        path = self.root / blob_hash[:2] / f"{blob_hash}{Path(source).suffix.lower()}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self._temporary(path)
+        for method in _METHODS[self.link]:
+            try:
+                _STORE[method](source, temporary)
+                break
+            except OSError:
+                # Another filesystem, or one without reflinks: try the next method
+                temporary.unlink(missing_ok=True)
+                if method == METHOD_COPY:
+                    raise
+        os.replace(temporary, path)
+        size = os.path.getsize(path)
+        self._check(self._db_handler.reference_blob({
+            "hash": blob_hash,
+            "path": str(path),
+            "size": size,
+            # A linked blob takes no space of its own
+            "stored_size": size if method == METHOD_COPY else 0,
+            "method": method,
+            "compression": COMPRESSION_NONE,
+            "created_at": time.time(),
+        }))
+        return path
+
+    def release(self, blob_hash: str) -> None:
+        """Drop a reference to a blob, and remove it once it has none left"""
+        released = self._db_handler.release_blob(blob_hash)
+        self._check(released)
+        if released.data and released.data[0]["refs"] <= 0:
+            path = Path(released.data[0]["path"])
+            path.unlink(missing_ok=True)
+            path.with_name(path.name + ZSTD_SUFFIX).unlink(missing_ok=True)
+            try:
+                path.parent.rmdir()
+            except OSError:
+                # Other blobs share the folder
+                pass
+
+    def open(self, blob_hash: str, path: str) -> Path:
+        """
+            Return the path to read a document from, decompressing its blob if needed
+            Raise ValueError when a hard-linked blob no longer has the content of its hash
+            Args:
+                blob_hash: Hash of the document content
+                path: Path recorded in the catalog, used as is for documents added before the blob store
+        """
+        blob = self._get(blob_hash)
+        if blob is None:
+            return Path(path)
+        if blob["method"] == METHOD_HARDLINK and file_fingerprint(blob["path"]) != blob_hash:
+            raise ValueError(f"the document was edited since it was added, through its hard link {blob['path']}; "
+                             f"delete it and add it again")
+        if blob["compression"] == COMPRESSION_NONE:
+            return Path(blob["path"])
+        import zstandard
+        path = Path(blob["path"])
+        compressed = path.with_name(path.name + ZSTD_SUFFIX)
+        temporary = self._temporary(path)
+        with open(compressed, "rb") as source, open(temporary, "wb") as target:
+            zstandard.ZstdDecompressor().copy_stream(source, target)
+        os.replace(temporary, path)
+        self._check(self._db_handler.update_blob(blob_hash, {"compression": COMPRESSION_NONE,
+                                                             "stored_size": blob["size"]}))
+        # Another process may have decompressed it too
+        compressed.unlink(missing_ok=True)
+        return path
+
+    def compress(self, blob_hash: str) -> None:
+        """
+            Compress the blob of an embedded document, when compression is
+            enabled and the blob is a copy. Linked blobs take no space of
+            their own, and blobs that do not shrink are kept as they are.
+            Compression only saves space, so callers treat its errors as
+            warnings.
+        """
+        if self.compression == COMPRESSION_NONE:
+            return
+        blob = self._get(blob_hash)
+        if blob is None or blob["method"] != METHOD_COPY or blob["compression"] != COMPRESSION_NONE:
+            return
+        import zstandard
+        path = Path(blob["path"])
+        compressed = path.with_name(path.name + ZSTD_SUFFIX)
+        temporary = self._temporary(compressed)
+        with open(path, "rb") as source, open(temporary, "wb") as target:
+            zstandard.ZstdCompressor(level=self.zstd_level).copy_stream(source, target)
+        stored_size = os.path.getsize(temporary)
+        if stored_size >= blob["size"]:
+            temporary.unlink()
+            return
+        os.replace(temporary, compressed)
+        self._check(self._db_handler.update_blob(blob_hash, {"compression": COMPRESSION_ZSTD,
+                                                             "stored_size": stored_size}))
+        path.unlink()
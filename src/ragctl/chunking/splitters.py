@@ -0,0 +1,244 @@
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from ragctl import config
+import re
+import threading
+
+# Chunking strategies
+STRATEGY_RECURSIVE = "recursive"
+STRATEGY_CHARACTER = "character"
+STRATEGY_TOKEN = "token"
+STRATEGY_SENTENCE = "sentence"
+STRATEGIES = (STRATEGY_RECURSIVE, STRATEGY_CHARACTER, STRATEGY_TOKEN, STRATEGY_SENTENCE)
+
+# Default (chunk size, overlap) of each strategy, in tokens for the token strategy and characters otherwise
+DEFAULT_SIZES = {
+    STRATEGY_RECURSIVE: (500, 80),
+    STRATEGY_CHARACTER: (500, 80),
+    STRATEGY_TOKEN: (256, 32),
+    STRATEGY_SENTENCE: (500, 80),
+}
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+_WHITESPACE = re.compile(r"\s+")
+
+class ChunkingSpec(NamedTuple):
+    strategy: str
+    chunk_size: int
+    chunk_overlap: int
+
+    def __str__(self) -> str:
+        # As recorded in the catalog
+        return f"{self.strategy}:{self.chunk_size}:{self.chunk_overlap}"
+
+# Chunking of the documents processed before the chunking was recorded in the catalog
+LEGACY_CHUNKING = ChunkingSpec(STRATEGY_RECURSIVE, 500, 80)
+
+def parse_spec(text: Optional[str]) -> ChunkingSpec:
+    """
+        Args:
+            text: Chunking recorded in the catalog, or None for the legacy chunking
+        Return:
+            The chunking spec
+    """
+    if not text:
+        return LEGACY_CHUNKING
+    strategy, chunk_size, chunk_overlap = text.split(":")
+    return ChunkingSpec(strategy, int(chunk_size), int(chunk_overlap))
+
+def get_chunking(strategy: Optional[str] = None) -> ChunkingSpec:
+    """
+        Return the chunking set in the [Chunking] configuration section
+        Args:
+            strategy: Strategy used instead of the configured one
+        Return:
+            The strategy with its chunk size and overlap
+    """
+    strategy = strategy or config.get_option("Chunking", "strategy", STRATEGY_RECURSIVE)
+    if strategy not in STRATEGIES:
+        raise ValueError(f"unknown chunking strategy {strategy}, use one of {', '.join(STRATEGIES)}")
+    chunk_size, chunk_overlap = DEFAULT_SIZES[strategy]
+    # Token sizes are set apart, as they are in other units
+    prefix = "token_" if strategy == STRATEGY_TOKEN else ""
+    chunk_size = int(config.get_option("Chunking", f"{prefix}chunk_size", str(chunk_size)))
+    chunk_overlap = int(config.get_option("Chunking", f"{prefix}chunk_overlap", str(chunk_overlap)))
+    if chunk_size <= 0 or not 0 <= chunk_overlap < chunk_size:
+        raise ValueError(f"the {strategy} chunk overlap must be smaller than the chunk size")
+    return ChunkingSpec(strategy, chunk_size, chunk_overlap)
+
+class Splitter:
+    """
+        Split the text of a page into chunks in a single pass, as the pages
+        of a document are streamed
+    """
+    def __init__(self, chunk_size: int, chunk_overlap: int) -> None:
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def split_text(self, text: str) -> List[str]:
+        raise NotImplementedError
+
+    def length(self, text: str) -> int:
+        """Size of a text in the unit of the chunk size"""
+        return len(text)
+
+class RecursiveSplitter(Splitter):
+    """The recursive character splitter of langchain, which chunked every document before strategies"""
+    def __init__(self, chunk_size: int, chunk_overlap: int) -> None:
+        super().__init__(chunk_size, chunk_overlap)
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                                       length_function=len, is_separator_regex=False)
+
+    def split_text(self, text: str) -> List[str]:
+        return self.splitter.split_text(text)
+
+class CharacterSplitter(Splitter):
+    """Windows of chunk_size characters, ending at the last whitespace of the window so words stay whole"""
+    def split_text(self, text: str) -> List[str]:
+        chunks = []
+        start = 0
+        length = len(text)
+        while start < length:
+            end = min(start + self.chunk_size, length)
+            if end < length and not text[end].isspace():
+                cut = max(text.rfind(" ", start, end), text.rfind("\n", start, end))
+                # Keep the window whole when a word fills it
+                if cut > start + self.chunk_overlap:
+                    end = cut
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= length:
+                break
+            start = max(end - self.chunk_overlap, start + 1)
+            if not text[start - 1].isspace():
+                # Start the overlap at the next word, or drop it when it holds none
+                match = _WHITESPACE.search(text, start, end)
+                start = match.end() if match else end
+        return chunks
+
+class SentenceSplitter(Splitter):
+    """
+        Sentences packed into chunks of up to chunk_size characters, keeping
+        paragraph breaks. The next chunk starts with the last sentences that
+        fit in the overlap. Sentences longer than a chunk are split by words.
+    """
+    def __init__(self, chunk_size: int, chunk_overlap: int) -> None:
+        super().__init__(chunk_size, chunk_overlap)
+        self.long_sentences = CharacterSplitter(chunk_size, chunk_overlap)
+
+    def _sentences(self, text: str) -> Iterator[Tuple[str, bool]]:
+        # (sentence, whether it ends a paragraph)
+        for paragraph in _PARAGRAPH_BREAK.split(text):
+            sentences = [sentence for sentence in _SENTENCE_BREAK.split(paragraph.strip()) if sentence]
+            for index, sentence in enumerate(sentences):
+                yield sentence, index == len(sentences) - 1
+
+    @staticmethod
+    def _length(sentence: str, ends_paragraph: bool) -> int:
+        # With the separator that follows it
+        return len(sentence) + (2 if ends_paragraph else 1)
+
+    def split_text(self, text: str) -> List[str]:
+        chunks = []
+        current: List[Tuple[str, bool]] = []
+        size = 0
+
+        def joined(sentences: List[Tuple[str, bool]]) -> str:
+            return "".join(sentence + ("\n\n" if ends_paragraph else " ")
+                           for sentence, ends_paragraph in sentences).strip()
+
+        for sentence, ends_paragraph in self._sentences(text):
+            if len(sentence) > self.chunk_size:
+                if current:
+                    chunks.append(joined(current))
+                chunks.extend(self.long_sentences.split_text(sentence))
+                current, size = [], 0
+                continue
+            if current and size + len(sentence) > self.chunk_size:
+                chunks.append(joined(current))
+                carried: List[Tuple[str, bool]] = []
+                carried_size = 0
+                for previous in reversed(current):
+                    if carried_size + self._length(*previous) > self.chunk_overlap:
+                        break
+                    carried.insert(0, previous)
+                    carried_size += self._length(*previous)
+                current, size = carried, carried_size
+                # The overlap is cut from the front when the sentence would not fit with it
+                while current and size + len(sentence) > self.chunk_size:
+                    size -= self._length(*current.pop(0))
+            current.append((sentence, ends_paragraph))
+            size += self._length(sentence, ends_paragraph)
+        if current:
+            chunks.append(joined(current))
+        return chunks
+
+# Tokenizers by path, loaded once per process
+_tokenizers: Dict[str, "Tokenizer"] = {}
+_tokenizers_lock = threading.Lock()
+
+def get_tokenizer_path() -> str:
+    """
+        Return the tokenizer.json set with `tokenizer` in the [Chunking]
+        section, by default the one of the ONNX embedding model
+    """
+    path = config.get_option("Chunking", "tokenizer", None) or config.get_option("Embedding", "onnx_model", None)
+    if not path:
+        raise ValueError("set tokenizer in the [Chunking] section to use the token chunking strategy")
+    path = Path(path).expanduser().resolve()
+    return str(path / "tokenizer.json" if path.is_dir() else path)
+
+def _load_tokenizer(path: str) -> "Tokenizer":
+    tokenizer = _tokenizers.get(path)
+    if tokenizer is None:
+        with _tokenizers_lock:
+            tokenizer = _tokenizers.get(path)
+            if tokenizer is None:
+                from tokenizers import Tokenizer
+                tokenizer = Tokenizer.from_file(path)
+                # Whole pages are encoded, then cut into windows
+                tokenizer.no_truncation()
+                tokenizer.no_padding()
+                _tokenizers[path] = tokenizer
+    return tokenizer
+
+class TokenSplitter(Splitter):
+    """
+        Windows of chunk_size tokens of the embedding model's tokenizer, so
+        chunks fill the model's input without being truncated. Each page is
+        encoded once and chunks are cut from it at token offsets.
+    """
+    def __init__(self, chunk_size: int, chunk_overlap: int, tokenizer_path: Optional[str] = None) -> None:
+        super().__init__(chunk_size, chunk_overlap)
+        self.tokenizer = _load_tokenizer(tokenizer_path or get_tokenizer_path())
+
+    def length(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def split_text(self, text: str) -> List[str]:
+        offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+        chunks = []
+        step = self.chunk_size - self.chunk_overlap
+        for start in range(0, len(offsets), step):
+            window = offsets[start:start + self.chunk_size]
+            chunk = text[window[0][0]:window[-1][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+            if start + self.chunk_size >= len(offsets):
+                break
+        return chunks
+
+_splitters = {
+    STRATEGY_RECURSIVE: RecursiveSplitter,
+    STRATEGY_CHARACTER: CharacterSplitter,
+    STRATEGY_TOKEN: TokenSplitter,
+    STRATEGY_SENTENCE: SentenceSplitter,
+}
+
+def get_splitter(spec: ChunkingSpec) -> Splitter:
+    if spec.strategy not in _splitters:
+        raise ValueError(f"unknown chunking strategy {spec.strategy}, use one of {', '.join(STRATEGIES)}")
+    return _splitters[spec.strategy](spec.chunk_size, spec.chunk_overlap)
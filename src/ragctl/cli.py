@@ -1,16 +1,22 @@
 # ragctl/cli.py
 
-from typing import Optional, List
+from typing import TYPE_CHECKING, Iterator, Optional, List
 from pathlib import Path
+from contextlib import contextmanager
+import os
 import typer
 typer.core.rich = None
 from ragctl import (
-    __app_name__, __version__, ERRORS, SUCCESS, config, database, ragctl
+    __app_name__, __version__, ERRORS, SUCCESS, config, database
 )
 from rich.table import Table
 from rich.console import Console
 import json
 
+if TYPE_CHECKING:
+    from ragctl.ragctl import RagDocOperations
+    from ragctl.tracing import Profile
+
 # Create instance of Typer
 app = typer.Typer(help="RAGCTL - A CLI tool for Retrieval Augmented Generation",
                   pretty_exceptions_enable=False)
@@ -27,27 +33,85 @@ def main(
 ) -> None:
     return
 
+# Heavy subsystems (langchain, chromadb, boto3, document parsers) are
+# imported by the commands that use them, so that commands such as
+# --version, list and delete start quickly.
+
+# Function: Open the documents, reporting a wrong [Storage] setting
+def open_docs(db_path: Path) -> "RagDocOperations":
+    from ragctl.ragctl import RagDocOperations
+    try:
+        return RagDocOperations(db_path)
+    except ValueError as e:
+        typer.secho(f'RAGCTL configuration is invalid: "{e}"', fg=typer.colors.RED, bold=True)
+        raise typer.Exit(code=1)
+
 # Function: Check the Configuration and Database file
-def get_docs() -> ragctl.RagDocOperations:
+def get_docs() -> "RagDocOperations":
     if config.CONFIG_FILE.exists():
         config_path = database.get_database_path(config.CONFIG_FILE)
     else:
         typer.secho('RAGCTL configuration file not found, Please run "ragctl init"', fg=typer.colors.RED, bold=True)
         raise typer.Exit(code=1)
-    if config_path.exists():
-        return ragctl.RagDocOperations(config_path)
+    if database.database_exists(config_path):
+        return open_docs(config_path)
     else:
         typer.secho('RAGCTL database not found, Please run "ragctl init"', fg=typer.colors.RED, bold=True)
         raise typer.Exit(code=1)
 
 # Function: Check the AWS configuration
-def check_aws_config() -> ragctl.RagDocOperations:
+def check_aws_config() -> "RagDocOperations":
     if config.AWS_CREDENTIALS_FILE.exists() and config.AWS_CONFIG_FILE.exists():
-        return ragctl.RagDocOperations(config.CONFIG_FILE)
+        return open_docs(config.CONFIG_FILE)
     else:
         typer.secho('AWS configuration not found, Please run "ragctl init_aws"', fg=typer.colors.RED, bold=True)
         raise typer.Exit(code=1)
     
+# Function: Measure the stages of a command
+@contextmanager
+def traced(command: str, profile: bool, trace_file: Optional[Path]) -> Iterator[None]:
+    """
+    Time the stages of a command. With profile, the time spent in each stage
+    is printed on stderr when the command ends. With trace_file, the spans
+    are exported through OpenTelemetry, one JSON object per line.
+    """
+    if not profile and trace_file is None:
+        yield
+        return
+    from ragctl import tracing
+    if profile:
+        tracing.start_profile()
+    if trace_file is not None:
+        tracing.start_export(trace_file)
+    try:
+        with tracing.span(command):
+            yield
+    finally:
+        measured = tracing.stop()
+        if measured is not None:
+            print_profile(measured)
+
+# Function: Print the time spent in each stage
+def print_profile(profile: "Profile") -> None:
+    elapsed = profile.elapsed()
+    table = Table(title=f"Profile: {elapsed:.3f}s", title_justify="left")
+    table.add_column("Stage", width=24)
+    table.add_column("Calls", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("Mean", justify="right")
+    table.add_column("Max", justify="right")
+    table.add_column("Share", justify="right")
+    table.add_column("Errors", justify="right")
+
+    def duration(seconds: float) -> str:
+        return f"{seconds * 1000:.1f}ms" if seconds < 1 else f"{seconds:.2f}s"
+
+    for stage in profile.stages():
+        table.add_row(stage.name, str(stage.calls), duration(stage.seconds), duration(stage.seconds / stage.calls),
+                      duration(stage.max_seconds), f"{stage.seconds / elapsed:.0%}" if elapsed else "-",
+                      str(stage.errors or ""))
+    Console(stderr=True).print(table)
+
 # Command: Initialize the application and database
 @app.command(help="Initialize the RAGCTL application and database.")
 def init(
@@ -131,6 +195,13 @@ def init_aws(
 @app.command(help="Add the list of documents to the database.")
 def add(
     documents_path: List[str] = typer.Argument(..., help="List of documents to add to the database."),
+    jobs: int = typer.Option(os.cpu_count() or 1, "--jobs", "-j", min=1,
+                             help="Number of documents hashed, validated and copied in parallel."),
+    tag: Optional[List[str]] = typer.Option(None, "--tag", "-t",
+                                            help="Tag the documents, can be repeated"),
+    profile: bool = typer.Option(False, "--profile", help="Print the time spent in each stage"),
+    trace_file: Optional[Path] = typer.Option(None, "--trace-file",
+                                              help="Append the spans of each stage to this file as OpenTelemetry JSON"),
 ) -> None:
     """
     Add the list of documents to the database.
@@ -139,21 +210,32 @@ def add(
 
     Args:
         documents_path (List[str]): List of documents to add to the database.
+        jobs (int): Number of documents processed in parallel.
+        tag (List[str]): Tags used to select the documents to query.
+        profile (bool): Print the time spent in each stage.
+        trace_file (Path): File the spans are exported to.
     Returns:
         None
     """
+    def print_result(doc: dict) -> None:
+        if doc['status'] == 1:
+            typer.secho(f'Add document failed: "{doc["document"]}": {doc["message"]}', fg=typer.colors.RED, bold=True)
+        else:
+            typer.secho(f'Add document successfully: "{doc["document"]}"', fg=typer.colors.GREEN, bold=True)
+
+    if tag and any("," in name for name in tag):
+        typer.secho('Add documents failed: "tags cannot contain commas"', fg=typer.colors.RED, bold=True)
+        raise typer.Exit(code=1)
     try:
         rag_doc_operations = get_docs()
-        add_docs, error = rag_doc_operations.add_docs(documents_path)
+        with traced("add", profile, trace_file):
+            add_docs, error = rag_doc_operations.add_docs(documents_path, jobs=jobs, on_result=print_result,
+                                                          tags=tag)
         if error != SUCCESS:
-            typer.secho(f'Add documents failed: "{ERRORS[add_docs.error]}"', fg=typer.colors.RED, bold=True)
+            typer.secho(f'Add documents failed: "{ERRORS[error]}"', fg=typer.colors.RED, bold=True)
             raise typer.Exit(code=1)
-        else:
-            for doc in add_docs:
-                if doc['status'] == 1:
-                    typer.secho(f'Add document failed: "{doc["message"]}"', fg=typer.colors.RED, bold=True)
-                else:
-                    typer.secho(f'Add document successfully: "{doc["document"]}"', fg=typer.colors.GREEN, bold=True)
+    except typer.Exit:
+        raise
     except Exception as e:
         typer.secho(f'Add documents failed: "{e}"', fg=typer.colors.RED, bold=True)
         raise typer.Exit(code=1)
@@ -189,7 +271,14 @@ def list(
                     "md5sum": doc['md5sum'],
                     "size": doc['size'],
                     "name": doc['name'],
-                    "embedded": doc['embedded']
+                    "state": doc['state'],
+                    "checkpoint": doc['checkpoint'],
+                    "tags": doc['tags'].split(",") if doc['tags'] else [],
+                    "embedding_backend": doc['embedding_backend'],
+                    "embedding_model": doc['embedding_model'],
+                    "vector_store": doc['vector_store'],
+                    "chunking": doc['chunking'],
+                    "embedded": str(doc['state'] == "embedded")
                 })
             typer.echo(json.dumps(json_output, indent=4))
         else:
@@ -197,9 +286,14 @@ def list(
             table.add_column("ID", width=6)
             table.add_column("Document", width=40)
             table.add_column("Size", width=10)
-            table.add_column("Embedded", width=9)
+            table.add_column("State", width=20)
+            table.add_column("Tags", width=15)
             for doc in docs:
-                table.add_row(str(doc['id']), doc['name'], str(doc['size']), str(doc['embedded']))
+                state = doc['state']
+                if state != "embedded" and doc['checkpoint']:
+                    # Show how far an interrupted run got
+                    state = f"{state} ({doc['checkpoint']} chunks)"
+                table.add_row(str(doc['id']), doc['name'], str(doc['size']), state, doc['tags'] or "")
             # Display the table
             console = Console()
             console.print(table)
@@ -261,48 +355,329 @@ def delete(
 # Command: Process the added document and embed it into VectorDB
 @app.command(help="Process the added document and embed it into VectorDB")
 def process(
-    document_id: str = typer.Option(..., "--document-id", "-d", help="Document ID to process"),
+    document_id: Optional[List[str]] = typer.Option(None, "--document-id", "-d",
+                                                    help="Document ID to process, can be repeated"),
+    all_documents: bool = typer.Option(False, "--all", help="Process every document not embedded yet"),
+    jobs: int = typer.Option(2, "--jobs", "-j", min=1,
+                             help="Number of documents loaded and split in parallel."),
+    embed_jobs: int = typer.Option(2, "--embed-jobs", min=1,
+                                   help="Number of chunk windows embedded in parallel across documents."),
+    vector_store: Optional[str] = typer.Option(None, "--vector-store",
+                                               help="Vector store engine (chroma or flat), by default the configured one."),
+    chunking: Optional[str] = typer.Option(None, "--chunking",
+                                           help="Chunking strategy (recursive, character, token or sentence), "
+                                                "by default the configured one."),
+    profile: bool = typer.Option(False, "--profile", help="Print the time spent in each stage"),
+    trace_file: Optional[Path] = typer.Option(None, "--trace-file",
+                                              help="Append the spans of each stage to this file as OpenTelemetry JSON"),
 ) -> None:
     """
     Process the added document and embed it into VectorDB.
 
     This command processes the added document and embed it into VectorDB.
+    With several document ids or --all, documents are processed as a batch:
+    the next documents are loaded and split while earlier ones are embedded.
 
     Args:
-        document_id (str): Document ID to process.
+        document_id (List[str]): Document IDs to process.
+        all_documents (bool): Process every document not embedded yet.
+        jobs (int): Number of documents loaded and split in parallel.
+        embed_jobs (int): Number of chunk windows embedded in parallel.
+        vector_store (str): Vector store engine of the processed documents.
+        chunking (str): Chunking strategy of the processed documents.
+        profile (bool): Print the time spent in each stage.
+        trace_file (Path): File the spans are exported to.
     Returns:
         None
     """
+    if not document_id and not all_documents:
+        typer.secho('Process document failed: "provide --document-id or --all"', fg=typer.colors.RED, bold=True)
+        raise typer.Exit(code=1)
+    if vector_store is not None and vector_store not in ("chroma", "flat"):
+        typer.secho(f'Process document failed: "unknown vector store {vector_store}, use chroma or flat"',
+                    fg=typer.colors.RED, bold=True)
+        raise typer.Exit(code=1)
+    if chunking is not None and chunking not in ("recursive", "character", "token", "sentence"):
+        typer.secho(f'Process document failed: "unknown chunking strategy {chunking}, '
+                    f'use recursive, character, token or sentence"', fg=typer.colors.RED, bold=True)
+        raise typer.Exit(code=1)
     rag_doc_operations = get_docs()
-    error = rag_doc_operations.process_document(document_id).error
+    if document_id and len(document_id) == 1 and not all_documents:
+        with traced("process", profile, trace_file):
+            processed, error = rag_doc_operations.process_document(document_id[0], vector_store, chunking)
+        if error != SUCCESS:
+            detail = f': {processed["message"]}' if processed.get("message") else ""
+            typer.secho(f'Process document failed: "{ERRORS[error]}"{detail}', fg=typer.colors.RED, bold=True)
+            raise typer.Exit(code=1)
+        else:
+            typer.secho(f'Process document successfully: "{document_id[0]}"', fg=typer.colors.GREEN, bold=True)
+            if processed["warning"]:
+                typer.secho(processed["warning"], fg=typer.colors.YELLOW)
+            if processed["duplicates"]:
+                typer.echo(f'Skipped {processed["duplicates"]} near-duplicate chunks, '
+                           f'embedded {processed["chunks"]} chunks')
+        return
+
+    def print_result(doc: dict) -> None:
+        if doc['status'] == 1:
+            typer.secho(f'Process document failed: "{doc["document"]}": {doc["message"]}', fg=typer.colors.RED, bold=True)
+        else:
+            typer.secho(f'Process document successfully: "{doc["document"]}"', fg=typer.colors.GREEN, bold=True)
+            if doc["warning"]:
+                typer.secho(doc["warning"], fg=typer.colors.YELLOW)
+
+    with traced("process", profile, trace_file):
+        processed, error = rag_doc_operations.process_documents(None if all_documents else document_id,
+                                                                jobs=jobs, embed_jobs=embed_jobs,
+                                                                on_result=print_result, vector_store=vector_store,
+                                                                chunking=chunking)
     if error != SUCCESS:
-        typer.secho(f'Process document failed: "{ERRORS[error]}"', fg=typer.colors.RED, bold=True)
+        typer.secho(f'Process documents failed: "{ERRORS[error]}"', fg=typer.colors.RED, bold=True)
+        raise typer.Exit(code=1)
+    summary = processed['summary']
+    typer.secho(f'Processed {summary["documents"]} documents ({summary["failed"]} failed), '
+                f'{summary["chunks"]} chunks in {summary["seconds"]:.1f}s '
+                f'({summary["duplicates"]} near-duplicates skipped): '
+                f'{summary["documents_per_second"]:.2f} docs/s, {summary["chunks_per_second"]:.1f} chunks/s',
+                fg=typer.colors.GREEN, bold=True)
+    if summary["failed"]:
         raise typer.Exit(code=1)
-    else:
-        typer.secho(f'Process document successfully: "{document_id}"', fg=typer.colors.GREEN, bold=True)
 
 # Command: Query the document.
 # Arguments required: document id and query string
 @app.command(help="Query the document")
 def query(
-    document_id: str = typer.Option(..., "--document-id", "-d", help="Document ID to query"),
+    document_id: Optional[List[str]] = typer.Option(None, "--document-id", "-d",
+                                                    help="Document ID to query, can be repeated"),
+    tag: Optional[List[str]] = typer.Option(None, "--tag", "-t",
+                                            help="Query the documents with this tag, can be repeated"),
+    all_documents: bool = typer.Option(False, "--all", help="Query every embedded document"),
     query: str = typer.Option(..., "--query", "-q", help="Query string"),
+    top_k: int = typer.Option(5, "--top-k", "-k", min=1, help="Number of chunks used as context"),
+    mode: str = typer.Option("vector", "--mode", "-m", help="Retrieval mode (vector, lexical or hybrid)"),
+    no_daemon: bool = typer.Option(False, "--no-daemon", help="Answer in this process even if the daemon is running"),
+    stream: bool = typer.Option(False, "--stream", "-s",
+                                help="Print the answer as it is generated, with a latency breakdown"),
+    profile: bool = typer.Option(False, "--profile", help="Print the time spent in each stage, answering in this process"),
+    trace_file: Optional[Path] = typer.Option(None, "--trace-file",
+                                              help="Append the spans of each stage to this file as OpenTelemetry JSON"),
 ) -> None:
     """
     Query the document.
 
-    This command queries the document.
+    This command queries the document. With several document ids, tags or
+    --all, the chunks of all the selected documents are searched at once.
 
     Args:
-        document_id (str): Document ID to query.
+        document_id (List[str]): Document IDs to query.
+        tag (List[str]): Query the documents with any of these tags.
+        all_documents (bool): Query every embedded document.
         query (str): Query string.
+        top_k (int): Number of chunks used as context.
+        mode (str): Retrieval mode: vector similarity, BM25 keyword search or both fused.
+        no_daemon (bool): Do not forward the query to the daemon.
+        stream (bool): Print the answer as it is generated.
+        profile (bool): Print the time spent in each stage.
+        trace_file (Path): File the spans are exported to.
     Returns:
         None
     """
-    rag_doc_operations = get_docs()
-    response = rag_doc_operations.query_document(document_id, query)
+    if bool(document_id) + bool(tag) + all_documents != 1:
+        typer.secho('Query document failed: "provide --document-id, --tag or --all"', fg=typer.colors.RED, bold=True)
+        raise typer.Exit(code=1)
+    mode = mode.lower()
+    if mode not in ("vector", "lexical", "hybrid"):
+        typer.secho(f'Query document failed: "unknown mode {mode}, use vector, lexical or hybrid"',
+                    fg=typer.colors.RED, bold=True)
+        raise typer.Exit(code=1)
+    streamed = []
+
+    def print_token(token: str) -> None:
+        if not streamed:
+            typer.echo(f"\nQuestion: {query}\n\nResponse: ", nl=False)
+        streamed.append(token)
+        typer.echo(token, nl=False)
+
+    response = None
+    # The stages of a query answered by the daemon cannot be measured here
+    if not no_daemon and not profile and trace_file is None:
+        # Forward the query to the daemon, which keeps its clients and stores open
+        from ragctl.daemon import client
+        if stream:
+            events = client.query_stream(query, document_ids=document_id, tags=tag, k=top_k, mode=mode)
+            for event in events or []:
+                if "token" in event:
+                    print_token(event["token"])
+                else:
+                    response = event
+            if streamed and response is None:
+                typer.secho('\nQuery document failed: "the daemon stopped answering"', fg=typer.colors.RED, bold=True)
+                raise typer.Exit(code=1)
+        else:
+            response = client.query(query, document_ids=document_id, tags=tag, k=top_k, mode=mode)
+    if response is None:
+        rag_doc_operations = get_docs()
+        with traced("query", profile, trace_file):
+            response = rag_doc_operations.query_documents(query, document_ids=document_id, tags=tag, k=top_k,
+                                                          on_token=print_token if stream else None, mode=mode)
     if response['error'] != SUCCESS:
         typer.secho(f'Query document failed: "{ERRORS[response["error"]]}"', fg=typer.colors.RED, bold=True)
         raise typer.Exit(code=1)
+    elif stream:
+        timings = response['timings']
+        breakdown = [f"retrieval {timings['retrieval_seconds']:.2f}s"]
+        if timings['first_token_seconds'] is not None:
+            breakdown.append(f"first token {timings['first_token_seconds']:.2f}s")
+        breakdown.append(f"generation {timings['generation_seconds']:.2f}s")
+        breakdown.append(f"total {timings['total_seconds']:.2f}s")
+        typer.echo(f"\n\nSources: {', '.join(response['sources'])}")
+        typer.secho(f"Latency: {', '.join(breakdown)}", dim=True)
     else:
-        typer.echo(response['result'])
\ No newline at end of file
+        typer.echo(response['result'])
+
+# Command: Serve queries from a long-running daemon
+@app.command(help="Serve queries from a daemon that keeps its clients and stores open")
+def serve(
+    socket_path: Optional[Path] = typer.Option(None, "--socket", help="Unix socket to listen on"),
+) -> None:
+    """
+    Serve queries from a long-running daemon.
+
+    This command loads the catalog, the vector store and the embedding and
+    LLM clients once and answers queries on a unix socket. While it runs,
+    `ragctl query` forwards its queries to it.
+
+    Args:
+        socket_path (Path): Unix socket to listen on, by default the configured one.
+    Returns:
+        None
+    """
+    from ragctl.daemon import client
+    socket_path = socket_path or client.get_socket_path()
+    if client.is_running(socket_path):
+        typer.secho(f'Serve failed: "a daemon is already running on {socket_path}"', fg=typer.colors.RED, bold=True)
+        raise typer.Exit(code=1)
+    # Check the application and database are initialized
+    get_docs()
+    from ragctl.daemon.server import serve as serve_queries
+    typer.secho(f'Serving queries on {socket_path}', fg=typer.colors.GREEN, bold=True)
+    serve_queries(database.get_database_path(config.CONFIG_FILE), socket_path)
+
+# Command: Benchmark the pipeline stages
+@app.command(help="Benchmark every pipeline stage on a synthetic corpus with local stub backends")
+def bench(
+    documents: int = typer.Option(8, "--documents", help="Number of synthetic documents"),
+    size_kb: int = typer.Option(64, "--size-kb", help="Approximate text size of each document in KB"),
+    formats: str = typer.Option("txt,pdf,docx,csv", "--formats", help="Comma-separated document formats, among txt, pdf, docx, csv, xlsx and html"),
+    queries: int = typer.Option(20, "--queries", help="Questions measured per retrieval mode"),
+    k: int = typer.Option(5, "--k", "-k", help="Number of chunks retrieved per question"),
+    output: Optional[Path] = typer.Option(None, "--output", "-o", help="Write the results to this JSON file"),
+    baseline: Optional[Path] = typer.Option(None, "--baseline", help="Compare against the results of an earlier run"),
+    tolerance: float = typer.Option(0.2, "--tolerance", help="Relative slowdown tolerated before a stage regresses"),
+) -> None:
+    """
+    Benchmark every pipeline stage on a synthetic corpus.
+
+    This command generates documents of the given formats, adds, processes and
+    queries them with the stub embedding and LLM backends in a temporary catalog,
+    and prints the throughput and latency percentiles of each stage as JSON.
+    Nothing is written to the configured catalog or vector store.
+
+    Args:
+        documents (int): Number of synthetic documents.
+        size_kb (int): Approximate text size of each document in KB.
+        formats (str): Comma-separated document formats.
+        queries (int): Questions measured per retrieval mode.
+        k (int): Number of chunks retrieved per question.
+        output (Path): JSON file the results are written to, to use as a baseline later.
+        baseline (Path): JSON results of an earlier run to compare against.
+        tolerance (float): Relative slowdown tolerated before a stage regresses.
+    Returns:
+        None
+    """
+    from ragctl.benchmark.pipeline import run
+    if baseline is not None and not baseline.exists():
+        typer.secho(f'Bench failed: "baseline {baseline} not found"', fg=typer.colors.RED, bold=True)
+        raise typer.Exit(code=1)
+    try:
+        status = run(documents, size_kb, tuple(name.strip().lower() for name in formats.split(",")),
+                     queries, k, str(output) if output else None, str(baseline) if baseline else None, tolerance)
+    except Exception as e:
+        typer.secho(f'Bench failed: "{e}"', fg=typer.colors.RED, bold=True)
+        raise typer.Exit(code=1)
+    if status:
+        raise typer.Exit(code=status)
+
+# Command group: Manage the embedding cache
+cache_app = typer.Typer(help="Manage the embedding cache")
+app.add_typer(cache_app, name="cache")
+
+@cache_app.command("stats", help="Show the embedding and query cache statistics")
+def cache_stats(
+    output: str = typer.Option("table", "--output", "-o", help="Output format (table or json)."),
+) -> None:
+    """
+    Show the embedding and query cache statistics.
+
+    This command shows the number of cached vectors, the cache size and the hit/miss counters.
+    When the query daemon is running, the statistics of its in-memory question
+    embedding and retrieval result caches are shown too.
+
+    Args:
+        output (str): Output format (table or json).
+    Returns:
+        None
+    """
+    from ragctl.embedding.cache import get_embedding_cache
+    from ragctl.daemon import client
+    stats = get_embedding_cache().stats()
+    query_stats = client.stats() or {}
+
+    def hit_rate(hits: int, misses: int) -> float:
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    if output.lower() == "json":
+        json_output = {**stats._asdict(), "hit_rate": round(hit_rate(stats.hits, stats.misses), 4)}
+        for name, cache in query_stats.items():
+            json_output[name] = {**cache, "hit_rate": round(hit_rate(cache["hits"], cache["misses"]), 4)}
+        typer.echo(json.dumps(json_output, indent=4))
+    else:
+        table = Table(title_justify="left")
+        table.add_column("Cache", width=22)
+        table.add_column("Entries", width=10)
+        table.add_column("Size", width=22)
+        table.add_column("Hits", width=10)
+        table.add_column("Misses", width=10)
+        table.add_column("Hit rate", width=9)
+        table.add_row("embeddings", str(stats.entries),
+                      f"{stats.size / (1024 * 1024):.2f} / {stats.max_size / (1024 * 1024):.0f} MB",
+                      str(stats.hits), str(stats.misses), f"{hit_rate(stats.hits, stats.misses):.1%}")
+        for name, cache in query_stats.items():
+            table.add_row(name.replace("_", " "), str(cache["entries"]),
+                          f'{cache["entries"]} / {cache["max_entries"]} entries',
+                          str(cache["hits"]), str(cache["misses"]), f'{hit_rate(cache["hits"], cache["misses"]):.1%}')
+        console = Console()
+        console.print(table)
+
+@cache_app.command("clear", help="Clear the embedding cache")
+def cache_clear(
+    force: bool = typer.Option(..., prompt="Clear the embedding cache?",
+                               help="Force clear the embedding cache")
+) -> None:
+    """
+    Clear the embedding cache.
+
+    This command deletes all the cached vectors and resets the hit/miss counters.
+
+    Args:
+        None
+    Returns:
+        None
+    """
+    if force:
+        from ragctl.embedding.cache import get_embedding_cache
+        get_embedding_cache().clear()
+        typer.secho('Embedding cache cleared successfully!', fg=typer.colors.GREEN, bold=True)
+    else:
+        typer.secho('Clear embedding cache canceled.', fg=typer.colors.YELLOW, bold=True)
+        raise typer.Exit(code=1)
@@ -1,6 +1,7 @@
 # ragctl/config.py
 
 import configparser
+from typing import Optional
 from pathlib import Path
 import typer
 import os
@@ -24,6 +25,29 @@ AWS_CREDENTIALS_FILE = os.path.join(os.path.expanduser("~"), ".aws", "credential
 # Set AWS Config path
 AWS_CONFIG_FILE = os.path.join(os.path.expanduser("~"), ".aws", "config")
 
+# Set embedding cache path
+EMBEDDING_CACHE_FILE = CONFIG_PATH / "embedding_cache.db"
+
+# Set query daemon socket path
+DAEMON_SOCKET_FILE = CONFIG_PATH / "ragctl.sock"
+
+# Function: Read an option from the configuration file
+def get_option(section: str, option: str, fallback: Optional[str]) -> Optional[str]:
+    """
+    Read an option from the configuration file.
+
+    Args:
+        section (str): The configuration section.
+        option (str): The option name.
+        fallback (Optional[str]): The value returned when the option is not set.
+
+    Returns:
+        Optional[str]: The option value.
+    """
+    config_parser = configparser.ConfigParser()
+    config_parser.read(CONFIG_FILE)
+    return config_parser.get(section, option, fallback=fallback)
+
 # Function: Initialize the application
 def init_app(db_path: str) -> int:
     init_config = _create_config()
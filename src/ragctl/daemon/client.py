@@ -0,0 +1,129 @@
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from ragctl import config
+import http.client
+import json
+import socket
+
+# Seconds to wait for the daemon to accept a connection
+CONNECT_TIMEOUT = 1.0
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a unix domain socket"""
+    def __init__(self, socket_path: Path, timeout: Optional[float] = None) -> None:
+        super().__init__("localhost")
+        self.socket_path = socket_path
+        self.read_timeout = timeout
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(CONNECT_TIMEOUT)
+        self.sock.connect(str(self.socket_path))
+        self.sock.settimeout(self.read_timeout)
+
+def get_socket_path() -> Path:
+    """Return the daemon socket path from the [Daemon] configuration section"""
+    return Path(config.get_option("Daemon", "socket", str(config.DAEMON_SOCKET_FILE)))
+
+def _open(method: str, path: str, body: Optional[Dict[str, Any]], socket_path: Optional[Path],
+          timeout: Optional[float]) -> Optional[tuple]:
+    # Send a request and return the connection and its response, or None if the daemon is not running
+    socket_path = socket_path or get_socket_path()
+    if not socket_path.exists():
+        return None
+    connection = UnixHTTPConnection(socket_path, timeout)
+    try:
+        payload = json.dumps(body).encode() if body is not None else None
+        connection.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        if response.status == 200:
+            return connection, response
+    except (OSError, http.client.HTTPException):
+        # Also covers a socket file left behind by a daemon that is gone
+        pass
+    connection.close()
+    return None
+
+def request(method: str, path: str, body: Optional[Dict[str, Any]] = None,
+            socket_path: Optional[Path] = None, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+        Send a request to the query daemon.
+
+        Args:
+            method: HTTP method
+            path: Request path
+            body: JSON request body
+            socket_path: Daemon socket, by default the configured one
+            timeout: Seconds to wait for the response, or None to wait until it arrives
+        Return:
+            The JSON response, or None if the daemon is not running or failed
+    """
+    opened = _open(method, path, body, socket_path, timeout)
+    if opened is None:
+        return None
+    connection, response = opened
+    try:
+        return json.loads(response.read())
+    except (OSError, http.client.HTTPException, ValueError):
+        return None
+    finally:
+        connection.close()
+
+def request_stream(method: str, path: str, body: Optional[Dict[str, Any]] = None,
+                   socket_path: Optional[Path] = None) -> Optional[Iterator[Dict[str, Any]]]:
+    """
+        Send a request to the query daemon and read its response as
+        newline-delimited JSON events.
+
+        Return:
+            Iterator of the events as they arrive, or None if the daemon is not running
+    """
+    opened = _open(method, path, body, socket_path, None)
+    if opened is None:
+        return None
+    connection, response = opened
+
+    def events() -> Iterator[Dict[str, Any]]:
+        try:
+            while line := response.readline():
+                yield json.loads(line)
+        except (OSError, http.client.HTTPException, ValueError):
+            # The daemon stopped answering; the caller sees the events end early
+            return
+        finally:
+            connection.close()
+    return events()
+
+def is_running(socket_path: Optional[Path] = None) -> bool:
+    """Return True if a daemon answers on the socket"""
+    return request("GET", "/health", socket_path=socket_path, timeout=CONNECT_TIMEOUT) is not None
+
+def stats() -> Optional[Dict[str, Any]]:
+    """
+        Return:
+            The query cache statistics of the daemon, or None if it is not running
+    """
+    return request("GET", "/stats", timeout=CONNECT_TIMEOUT)
+
+def query(query: str, document_ids: Optional[List[str]] = None, tags: Optional[List[str]] = None,
+          k: int = 5, mode: str = "vector") -> Optional[Dict[str, Any]]:
+    """
+        Answer a question through the query daemon.
+
+        Return:
+            The query_documents result, or None if the daemon is not running
+    """
+    return request("POST", "/query", {"query": query, "document_ids": document_ids, "tags": tags, "k": k,
+                                      "mode": mode})
+
+def query_stream(query: str, document_ids: Optional[List[str]] = None, tags: Optional[List[str]] = None,
+                 k: int = 5, mode: str = "vector") -> Optional[Iterator[Dict[str, Any]]]:
+    """
+        Answer a question through the query daemon, streaming the answer.
+
+        Return:
+            Iterator of {"token": ...} events followed by the query_documents
+            result, or None if the daemon is not running
+    """
+    return request_stream("POST", "/query", {"query": query, "document_ids": document_ids, "tags": tags,
+                                             "k": k, "mode": mode, "stream": True})
@@ -0,0 +1,151 @@
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import List, Optional
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from ragctl.query_document.cache import get_query_cache_stats
+from ragctl.ragctl import RagDocOperations
+import json
+import os
+import queue
+import socket
+import threading
+import uvicorn
+
+class QueryRequest(BaseModel):
+    query: str
+    document_ids: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
+    k: int = 5
+    mode: str = "vector"
+    # Stream the answer as newline-delimited JSON events
+    stream: bool = False
+
+class _StoreLock:
+    """
+        Let queries use the open stores together, and reopening them wait
+        until the queries already running are done. Queries arriving while
+        a reopen waits are held back, so it is not starved.
+    """
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._queries = 0
+        self._reopening = False
+
+    @contextmanager
+    def query(self):
+        with self._condition:
+            while self._reopening:
+                self._condition.wait()
+            self._queries += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._queries -= 1
+                if not self._queries:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def reopen(self):
+        with self._condition:
+            while self._reopening:
+                self._condition.wait()
+            self._reopening = True
+            while self._queries:
+                self._condition.wait()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._reopening = False
+                self._condition.notify_all()
+
+def create_app(db_path: Path, socket_path: Optional[Path] = None) -> FastAPI:
+    """
+        Build the query daemon application. The catalog, the vector store and
+        the embedding and LLM clients are opened once, at startup, and reused
+        by every query.
+
+        Args:
+            db_path: The catalog path
+            socket_path: Socket removed when the daemon stops
+        Return:
+            The FastAPI application
+    """
+    operations = RagDocOperations(db_path)
+    operations.warm_up()
+    store_lock = _StoreLock()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        # Clean up before uvicorn re-raises the signal that stopped it
+        if socket_path is not None:
+            socket_path.unlink(missing_ok=True)
+
+    app = FastAPI(title="ragctl", lifespan=lifespan)
+
+    @app.get("/health")
+    def health() -> dict:
+        return {"status": "ok", "pid": os.getpid(), "database": str(db_path)}
+
+    @app.get("/stats")
+    def stats() -> dict:
+        return get_query_cache_stats()
+
+    # Queries run on the server's thread pool
+    @app.post("/query")
+    def query(request: QueryRequest):
+        # Reopening the vector store closes it under the queries still using it
+        if operations.is_stale():
+            with store_lock.reopen():
+                operations.refresh()
+        if not request.stream:
+            with store_lock.query():
+                return operations.query_documents(request.query, document_ids=request.document_ids,
+                                                  tags=request.tags, k=request.k, mode=request.mode)
+        # Answer on a worker thread and send each token as it is generated,
+        # then the query result
+        events = queue.Queue()
+
+        def answer() -> None:
+            try:
+                with store_lock.query():
+                    result = operations.query_documents(request.query, document_ids=request.document_ids,
+                                                        tags=request.tags, k=request.k, mode=request.mode,
+                                                        on_token=lambda token: events.put({"token": token}))
+                events.put(result)
+            finally:
+                events.put(None)
+
+        def lines():
+            while (event := events.get()) is not None:
+                yield json.dumps(event) + "\n"
+
+        threading.Thread(target=answer, daemon=True).start()
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return app
+
+def serve(db_path: Path, socket_path: Path) -> None:
+    """
+        Serve queries on a unix socket until interrupted.
+
+        Args:
+            db_path: The catalog path
+            socket_path: The socket to listen on
+    """
+    # The socket appears once the daemon is warm
+    app = create_app(db_path, socket_path)
+    # Bind the socket ourselves so only the owner can connect to it
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    socket_path.unlink(missing_ok=True)
+    listener.bind(str(socket_path))
+    os.chmod(socket_path, 0o600)
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    try:
+        server.run(sockets=[listener])
+    finally:
+        socket_path.unlink(missing_ok=True)
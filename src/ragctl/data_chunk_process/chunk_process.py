@@ -1,31 +1,113 @@
 import nltk
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
+from collections import deque
+from concurrent.futures import Executor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+import threading
 
-# Ensure the necessary NLTK data is downloaded. Once it is downloaded don't try to download again
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords', quiet=True)
+# Chunks sent to a worker process at a time
+DEFAULT_BATCH_SIZE = 64
+
+# The NLTK data is looked up, and downloaded if missing, on first use
+# rather than at import time
+_nltk_data_ready = False
+
+# English stop words, loaded once per process
+_stop_words = None
+
+# NLTK's lazy loaders are not thread-safe
+_nltk_lock = threading.Lock()
+
+def _ensure_nltk_data() -> None:
+    global _nltk_data_ready
+    if _nltk_data_ready:
+        return
+    # Ensure the necessary NLTK data is downloaded. Once it is downloaded don't try to download again
+    try:
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        nltk.download('punkt', quiet=True)
+    try:
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        nltk.download('stopwords', quiet=True)
+    _nltk_data_ready = True
+
+def _get_stop_words() -> frozenset:
+    global _stop_words
+    if _stop_words is None:
+        with _nltk_lock:
+            if _stop_words is None:
+                _ensure_nltk_data()
+                # Load the sentence tokenizer before other threads use it
+                word_tokenize("")
+                _stop_words = frozenset(stopwords.words('english'))
+    return _stop_words
+
+def _filter_texts(texts: List[str]) -> List[str]:
+    # Tokenize the texts and remove stop words
+    stop_words = _get_stop_words()
+    filtered_texts = []
+    for text in texts:
+        tokens = word_tokenize(text)
+        filtered_texts.append(' '.join(word for word in tokens if word.lower() not in stop_words))
+    return filtered_texts
+
+def _batched(items: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    items = iter(items)
+    while batch := list(islice(items, batch_size)):
+        yield batch
 
 class DataChunkProcess:
     def __init__(self, data_chunk) -> None:
         self.data_chunk = data_chunk
-    
-    def process(self) -> dict:
-        # Tokenize the text
-        tokens = word_tokenize(self.data_chunk)
 
-        # Remove stop words
-        stop_words = set(stopwords.words('english'))
-        filtered_tokens = [word for word in tokens if word.lower() not in stop_words]
-        filtered_text = ' '.join(filtered_tokens)
+    def process(self) -> dict:
         result = {
             "data_chunk": self.data_chunk,
-            "filtered_text": filtered_text
+            "filtered_text": _filter_texts([self.data_chunk])[0]
         }
-        return result
\ No newline at end of file
+        return result
+
+    @staticmethod
+    def process_batch(data_chunks: Iterable[str], executor: Optional[Executor] = None,
+                      batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[dict]:
+        """
+        Remove stop words from many chunks, loading the stop words and the
+        tokenizer once. With a process pool executor, batches of chunks are
+        filtered in parallel; results are always returned in input order.
+
+        Args:
+            data_chunks (Iterable[str]): The chunk texts.
+            executor (Optional[Executor]): Pool to fan batches out to, or None to filter in this process.
+            batch_size (int): Number of chunks sent to a worker at a time.
+        Returns:
+            Iterator[dict]: The data_chunk and filtered_text of each chunk, as process() returns.
+        """
+        batches = _batched(data_chunks, batch_size)
+        if executor is None:
+            filtered_batches = ((batch, _filter_texts(batch)) for batch in batches)
+        else:
+            filtered_batches = DataChunkProcess._fan_out(batches, executor)
+        for batch, filtered_texts in filtered_batches:
+            for data_chunk, filtered_text in zip(batch, filtered_texts):
+                yield {
+                    "data_chunk": data_chunk,
+                    "filtered_text": filtered_text
+                }
+
+    @staticmethod
+    def _fan_out(batches: Iterator[List[str]], executor: Executor) -> Iterator[tuple]:
+        # Keep a bounded number of batches in flight and yield them in order
+        max_pending = 2 * (getattr(executor, "_max_workers", None) or 1)
+        pending = deque()
+        for batch in batches:
+            if len(pending) >= max_pending:
+                done_batch, future = pending.popleft()
+                yield done_batch, future.result()
+            pending.append((batch, executor.submit(_filter_texts, batch)))
+        while pending:
+            done_batch, future = pending.popleft()
+            yield done_batch, future.result()
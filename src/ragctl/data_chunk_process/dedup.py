@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional, Tuple
+from ragctl import config
+import hashlib
+import numpy as np
+import zlib
+
+# Default Jaccard similarity of the filtered tokens above which a chunk is a near-duplicate
+DEFAULT_THRESHOLD = 0.75
+
+# Default number of MinHash permutations per fingerprint
+DEFAULT_PERMUTATIONS = 64
+
+# Words per shingle, so near-duplicates also share their word order. A word
+# changed in a short header, such as a page number, keeps most pairs alike
+SHINGLE_SIZE = 2
+
+# Hashes are permuted by multiply-shift hashing: multiplied by an odd 64-bit
+# number, plus an offset, modulo 2**64, keeping the high 32 bits
+_SHIFT = np.uint64(32)
+
+def _bands(permutations: int, threshold: float) -> Tuple[int, int]:
+    """
+        Return the (bands, rows) of the LSH index. Fingerprints sharing one
+        band are compared, which happens mostly above (1 / bands) ** (1 / rows),
+        so the layout with the highest such threshold below the similarity
+        threshold misses few near-duplicates while comparing few chunks.
+    """
+    layouts = [(permutations // rows, rows) for rows in range(1, permutations + 1) if permutations % rows == 0]
+    below = [(bands, rows) for bands, rows in layouts if (1 / bands) ** (1 / rows) <= threshold]
+    if not below:
+        # Below 1 / permutations, one row per band compares the most chunks there can be
+        return permutations, 1
+    return max(below, key=lambda layout: (1 / layout[0]) ** (1 / layout[1]))
+
+class NearDuplicateIndex:
+    """
+        MinHash fingerprints of the chunks of a document, indexed with
+        locality-sensitive hashing. A chunk whose shingles have an estimated
+        Jaccard similarity with an indexed chunk of at least the threshold is
+        a near-duplicate of it.
+    """
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, permutations: int = DEFAULT_PERMUTATIONS,
+                 shingle_size: int = SHINGLE_SIZE, seed: int = 1) -> None:
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(0, 1 << 64, size=permutations, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.randint(0, 1 << 64, size=permutations, dtype=np.uint64)
+        self.bands, self.rows = _bands(permutations, threshold)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: Dict[int, np.ndarray] = {}
+        # Digests of the filtered texts, finding chunks with the same text without
+        # fingerprints and without holding the texts of the whole document
+        self._texts: Dict[bytes, int] = {}
+
+    def _signature(self, text: str) -> Optional[np.ndarray]:
+        tokens = text.split()
+        if not tokens:
+            return None
+        size = min(self.shingle_size, len(tokens))
+        shingles = {" ".join(tokens[start:start + size]) for start in range(len(tokens) - size + 1)}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # Arithmetic modulo 2**64 is what numpy's uint64 wraparound does
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) >> _SHIFT
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def add(self, key: int, text: str) -> Optional[int]:
+        """
+            Index a chunk unless it nearly duplicates an indexed one
+            Args:
+                key: Chunk index
+                text: Filtered text of the chunk
+            Return:
+                The key of the indexed chunk it duplicates, or None once indexed
+        """
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        if digest in self._texts:
+            return self._texts[digest]
+        signature = self._signature(text)
+        if signature is None:
+            self._texts[digest] = key
+            return None
+        bands = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+        compared = set()
+        for buckets, band in zip(self._buckets, bands):
+            for candidate in buckets.get(band, ()):
+                if candidate not in compared:
+                    compared.add(candidate)
+                    if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                        return candidate
+        self._texts[digest] = key
+        self._signatures[key] = signature
+        for buckets, band in zip(self._buckets, bands):
+            buckets.setdefault(band, []).append(key)
+        return None
+
+def get_dedup_index() -> Optional[NearDuplicateIndex]:
+    """
+        Return an empty index of the chunks of a document, as set with
+        dedup_threshold and dedup_permutations in the [Processing] section,
+        or None when dedup_threshold is 0
+    """
+    threshold = float(config.get_option("Processing", "dedup_threshold", str(DEFAULT_THRESHOLD)))
+    if threshold == 0:
+        return None
+    if not 0 < threshold <= 1:
+        raise ValueError("dedup_threshold must be between 0 and 1")
+    permutations = int(config.get_option("Processing", "dedup_permutations", str(DEFAULT_PERMUTATIONS)))
+    if permutations <= 0:
+        raise ValueError("dedup_permutations must be positive")
+    return NearDuplicateIndex(threshold, permutations)
@@ -3,13 +3,70 @@
 import configparser
 from pathlib import Path
 import json
+import sqlite3
+import threading
 from typing import Any, Dict, List, NamedTuple
 from ragctl import (
     DB_WRITE_ERROR, SUCCESS, DB_READ_ERROR
 )
 
 # Set default database path
-DEFAULT_DB_FILE = Path.home().joinpath("." + Path.home().stem + "_ragctl.json")
+DEFAULT_DB_FILE = Path.home().joinpath("." + Path.home().stem + "_ragctl.db")
+
+# Document processing states
+STATE_PENDING = "pending"
+STATE_PARTIAL = "partial"
+STATE_EMBEDDED = "embedded"
+STATE_FAILED = "failed"
+
+# Catalog columns in display order. Columns missing from an existing
+# catalog are added when it is opened.
+_COLUMNS = {
+    "id": "TEXT PRIMARY KEY",
+    "md5sum": "TEXT NOT NULL",
+    "size": "TEXT",
+    "name": "TEXT",
+    "path": "TEXT",
+    "state": f"TEXT NOT NULL DEFAULT '{STATE_PENDING}'",
+    "checkpoint": "INTEGER NOT NULL DEFAULT 0",
+    "type": "TEXT",
+    "format_meta": "TEXT",
+    "source": "TEXT",
+    "source_size": "INTEGER",
+    "source_mtime": "INTEGER",
+    "tags": "TEXT",
+    "embedded_at": "REAL",
+    "embedding_backend": "TEXT",
+    "embedding_model": "TEXT",
+    "vector_store": "TEXT",
+    "chunking": "TEXT",
+}
+
+# Columns of the blob store table, one row per stored content hash
+_BLOB_COLUMNS = {
+    "hash": "TEXT PRIMARY KEY",
+    "path": "TEXT NOT NULL",
+    "size": "INTEGER NOT NULL",
+    "stored_size": "INTEGER NOT NULL",
+    "method": "TEXT NOT NULL",
+    "compression": "TEXT NOT NULL DEFAULT 'none'",
+    "refs": "INTEGER NOT NULL DEFAULT 1",
+    "created_at": "REAL",
+}
+
+# Statements run once, when their column is added to an existing catalog
+_COLUMN_MIGRATIONS = {
+    "state": [
+        f"UPDATE documents SET state = CASE embedded WHEN 'True' THEN '{STATE_EMBEDDED}' ELSE '{STATE_PENDING}' END",
+        "ALTER TABLE documents DROP COLUMN embedded",
+    ],
+}
+
+# Catalog indexes: index name -> indexed column
+_INDEXES = {
+    "idx_documents_md5sum": "md5sum",
+    "idx_documents_source": "source",
+}
 
 def get_database_path(config_file: Path) -> Path:
     """
@@ -22,6 +79,27 @@ def get_database_path(config_file: Path) -> Path:
     config_parser.read(config_file)
     return Path(config_parser["General"]["database"])
 
+def get_catalog_path(db_path: Path) -> Path:
+    """
+        Args:
+            db_path: Path to the database file as stored in the configuration
+        Return:
+            Path to the SQLite catalog. Legacy "*.json" databases are kept
+            next to their migrated catalog with a ".db" suffix.
+    """
+    if db_path.suffix == ".json":
+        return db_path.with_suffix(".db")
+    return db_path
+
+def database_exists(db_path: Path) -> bool:
+    """
+        Args:
+            db_path: Path to the database file as stored in the configuration
+        Return:
+            True if the catalog or a legacy JSON database to migrate exists
+    """
+    return get_catalog_path(db_path).exists() or db_path.exists()
+
 def init_database(db_path: Path) -> int:
     """
         Args:
@@ -31,11 +109,42 @@ def init_database(db_path: Path) -> int:
             DB_WRITE_ERROR if there is an error writing to the database file
     """
     try:
-        db_path.write_text("[]")
+        connection = _connect(get_catalog_path(db_path))
+        try:
+            with connection:
+                connection.execute("DELETE FROM documents")
+                connection.execute("DELETE FROM blobs")
+        finally:
+            connection.close()
         return SUCCESS
-    except OSError:
+    except (OSError, sqlite3.Error):
         return DB_WRITE_ERROR
 
+def _connect(catalog_path: Path) -> sqlite3.Connection:
+    # Open the catalog and bring its schema up to date
+    connection = sqlite3.connect(catalog_path, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    with connection:
+        columns = ", ".join(f"{name} {ddl}" for name, ddl in _COLUMNS.items())
+        connection.execute(f"CREATE TABLE IF NOT EXISTS documents ({columns})")
+        existing = {row["name"] for row in connection.execute("PRAGMA table_info(documents)")}
+        for name, ddl in _COLUMNS.items():
+            if name not in existing:
+                connection.execute(f"ALTER TABLE documents ADD COLUMN {name} {ddl}")
+                for statement in _COLUMN_MIGRATIONS.get(name, []):
+                    try:
+                        connection.execute(statement)
+                    except sqlite3.OperationalError:
+                        # DROP COLUMN needs SQLite 3.35; an unused column is harmless
+                        pass
+        for index, column in _INDEXES.items():
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {index} ON documents ({column})")
+        columns = ", ".join(f"{name} {ddl}" for name, ddl in _BLOB_COLUMNS.items())
+        connection.execute(f"CREATE TABLE IF NOT EXISTS blobs ({columns})")
+    return connection
+
 class DBResponse(NamedTuple):
     """
         A named tuple to represent the response from the database
@@ -49,33 +158,282 @@ class DatabaseHandler:
     """
     def __init__(self, db_path: Path) -> None:
         self._db_path = db_path
-    
+        self._catalog_path = get_catalog_path(db_path)
+        migrate = not self._catalog_path.exists() and db_path.suffix == ".json" and db_path.exists()
+        self._connection = _connect(self._catalog_path)
+        # The connection is shared by the threads of parallel commands
+        self._lock = threading.RLock()
+        if migrate:
+            self._migrate_legacy_json()
+
+    def _migrate_legacy_json(self) -> None:
+        # One-shot import of the legacy whole-file JSON database
+        try:
+            with open(self._db_path, "r") as file:
+                data = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return
+        for doc in data:
+            doc.setdefault("state", STATE_EMBEDDED if doc.get("embedded") == "True" else STATE_PENDING)
+            doc.setdefault("checkpoint", 0)
+        # Keep the first entry when legacy ids collide, as lookups did
+        try:
+            with self._lock, self._connection:
+                self._connection.execute("DELETE FROM documents")
+                self._connection.executemany(self._insert_sql("OR IGNORE"),
+                                             [self._row_params(doc) for doc in data])
+        except sqlite3.Error:
+            return
+        else:
+            self._db_path.rename(self._db_path.with_name(self._db_path.name + ".bak"))
+
+    def _rows(self, sql: str, params: tuple = ()) -> DBResponse:
+        try:
+            with self._lock:
+                cursor = self._connection.execute(sql, params)
+                return DBResponse([dict(row) for row in cursor], SUCCESS)
+        except sqlite3.Error:
+            return DBResponse([], DB_READ_ERROR)
+
+    def _insert_sql(self, conflict: str = "") -> str:
+        names = ", ".join(_COLUMNS)
+        values = ", ".join(f":{name}" for name in _COLUMNS)
+        return f"INSERT {conflict} INTO documents ({names}) VALUES ({values})"
+
+    def _row_params(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        return {name: document.get(name) for name in _COLUMNS}
+
     def read(self) -> DBResponse:
         """
-            Read the database file
+            Read all the documents in the catalog
+            Return:
+                DBResponse: A named tuple containing the data and error code
+        """
+        return self._rows("SELECT * FROM documents ORDER BY rowid")
+
+    def get(self, document_id: str) -> DBResponse:
+        """
+            Look up a document by id
+            Args:
+                document_id: The document id
+            Return:
+                DBResponse: A named tuple containing the matching document, if any
+        """
+        return self._rows("SELECT * FROM documents WHERE id = ?", (document_id,))
+
+    def find_by_hash(self, doc_hash: str) -> DBResponse:
+        """
+            Look up documents by content hash
+            Args:
+                doc_hash: The document hash
+            Return:
+                DBResponse: A named tuple containing the matching documents
+        """
+        return self._rows("SELECT * FROM documents WHERE md5sum = ?", (doc_hash,))
+
+    def find_by_source(self, source: str) -> DBResponse:
+        """
+            Look up documents by the path they were added from
+            Args:
+                source: Absolute path of the original document
+            Return:
+                DBResponse: A named tuple containing the matching documents
+        """
+        return self._rows("SELECT * FROM documents WHERE source = ?", (source,))
+
+    def find_by_tags(self, tags: List[str]) -> DBResponse:
+        """
+            Look up documents carrying any of the tags
+            Args:
+                tags: Tag names
+            Return:
+                DBResponse: A named tuple containing the matching documents
+        """
+        # Tags are stored comma-separated; match whole tags only
+        condition = " OR ".join("',' || tags || ',' LIKE '%,' || ? || ',%'" for _ in tags)
+        return self._rows(f"SELECT * FROM documents WHERE {condition} ORDER BY rowid", tuple(tags))
+
+    def find_unembedded(self) -> DBResponse:
+        """
+            Return:
+                DBResponse: A named tuple containing the documents not fully embedded yet
+        """
+        return self._rows("SELECT * FROM documents WHERE state != ? ORDER BY rowid", (STATE_EMBEDDED,))
+
+    def revision(self) -> int:
+        """
+            Return:
+                A number that changes whenever another connection commits to the catalog
+        """
+        with self._lock:
+            return self._connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def count(self) -> int:
+        """
+            Return:
+                Number of documents in the catalog
+        """
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def insert(self, documents: List[Dict[str, Any]]) -> DBResponse:
+        """
+            Insert documents in a single transaction
+            Args:
+                documents: List of dictionaries to be inserted into the database
             Return:
                 DBResponse: A named tuple containing the data and error code
         """
         try:
-            with open(self._db_path, "r") as file:
-                try:
-                    return DBResponse(json.load(file), SUCCESS)
-                except json.JSONDecodeError:
-                    return DBResponse([], DB_READ_ERROR)
-        except OSError:
-            return DBResponse([], DB_READ_ERROR)
-    
+            with self._lock, self._connection:
+                self._connection.executemany(self._insert_sql(),
+                                             [self._row_params(doc) for doc in documents])
+            return DBResponse(documents, SUCCESS)
+        except sqlite3.Error:
+            return DBResponse(documents, DB_WRITE_ERROR)
+
+    def update(self, document_id: str, fields: Dict[str, Any]) -> DBResponse:
+        """
+            Update fields of a document
+            Args:
+                document_id: The document id
+                fields: Column values to set
+            Return:
+                DBResponse: A named tuple containing the updated fields and error code
+        """
+        try:
+            assignments = ", ".join(f"{name} = :{name}" for name in fields if name in _COLUMNS)
+            with self._lock, self._connection:
+                self._connection.execute(f"UPDATE documents SET {assignments} WHERE id = :_id",
+                                         {**fields, "_id": document_id})
+            return DBResponse([fields], SUCCESS)
+        except sqlite3.Error:
+            return DBResponse([fields], DB_WRITE_ERROR)
+
+    def update_many(self, updates: Dict[str, Dict[str, Any]]) -> DBResponse:
+        """
+            Update fields of several documents in a single transaction
+            Args:
+                updates: Column values to set, by document id
+            Return:
+                DBResponse: A named tuple containing the data and error code
+        """
+        try:
+            with self._lock, self._connection:
+                for document_id, fields in updates.items():
+                    assignments = ", ".join(f"{name} = :{name}" for name in fields if name in _COLUMNS)
+                    self._connection.execute(f"UPDATE documents SET {assignments} WHERE id = :_id",
+                                             {**fields, "_id": document_id})
+            return DBResponse([updates], SUCCESS)
+        except sqlite3.Error:
+            return DBResponse([updates], DB_WRITE_ERROR)
+
+    def delete(self, document_id: str) -> DBResponse:
+        """
+            Delete a document
+            Args:
+                document_id: The document id
+            Return:
+                DBResponse: A named tuple containing the data and error code
+        """
+        try:
+            with self._lock, self._connection:
+                self._connection.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+            return DBResponse([], SUCCESS)
+        except sqlite3.Error:
+            return DBResponse([], DB_WRITE_ERROR)
+
     def write(self, data: List[Dict[str, Any]]) -> DBResponse:
         """
-            Write to the database file
+            Replace the content of the database in a single transaction
             Args:
                 data: List of dictionaries to be written to the database
             Return:
                 DBResponse: A named tuple containing the data and error code
         """
         try:
-            with open(self._db_path, "w") as file:
-                json.dump(data, file, indent=4)
-                return DBResponse(data, SUCCESS)
-        except OSError:
-            return DBResponse(data, DB_WRITE_ERROR)
\ No newline at end of file
+            with self._lock, self._connection:
+                self._connection.execute("DELETE FROM documents")
+                self._connection.executemany(self._insert_sql(),
+                                             [self._row_params(doc) for doc in data])
+            return DBResponse(data, SUCCESS)
+        except sqlite3.Error:
+            return DBResponse(data, DB_WRITE_ERROR)
+
+    def get_blob(self, blob_hash: str) -> DBResponse:
+        """
+            Look up a stored blob
+            Args:
+                blob_hash: Content hash of the blob
+            Return:
+                DBResponse: A named tuple containing the matching blob, if any
+        """
+        return self._rows("SELECT * FROM blobs WHERE hash = ?", (blob_hash,))
+
+    def reference_blob(self, blob: Dict[str, Any]) -> DBResponse:
+        """
+            Record a blob with one reference, or add a reference to it when it is already stored
+            Args:
+                blob: Column values of the blob
+            Return:
+                DBResponse: A named tuple containing the blob and error code
+        """
+        try:
+            names = ", ".join(_BLOB_COLUMNS)
+            values = ", ".join(f":{name}" for name in _BLOB_COLUMNS)
+            with self._lock, self._connection:
+                self._connection.execute(f"INSERT INTO blobs ({names}) VALUES ({values}) "
+                                         "ON CONFLICT(hash) DO UPDATE SET refs = refs + 1",
+                                         {**{name: blob.get(name) for name in _BLOB_COLUMNS}, "refs": 1})
+            return DBResponse([blob], SUCCESS)
+        except sqlite3.Error:
+            return DBResponse([blob], DB_WRITE_ERROR)
+
+    def release_blob(self, blob_hash: str) -> DBResponse:
+        """
+            Drop a reference to a blob, and the blob once it has none left
+            Args:
+                blob_hash: Content hash of the blob
+            Return:
+                DBResponse: A named tuple containing the blob with its remaining references, if it was stored
+        """
+        try:
+            with self._lock, self._connection:
+                self._connection.execute("UPDATE blobs SET refs = refs - 1 WHERE hash = ?", (blob_hash,))
+                rows = [dict(row) for row in
+                        self._connection.execute("SELECT * FROM blobs WHERE hash = ?", (blob_hash,))]
+                self._connection.execute("DELETE FROM blobs WHERE hash = ? AND refs <= 0", (blob_hash,))
+            return DBResponse(rows, SUCCESS)
+        except sqlite3.Error:
+            return DBResponse([], DB_WRITE_ERROR)
+
+    def update_blob(self, blob_hash: str, fields: Dict[str, Any]) -> DBResponse:
+        """
+            Update fields of a blob
+            Args:
+                blob_hash: Content hash of the blob
+                fields: Column values to set
+            Return:
+                DBResponse: A named tuple containing the updated fields and error code
+        """
+        try:
+            assignments = ", ".join(f"{name} = :{name}" for name in fields if name in _BLOB_COLUMNS)
+            with self._lock, self._connection:
+                self._connection.execute(f"UPDATE blobs SET {assignments} WHERE hash = :_hash",
+                                         {**fields, "_hash": blob_hash})
+            return DBResponse([fields], SUCCESS)
+        except sqlite3.Error:
+            return DBResponse([fields], DB_WRITE_ERROR)
+
+    def clear_blobs(self) -> DBResponse:
+        """
+            Forget every stored blob
+            Return:
+                DBResponse: A named tuple containing the data and error code
+        """
+        try:
+            with self._lock, self._connection:
+                self._connection.execute("DELETE FROM blobs")
+            return DBResponse([], SUCCESS)
+        except sqlite3.Error:
+            return DBResponse([], DB_WRITE_ERROR)
@@ -0,0 +1,255 @@
+from datetime import date, datetime, time
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from langchain.schema.document import Document
+import codecs
+import csv
+import re
+
+# Loaders streaming the records of CSV documents, spreadsheets and HTML
+# pages, so documents of any size are loaded in constant memory
+
+# Characters of a CSV document sniffed for its dialect
+CSV_SNIFF_SIZE = 64 * 1024
+
+# Delimiters tried when sniffing the dialect of a CSV document
+CSV_DELIMITERS = ",;\t|"
+
+# Encoding of CSV documents whose start is not UTF-8, such as spreadsheet exports on Windows
+CSV_FALLBACK_ENCODING = "cp1252"
+
+# Characters of an HTML document fed to the parser at a time
+HTML_READ_SIZE = 64 * 1024
+
+# Characters of HTML text gathered into a page before it is split
+HTML_PAGE_SIZE = 16 * 1024
+
+# Tags whose content is not text
+_HTML_SKIPPED = {"script", "style", "noscript", "template", "svg", "math"}
+
+# Tags starting and ending a paragraph of text
+_HTML_BLOCKS = {"address", "article", "aside", "blockquote", "body", "caption", "dd", "details", "div", "dl",
+                "dt", "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+                "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "summary", "table", "tbody",
+                "tfoot", "thead", "title", "tr", "ul", "br"}
+
+# Table cells, kept on the line of their row
+_HTML_CELLS = {"td", "th"}
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _cell(value: Any) -> str:
+    # Text of a spreadsheet or CSV cell as a person would read it
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return str(value).strip()
+
+def _record(header: List[str], cells: List[str]) -> str:
+    # Each cell labelled with its column, so a record still reads on its own once chunked
+    return "; ".join(f"{header[index] if index < len(header) and header[index] else f'column {index + 1}'}: {cell}"
+                     for index, cell in enumerate(cells) if cell)
+
+def _records(rows: Iterable[Sequence[Any]]) -> Iterator[Tuple[int, str]]:
+    """
+        Yield the (row number, text) of each non-empty row of a table whose
+        first non-empty row is the header
+    """
+    header: Optional[List[str]] = None
+    header_number = 0
+    has_records = False
+    for number, row in enumerate(rows, start=1):
+        cells = [_cell(value) for value in row]
+        if not any(cells):
+            continue
+        if header is None:
+            header, header_number = cells, number
+            continue
+        has_records = True
+        yield number, _record(header, cells)
+    # A table holding its header alone still has text
+    if header is not None and not has_records:
+        yield header_number, "; ".join(cell for cell in header if cell)
+
+def group_records(records: Iterable[Tuple[int, str]], metadata: Dict[str, Any], size: int,
+                  length: Callable[[str], int] = len) -> Iterator[Document]:
+    """
+        Gather consecutive records into pages of up to `size`, as measured by
+        `length`, so each page makes one chunk and records are not cut
+        between chunks. A record larger than `size` makes a page of its own,
+        which the splitter cuts.
+        Args:
+            records: The (row number, text) of each record
+            metadata: Metadata of every page, such as the source and sheet
+            size: Chunk size
+            length: Size of a text, in the unit of the chunk size
+        Return:
+            Iterator of pages, with the number of their first row in the metadata
+    """
+    lines: List[str] = []
+    total = 0
+    first_row = 0
+    for number, text in records:
+        text_size = length(text)
+        if lines and total + 1 + text_size > size:
+            yield Document(page_content="\n".join(lines), metadata={**metadata, "row": first_row})
+            lines = []
+        if lines:
+            total += 1 + text_size
+        else:
+            first_row, total = number, text_size
+        lines.append(text)
+    if lines:
+        yield Document(page_content="\n".join(lines), metadata={**metadata, "row": first_row})
+
+def _csv_encoding(path: str) -> str:
+    # UTF-8, with or without a byte order mark, unless the start of the document is not
+    with open(path, "rb") as file:
+        sample = file.read(CSV_SNIFF_SIZE)
+    try:
+        # A multi-byte character may be cut at the end of the sample
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=len(sample) < CSV_SNIFF_SIZE)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return CSV_FALLBACK_ENCODING
+
+def load_csv(path: str, size: int, length: Callable[[str], int] = len) -> Iterator[Document]:
+    """
+        Stream the rows of a CSV document in the encoding and dialect sniffed
+        from its start. Bytes that do not decode are replaced, so a few stray
+        characters do not fail the whole document.
+    """
+    with open(path, newline="", encoding=_csv_encoding(path), errors="replace") as file:
+        sample = file.read(CSV_SNIFF_SIZE)
+        # Leave out the last line, which may be cut
+        if len(sample) == CSV_SNIFF_SIZE and "\n" in sample:
+            sample = sample[:sample.rindex("\n")]
+        file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+        except csv.Error:
+            dialect = csv.excel
+        yield from group_records(_records(csv.reader(file, dialect)), {"source": str(path)}, size, length)
+
+def load_xlsx(path: str, size: int, length: Callable[[str], int] = len) -> Iterator[Document]:
+    """Stream the rows of each sheet of an XLSX workbook, opened in read-only mode"""
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            # Some writers record a wrong sheet size, so rows are read up to the end
+            sheet.reset_dimensions()
+            yield from group_records(_records(sheet.iter_rows(values_only=True)),
+                                     {"source": str(path), "sheet": sheet.title}, size, length)
+    finally:
+        workbook.close()
+
+def load_xls(path: str, size: int, length: Callable[[str], int] = len) -> Iterator[Document]:
+    """Stream the rows of each sheet of an XLS workbook, loading one sheet at a time"""
+    import xlrd
+
+    def value(cell) -> Any:
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            return xlrd.xldate.xldate_as_datetime(cell.value, workbook.datemode)
+        if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            return bool(cell.value)
+        if cell.ctype == xlrd.XL_CELL_ERROR:
+            return None
+        return cell.value
+
+    workbook = xlrd.open_workbook(path, on_demand=True)
+    try:
+        for index in range(workbook.nsheets):
+            sheet = workbook.sheet_by_index(index)
+            try:
+                rows = ([value(cell) for cell in sheet.row(row)] for row in range(sheet.nrows))
+                yield from group_records(_records(rows), {"source": str(path), "sheet": sheet.name}, size, length)
+            finally:
+                workbook.unload_sheet(index)
+    finally:
+        workbook.release_resources()
+
+class _HTMLText(HTMLParser):
+    """
+        Text of an HTML document as paragraphs, ending at block tags. The
+        cells of a table row are kept on one line.
+    """
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        # Paragraphs ended since the last call to take
+        self.paragraphs: List[str] = []
+        self._text: List[str] = []
+        self._length = 0
+        self._skipped = 0
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in _HTML_SKIPPED:
+            self._skipped += 1
+        elif tag in _HTML_CELLS:
+            if "".join(self._text).strip():
+                self._text.append(" | ")
+        elif tag in _HTML_BLOCKS:
+            self._end_paragraph()
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _HTML_SKIPPED:
+            self._skipped = max(0, self._skipped - 1)
+        elif tag in _HTML_BLOCKS:
+            self._end_paragraph()
+
+    def handle_data(self, data: str) -> None:
+        if self._skipped:
+            return
+        self._text.append(data)
+        self._length += len(data)
+        if self._length > HTML_PAGE_SIZE:
+            # Cut a paragraph without block tags at its last whitespace
+            text = "".join(self._text)
+            match = None
+            for match in _WHITESPACE.finditer(text):
+                pass
+            self._text = [text[:match.start()]] if match is not None else [text]
+            self._end_paragraph()
+            if match is not None:
+                self._text, self._length = [text[match.end():]], len(text) - match.end()
+
+    def _end_paragraph(self) -> None:
+        text = _WHITESPACE.sub(" ", "".join(self._text)).strip()
+        if text:
+            self.paragraphs.append(text)
+        self._text, self._length = [], 0
+
+    def take(self, final: bool = False) -> List[str]:
+        if final:
+            self.close()
+            self._end_paragraph()
+        paragraphs, self.paragraphs = self.paragraphs, []
+        return paragraphs
+
+def load_html(path: str) -> Iterator[Document]:
+    """
+        Stream the text of an HTML document, parsed incrementally, as pages
+        of whole paragraphs of about HTML_PAGE_SIZE characters
+    """
+    parser = _HTMLText()
+    page: List[str] = []
+    page_size = 0
+    number = 0
+    with open(path, encoding="utf-8", errors="replace") as file:
+        while True:
+            block = file.read(HTML_READ_SIZE)
+            if block:
+                parser.feed(block)
+            for paragraph in parser.take(final=not block):
+                page.append(paragraph)
+                page_size += len(paragraph) + 2
+                if page_size >= HTML_PAGE_SIZE:
+                    yield Document(page_content="\n\n".join(page), metadata={"source": str(path), "page": number})
+                    page, page_size, number = [], 0, number + 1
+            if not block:
+                break
+    if page:
+        yield Document(page_content="\n\n".join(page), metadata={"source": str(path), "page": number})
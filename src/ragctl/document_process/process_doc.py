@@ -1,68 +1,239 @@
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.document_loaders import Docx2txtLoader
 from langchain_community.document_loaders import TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
 from langchain.schema.document import Document
+from ragctl.chunking.splitters import ChunkingSpec, Splitter, get_chunking, get_splitter
 from ragctl.data_chunk_process.chunk_process import DataChunkProcess
-from ragctl.embedding.bedrock import AWSBedrockEmbedding
-import os
+from ragctl.data_chunk_process.dedup import NearDuplicateIndex, get_dedup_index
+from ragctl.document_process import loaders
+from ragctl.embedding.cache import open_embedding_cache
+from ragctl.embedding.pipeline import get_embedding_pipeline
+from ragctl.embedding.registry import EmbeddingBackend, get_backend
+from ragctl.lexical.bm25 import BM25IndexWriter, get_index_path
+from ragctl.vector_store import chroma, flat
+from ragctl.vector_store.engine import ENGINE_CHROMA, ENGINE_FLAT, get_engine_name, get_quantization
+from ragctl import config, tracing
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
+import multiprocessing
+
+# Default number of chunks per window
+DEFAULT_WINDOW_SIZE = 256
+
+# Windows queued for embedding while the next one is being parsed
+MAX_PENDING_WINDOWS = 2
 
 class ProcessDocument:
-    def __init__(self, pdf_file, vector_db_path: str, hash: str, document_format: str):
+    def __init__(self, pdf_file, vector_db_path: str, hash: str, document_format: str,
+                 embed_executor: Optional[Executor] = None, checkpoint: int = 0,
+                 on_checkpoint: Optional[Callable[[int], None]] = None,
+                 embedding: Optional[EmbeddingBackend] = None, vector_store: Optional[str] = None,
+                 chunking: Optional[ChunkingSpec] = None, document_id: Optional[str] = None):
         self.pdf_file = pdf_file
         self.document_format = document_format
-        # Join the vector_db_path and hash to get the folder path
-        self.vector_db_path = os.path.join(vector_db_path, hash[-4:])
+        # Catalog id of the document, the end of its hash unless that was in use
+        self.document_id = document_id or hash[-4:]
+        # Folder of the vector store shared by all documents
+        self.vector_db_path = vector_db_path
+        # Number of chunks moved through filtering and embedding at a time
+        self.window_size = int(config.get_option("Processing", "window_size", str(DEFAULT_WINDOW_SIZE)))
+        # Worker processes removing stop words from large documents
+        self.filter_workers = int(config.get_option("Processing", "filter_workers", "1"))
+        # Executor embedding the windows, shared between documents processed together
+        self.embed_executor = embed_executor
+        # Number of leading chunks already stored by an earlier run
+        self.checkpoint = checkpoint
+        # Called with the new checkpoint each time a window is stored
+        self.on_checkpoint = on_checkpoint
+        # Number of chunks embedded by this run
+        self.chunk_count = 0
+        # Number of near-duplicate chunks left out by this run, each one an embedding saved
+        self.duplicate_count = 0
+        # Embedding backend and model, by default the configured ones
+        self.embedding = embedding
+        # Vector store engine, by default the configured one
+        self.vector_store = vector_store or get_engine_name()
+        # Chunking strategy and sizes, by default the configured ones
+        self.chunking = chunking or get_chunking()
+        self._splitter: Optional[Splitter] = None
+        # Why the last run failed, None when it succeeded
+        self.error: Optional[str] = None
     
     def process(self) -> bool:
         print("Processing the document...")
         try:
-            # Load document
-            data = self._load_document()
-            # Split data into chunks
-            data_chunk = self._split_data(data)
-            # Create a hash named folder inside vector_db_path to store the embeddings
-            os.makedirs(self.vector_db_path, exist_ok=True)
-            self._save_to_chromadb(data_chunk)
-            return True
+            with tracing.span("document.process", document_id=self.document_id, format=self.document_format,
+                              vector_store=self.vector_store, chunking=str(self.chunking),
+                              checkpoint=self.checkpoint):
+                # Pages are loaded lazily as the splitter pulls them, so both stages are timed in pieces
+                load_timer = tracing.Timer("document.load", document_id=self.document_id)
+                split_timer = tracing.Timer("document.split", document_id=self.document_id)
+                # Load document pages lazily
+                data = load_timer.iterate(self._load_document())
+                # Split pages into chunks as they are loaded
+                data_chunk = self._split_data(data, split_timer)
+                saved = self._save_to_vector_store(data_chunk)
+                load_timer.record()
+                split_timer.record()
+                return saved
         except Exception as e:
+            self.error = self.error or f"{type(e).__name__}: {e}"
             return False
 
-    def _load_document(self) -> list[Document]:
+    def _get_splitter(self) -> Splitter:
+        if self._splitter is None:
+            self._splitter = get_splitter(self.chunking)
+        return self._splitter
+
+    def _load_document(self) -> Iterator[Document]:
+        # Records of tables are grouped into pages of one chunk, so no record is cut between chunks
         match self.document_format:
             case "PDF":
-                loader = PyPDFLoader(self.pdf_file)
+                return PyPDFLoader(self.pdf_file).lazy_load()
             case "DOCX":
-                loader = Docx2txtLoader(self.pdf_file)
+                return Docx2txtLoader(self.pdf_file).lazy_load()
             case "TXT":
-                loader = TextLoader(self.pdf_file)
-        data = loader.load()
-        return data
+                return TextLoader(self.pdf_file).lazy_load()
+            case "HTML":
+                return loaders.load_html(self.pdf_file)
+            case "CSV":
+                return loaders.load_csv(self.pdf_file, self.chunking.chunk_size, self._get_splitter().length)
+            case "XLSX":
+                return loaders.load_xlsx(self.pdf_file, self.chunking.chunk_size, self._get_splitter().length)
+            case "XLS":
+                return loaders.load_xls(self.pdf_file, self.chunking.chunk_size, self._get_splitter().length)
+            case _:
+                raise ValueError(f"unsupported document format {self.document_format}")
     
-    def _split_data(self, data) -> list[Document]:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500, 
-            chunk_overlap=80,
-            length_function=len,
-            is_separator_regex=False
-        )
-        return text_splitter.split_documents(data)
+    def _split_data(self, data: Iterable[Document], timer: Optional[tracing.Timer] = None) -> Iterator[Document]:
+        timer = timer or tracing.Timer("document.split")
+        splitter = self._get_splitter()
+        # Chunks never span pages, so each page is split on its own
+        for page in data:
+            with timer:
+                chunks = splitter.split_text(page.page_content)
+            for chunk in chunks:
+                yield Document(page_content=chunk, metadata=dict(page.metadata))
+
+    def _filter_chunks(self, chunks: list[Document], executor: Optional[Executor] = None) -> list[Document]:
+        processed_chunks = DataChunkProcess.process_batch((chunk.page_content for chunk in chunks), executor)
+        # Create new documents with the processed chunks
+        return [Document(page_content=processed_chunk["filtered_text"], metadata=chunk.metadata)
+                for chunk, processed_chunk in zip(chunks, processed_chunks)]
+
+    def _drop_duplicates(self, chunks: list[Document], dedup_index: NearDuplicateIndex) -> list[Document]:
+        # The first of near-duplicate chunks is kept, the others are neither embedded nor indexed
+        kept = [chunk for chunk in chunks
+                if dedup_index.add(chunk.metadata["chunk_index"], chunk.page_content) is None]
+        self.duplicate_count += len(chunks) - len(kept)
+        return kept
 
-    def _save_to_chromadb(self, chunks: list[Document]) -> bool:
+    def _windows(self, chunks: Iterable[Document]) -> Iterator[list[Document]]:
+        # Number the chunks and skip the ones stored before the checkpoint.
+        # Splitting is deterministic, so a chunk keeps its index across runs.
+        chunks = (Document(page_content=chunk.page_content,
+                           metadata={**chunk.metadata, "document_id": self.document_id, "chunk_index": index})
+                  for index, chunk in enumerate(chunks) if index >= self.checkpoint)
+        while window := list(islice(chunks, self.window_size)):
+            yield window
+
+    def _open_store(self):
+        # Writer of the document's chunks in its vector store engine
+        if self.vector_store == ENGINE_FLAT:
+            writer = flat.FlatDocumentWriter(self.vector_db_path, self.document_id, get_quantization())
+        elif self.vector_store == ENGINE_CHROMA:
+            writer = chroma.ChromaDocumentWriter(self.vector_db_path, self.document_id,
+                                                 chroma.collection_name(self.embedding.name, self.embedding.model_id))
+        else:
+            raise ValueError(f"unknown vector store {self.vector_store}")
+        writer.reset(self.checkpoint)
+        return writer
+
+    def _write_lexical_index(self, store, index_writer: BM25IndexWriter, resumed_from: int) -> None:
+        if resumed_from > 0:
+            # The chunks stored by the interrupted run were not filtered again
+            for chunk_index, text in store.stored_chunks(resumed_from):
+                index_writer.add(chunk_index, text)
+        index_writer.write(get_index_path(self.vector_db_path, self.document_id))
+
+    def _save_to_vector_store(self, chunks: Iterable[Document]) -> bool:
         try:
-            processd_chunks = []
-            for chunk in chunks:
-                chunk_text = chunk.page_content
-                data_chunk_processor = DataChunkProcess(chunk_text)
-                processed_chunk = data_chunk_processor.process()
-                # Create a new document with the processed chunk
-                processd_chunks.append(Document(
-                    page_content=processed_chunk["filtered_text"],
-                    metadata=chunk.metadata))
-            embedding = AWSBedrockEmbedding()
-            vectordb = Chroma(persist_directory=self.vector_db_path, embedding_function=embedding.get_aws_bedrock_embedding())
-            vectordb.add_documents(processd_chunks)
+            self.embedding = self.embedding or get_backend()
+            pipeline = get_embedding_pipeline(self.embedding.embeddings, self.embedding.cache_namespace,
+                                              open_embedding_cache(), self.embedding.is_retryable)
+            with tracing.span("vector_store.open", engine=self.vector_store, document_id=self.document_id):
+                store = self._open_store()
+            # BM25 index of the stop-word-filtered chunks, written once every chunk is stored
+            index_writer = BM25IndexWriter(self.document_id)
+            resumed_from = self.checkpoint
+            # Fingerprints of the chunks kept so far, including the ones stored by an interrupted run
+            dedup_index = get_dedup_index()
+            if dedup_index is not None and resumed_from > 0:
+                with tracing.span("document.dedup", document_id=self.document_id, resumed_from=resumed_from):
+                    for chunk_index, text in store.stored_chunks(resumed_from):
+                        dedup_index.add(chunk_index, text)
+
+            def embed_window(window: list[Document], end: int) -> int:
+                # Write the vectors in bulk as each batch of embeddings completes
+                texts = [chunk.page_content for chunk in window]
+                embed_timer = tracing.Timer("document.embed", document_id=self.document_id, chunks=len(window))
+                write_timer = tracing.Timer("vector_store.write", engine=self.vector_store,
+                                            document_id=self.document_id, chunks=len(window))
+                try:
+                    for batch in embed_timer.iterate(pipeline.embed(texts)):
+                        with write_timer:
+                            store.upsert([window[index].metadata["chunk_index"] for index in batch.indexes],
+                                         batch.vectors,
+                                         [texts[index] for index in batch.indexes],
+                                         [window[index].metadata for index in batch.indexes])
+                finally:
+                    embed_timer.record()
+                    write_timer.record()
+                return end
+
+            def commit(future) -> None:
+                # Windows are committed in order, so every chunk before the
+                # checkpoint is stored even when windows complete out of order
+                self.checkpoint = future.result()
+                if self.on_checkpoint is not None:
+                    self.on_checkpoint(self.checkpoint)
+
+            # Embed each window on a background thread while the next pages are
+            # parsed, with at most MAX_PENDING_WINDOWS windows held in memory
+            pending = deque()
+            filter_executor = None
+            with ExitStack() as stack:
+                executor = self.embed_executor or stack.enter_context(ThreadPoolExecutor(max_workers=1))
+                for index, window in enumerate(self._windows(chunks)):
+                    # Documents spanning several windows are filtered on a process pool
+                    if index == 1 and self.filter_workers > 1:
+                        filter_executor = ProcessPoolExecutor(max_workers=self.filter_workers,
+                                                              mp_context=multiprocessing.get_context("spawn"))
+                        stack.callback(filter_executor.shutdown, cancel_futures=True)
+                    with tracing.span("document.filter", document_id=self.document_id, chunks=len(window)):
+                        window = self._filter_chunks(window, filter_executor)
+                    # The checkpoint moves past the window even when all its chunks are duplicates
+                    end = window[-1].metadata["chunk_index"] + 1
+                    if dedup_index is not None:
+                        with tracing.span("document.dedup", document_id=self.document_id, chunks=len(window)):
+                            window = self._drop_duplicates(window, dedup_index)
+                    for chunk in window:
+                        index_writer.add(chunk.metadata["chunk_index"], chunk.page_content)
+                    if len(pending) >= MAX_PENDING_WINDOWS:
+                        commit(pending.popleft())
+                    pending.append(executor.submit(tracing.propagate(embed_window), window, end))
+                    self.chunk_count += len(window)
+                while pending:
+                    commit(pending.popleft())
+            # Read the chunks of an interrupted run before the flat engine merges its parts
+            with tracing.span("lexical.index", document_id=self.document_id):
+                self._write_lexical_index(store, index_writer, resumed_from)
+            with tracing.span("vector_store.finish", engine=self.vector_store, document_id=self.document_id):
+                store.finish()
             return True
         except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
             return False
\ No newline at end of file
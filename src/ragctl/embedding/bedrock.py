@@ -1,22 +1,106 @@
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from langchain_community.embeddings import BedrockEmbeddings
+from langchain_core.embeddings import Embeddings
+from ragctl import config
+from typing import List
 import json
+import threading
+
+# Default Bedrock embedding model and region
+MODEL_ID = "amazon.titan-embed-text-v1"
+DEFAULT_REGION = "us-east-1"
+
+# Process-wide Bedrock runtime client, created on first use
+_bedrock_client = None
+_bedrock_client_lock = threading.Lock()
+
+# Bedrock error codes worth retrying with backoff
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelTimeoutException",
+    "InternalServerException",
+}
+
+def is_retryable_error(error: Exception) -> bool:
+    """Return True if a Bedrock error is throttling or transient"""
+    return (isinstance(error, ClientError)
+            and error.response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES)
+
+def get_model_id() -> str:
+    """Return the Bedrock embedding model id from the [AWS] configuration section"""
+    return config.get_option("AWS", "model_id", MODEL_ID)
+
+def get_bedrock_client():
+    """
+    Return the process-wide Bedrock runtime client. It is created once, on
+    first use, with a connection pool sized for concurrent embedding requests
+    and TCP keep-alive, so endpoint and credential resolution and the TLS
+    handshake are paid once per process.
+    """
+    global _bedrock_client
+    if _bedrock_client is None:
+        with _bedrock_client_lock:
+            if _bedrock_client is None:
+                session = boto3.session.Session(profile_name=config.get_option("AWS", "profile", None))
+                _bedrock_client = session.client(
+                    service_name='bedrock-runtime',
+                    region_name=config.get_option("AWS", "region", session.region_name or DEFAULT_REGION),
+                    endpoint_url=config.get_option("AWS", "endpoint_url", None),
+                    config=Config(
+                        max_pool_connections=int(config.get_option("AWS", "max_pool_connections", "32")),
+                        tcp_keepalive=True,
+                        # Throttling is retried with backoff by the embedding pipeline, not twice over
+                        retries={"mode": "standard", "total_max_attempts": 1},
+                    ),
+                )
+    return _bedrock_client
 
 class AWSBedrockEmbedding:
     def __init__(self) -> None:
-        self.bedrock_client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name='us-east-1'
-        )
-    
+        self.bedrock_client = get_bedrock_client()
+        self.model_id = get_model_id()
+
     def get_aws_bedrock_embedding(self):
         """Perform AWS Bedrock Embedding"""
-        bedrock_client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name='us-east-1',
-        )
         aws_bedrock_embedding = BedrockEmbeddings(
-            credentials_profile_name="default", region_name="us-east-1", model_id="amazon.titan-embed-text-v1", client=bedrock_client
+            model_id=self.model_id, client=self.bedrock_client
         )
         return aws_bedrock_embedding
-        
\ No newline at end of file
+
+    def get_batch_embedding(self) -> "BedrockBatchEmbeddings":
+        """Bedrock embedding that raises Bedrock errors as-is so callers can retry them"""
+        return BedrockBatchEmbeddings(self.bedrock_client, self.model_id)
+
+class BedrockBatchEmbeddings(Embeddings):
+    """
+        Embed a batch of texts through the Bedrock runtime API. Cohere models
+        take the whole batch in one request, Titan models one text per request.
+    """
+    def __init__(self, client, model_id: str) -> None:
+        self.client = client
+        self.model_id = model_id
+        # Number of texts sent in one request
+        self.request_size = 96 if model_id.startswith("cohere.") else 1
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.model_id.startswith("cohere."):
+            return self._invoke({"texts": texts, "input_type": "search_document"})["embeddings"]
+        return [self._invoke({"inputText": text})["embedding"] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.model_id.startswith("cohere."):
+            return self._invoke({"texts": [text], "input_type": "search_query"})["embeddings"][0]
+        return self._invoke({"inputText": text})["embedding"]
+
+    def _invoke(self, body: dict) -> dict:
+        response = self.client.invoke_model(
+            body=json.dumps(body),
+            modelId=self.model_id,
+            accept="application/json",
+            contentType="application/json",
+        )
+        return json.loads(response["body"].read())
@@ -0,0 +1,252 @@
+from array import array
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+from langchain_core.embeddings import Embeddings
+from ragctl import config
+import atexit
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# Default cache size cap in megabytes
+DEFAULT_CACHE_MAX_MB = 512
+
+# Vectors read before their last use is written to the cache
+TOUCH_BATCH_SIZE = 1000
+
+class CacheStats(NamedTuple):
+    entries: int
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+
+def normalize_text(text: str) -> str:
+    # Texts differing only in unicode form or whitespace share one vector
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def cache_key(model_id: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\0{normalize_text(text)}".encode()).hexdigest()
+
+class EmbeddingCache:
+    """
+        On-disk embedding cache keyed by (model id, normalized text hash),
+        capped in size with least-recently-used eviction. Lookups are
+        recorded in memory and written with the next insert, or once
+        TOUCH_BATCH_SIZE vectors were read. The total size is kept in the
+        stats table, so the cap is checked without summing the cache.
+    """
+    def __init__(self, cache_path: Path, max_size: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024) -> None:
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        # Last use of the vectors read since the last write, and the lookups counted since then
+        self._touched: Dict[str, int] = {}
+        self._hits = 0
+        self._misses = 0
+        self._connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, "
+                "size INTEGER NOT NULL, last_used INTEGER NOT NULL)")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            # Caches written before the size was tracked are summed once
+            self._connection.execute(
+                "INSERT OR IGNORE INTO stats (name, value) "
+                "SELECT 'size', COALESCE(SUM(size), 0) FROM embeddings")
+        atexit.register(self.flush)
+
+    def get_many(self, model_id: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+            Args:
+                model_id: Embedding model id
+                texts: Texts to look up
+            Return:
+                The cached vector for each text, or None on a miss
+        """
+        keys = [cache_key(model_id, text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # Stay below SQLite's host parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                for key, vector in self._connection.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch):
+                    found[key] = array("f", vector).tolist()
+            hits = sum(1 for key in keys if key in found)
+            now = time.time_ns()
+            self._touched.update((key, now) for key in found)
+            self._hits += hits
+            self._misses += len(keys) - hits
+            if len(self._touched) >= TOUCH_BATCH_SIZE:
+                with self._connection:
+                    self._write_touched()
+        return [found.get(key) for key in keys]
+
+    def put_many(self, model_id: str, texts: List[str], vectors: List[List[float]]) -> None:
+        """
+            Args:
+                model_id: Embedding model id
+                texts: Embedded texts
+                vectors: The vector of each text
+        """
+        now = time.time_ns()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = array("f", vector).tobytes()
+            rows.append((cache_key(model_id, text), model_id, blob, len(blob), now))
+        with self._lock:
+            with self._connection:
+                self._write_touched()
+                added = 0
+                for row in rows:
+                    # The vector of a key never changes, so one cached by another process is kept
+                    if self._connection.execute(
+                            "INSERT OR IGNORE INTO embeddings (key, model, vector, size, last_used) "
+                            "VALUES (?, ?, ?, ?, ?)", row).rowcount:
+                        added += row[3]
+                self._count("size", added)
+                self._evict()
+
+    def flush(self) -> None:
+        """Write the lookups recorded since the last write"""
+        with self._lock:
+            if self._touched or self._hits or self._misses:
+                try:
+                    with self._connection:
+                        self._write_touched()
+                except sqlite3.Error:
+                    # Only the recency of the vectors and the counters are lost
+                    pass
+
+    def stats(self) -> CacheStats:
+        self.flush()
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            counters = dict(self._connection.execute("SELECT name, value FROM stats"))
+        return CacheStats(entries, counters.get("size", 0), self._max_size,
+                          counters.get("hits", 0), counters.get("misses", 0))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+            self._hits = self._misses = 0
+            with self._connection:
+                self._connection.execute("DELETE FROM embeddings")
+                self._connection.execute("DELETE FROM stats")
+            self._connection.execute("VACUUM")
+
+    def _count(self, name: str, value: int) -> None:
+        self._connection.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, value))
+
+    def _write_touched(self) -> None:
+        # Called in a transaction, with the lock held
+        self._connection.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                     [(last_used, key) for key, last_used in self._touched.items()])
+        self._count("hits", self._hits)
+        self._count("misses", self._misses)
+        self._touched.clear()
+        self._hits = self._misses = 0
+
+    def _evict(self) -> None:
+        # Drop least recently used vectors until the cache fits its cap
+        size = self._connection.execute("SELECT value FROM stats WHERE name = 'size'").fetchone()[0]
+        if size <= self._max_size:
+            return
+        excess = size - self._max_size
+        evicted = []
+        freed = 0
+        for key, entry_size in self._connection.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_used"):
+            if freed >= excess:
+                break
+            evicted.append((key,))
+            freed += entry_size
+        self._connection.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+        self._count("size", -freed)
+
+class CachedEmbeddings(Embeddings):
+    """
+        Wrap any embedding backend so that only cache misses reach it. A
+        cache that cannot be read or written, such as one locked by another
+        process, only costs the requests it would have saved.
+    """
+    def __init__(self, embeddings: Embeddings, model_id: str, cache: Optional[EmbeddingCache]) -> None:
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = get_cached(self.cache, self.model_id, texts)
+        misses = [index for index, vector in enumerate(vectors) if vector is None]
+        if misses:
+            miss_texts = [texts[index] for index in misses]
+            miss_vectors = self.embeddings.embed_documents(miss_texts)
+            put_cached(self.cache, self.model_id, miss_texts, miss_vectors)
+            for index, vector in zip(misses, miss_vectors):
+                vectors[index] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        # Some models embed queries differently from documents
+        model_id = f"{self.model_id}#query"
+        vector = get_cached(self.cache, model_id, [text])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            put_cached(self.cache, model_id, [text], [vector])
+        return vector
+
+def get_cached(cache: Optional[EmbeddingCache], model_id: str, texts: List[str]) -> List[Optional[List[float]]]:
+    """Look up texts in the cache, missing all of them when there is no cache or it fails"""
+    if cache is not None:
+        try:
+            return cache.get_many(model_id, texts)
+        except sqlite3.Error:
+            pass
+    return [None] * len(texts)
+
+def put_cached(cache: Optional[EmbeddingCache], model_id: str, texts: List[str],
+               vectors: List[List[float]]) -> None:
+    """Cache vectors, unless there is no cache or it fails"""
+    if cache is not None:
+        try:
+            cache.put_many(model_id, texts, vectors)
+        except sqlite3.Error:
+            pass
+
+# Embedding caches by path, opened once per process
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+        Return:
+            The process-wide embedding cache configured in the ragctl configuration file
+    """
+    max_size = int(config.get_option("Embedding", "cache_max_mb", str(DEFAULT_CACHE_MAX_MB))) * 1024 * 1024
+    cache_path = str(config.EMBEDDING_CACHE_FILE)
+    cache = _caches.get(cache_path)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(cache_path)
+            if cache is None:
+                config.CONFIG_PATH.mkdir(parents=True, exist_ok=True)
+                cache = _caches[cache_path] = EmbeddingCache(config.EMBEDDING_CACHE_FILE, max_size)
+    return cache
+
+def open_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the embedding cache, or None when it cannot be opened, so embedding goes on uncached"""
+    try:
+        return get_embedding_cache()
+    except sqlite3.Error:
+        return None
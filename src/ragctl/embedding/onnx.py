@@ -0,0 +1,83 @@
+from pathlib import Path
+from typing import List
+from langchain_core.embeddings import Embeddings
+from ragctl import config
+import numpy as np
+import onnxruntime
+from tokenizers import Tokenizer
+
+# Texts run through the model at a time
+DEFAULT_BATCH_SIZE = 32
+
+# Tokens kept from each text
+DEFAULT_MAX_LENGTH = 512
+
+def get_model_path() -> str:
+    """Return the ONNX model folder from the [Embedding] configuration section"""
+    model_path = config.get_option("Embedding", "onnx_model", None)
+    if not model_path:
+        raise ValueError("set onnx_model in the [Embedding] section to use the onnx embedding backend")
+    return str(Path(model_path).expanduser().resolve())
+
+class OnnxEmbeddings(Embeddings):
+    """
+        Embed texts on the CPU with a sentence embedding model exported to
+        ONNX. The model folder holds model.onnx and the tokenizer.json of its
+        tokenizer. Token embeddings are mean-pooled over the attention mask and
+        L2-normalized; models that already output one vector per text are only
+        normalized.
+    """
+    def __init__(self, model_path: str, threads: int = 0, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_length: int = DEFAULT_MAX_LENGTH) -> None:
+        model_path = Path(model_path)
+        options = onnxruntime.SessionOptions()
+        # 0 lets onnxruntime use one thread per physical core
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(str(model_path / "model.onnx"), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(str(model_path / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        # Pad each batch to its longest text
+        self.tokenizer.enable_padding()
+        self.batch_size = max(1, batch_size)
+        # Number of texts the embedding pipeline sends in one request
+        self.request_size = self.batch_size
+
+    @classmethod
+    def from_config(cls, model_path: str) -> "OnnxEmbeddings":
+        """Load a model with the settings of the [Embedding] configuration section"""
+        return cls(model_path,
+                   threads=int(config.get_option("Embedding", "onnx_threads", "0")),
+                   batch_size=int(config.get_option("Embedding", "onnx_batch_size", str(DEFAULT_BATCH_SIZE))),
+                   max_length=int(config.get_option("Embedding", "onnx_max_length", str(DEFAULT_MAX_LENGTH))))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Batch texts of similar length together to limit padding
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+        vectors: List[List[float]] = [[] for _ in texts]
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for index, vector in zip(batch, self._embed_batch([texts[index] for index in batch])):
+                vectors[index] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0]
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        output = self.session.run(None, {name: value for name, value in inputs.items()
+                                         if name in self.input_names})[0]
+        if output.ndim == 3:
+            mask = attention_mask[..., None].astype(output.dtype)
+            output = (output * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        return (output / np.clip(norms, 1e-12, None)).astype(np.float32).tolist()
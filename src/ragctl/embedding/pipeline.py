@@ -0,0 +1,168 @@
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+from langchain_core.embeddings import Embeddings
+from ragctl import config
+from ragctl.embedding.cache import EmbeddingCache, get_cached, put_cached
+import random
+import threading
+import time
+
+# Request workers by concurrency, shared by every pipeline in the process
+_executors: Dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+def _get_executor(max_concurrency: int) -> ThreadPoolExecutor:
+    # One pool for all pipelines, so windows and documents embedded in
+    # parallel still have at most max_concurrency requests in flight
+    executor = _executors.get(max_concurrency)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(max_concurrency)
+            if executor is None:
+                executor = _executors[max_concurrency] = ThreadPoolExecutor(
+                    max_workers=max_concurrency, thread_name_prefix="embed")
+    return executor
+
+class EmbeddedBatch(NamedTuple):
+    # Positions of the embedded texts in the input list
+    indexes: List[int]
+    vectors: List[List[float]]
+
+class RetryingEmbeddings(Embeddings):
+    """
+        Retry the throttling and transient errors of an embedding backend
+        with exponential backoff and full jitter. The Bedrock client does not
+        retry on its own, so this is the only retry budget.
+    """
+    def __init__(self, embeddings: Embeddings,
+                 is_retryable: Callable[[Exception], bool] = lambda error: False,
+                 max_retries: int = 6,
+                 base_delay: float = 0.5,
+                 max_delay: float = 20.0) -> None:
+        self.embeddings = embeddings
+        self.is_retryable = is_retryable
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Number of texts the backend takes in one request
+        self.request_size = getattr(embeddings, "request_size", None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._retry(lambda: self.embeddings.embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._retry(lambda: self.embeddings.embed_query(text))
+
+    def _retry(self, request: Callable[[], Any]) -> Any:
+        attempt = 0
+        while True:
+            try:
+                return request()
+            except Exception as error:
+                if attempt >= self.max_retries or not self.is_retryable(error):
+                    raise
+                # Exponential backoff with full jitter
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                attempt += 1
+
+class EmbeddingPipeline:
+    """
+        Embed texts in batches with a bounded number of concurrent requests.
+        Cached vectors are served first, then batches are yielded in completion
+        order so callers can write them to the vector store as they arrive.
+        Pipelines with the same max_concurrency share their request workers,
+        so it bounds the requests of the whole process.
+    """
+    def __init__(self, embeddings: Embeddings, model_id: str,
+                 cache: Optional[EmbeddingCache] = None,
+                 batch_size: int = 32,
+                 max_concurrency: int = 4,
+                 max_retries: int = 6,
+                 base_delay: float = 0.5,
+                 max_delay: float = 20.0,
+                 is_retryable: Callable[[Exception], bool] = lambda error: False) -> None:
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.is_retryable = is_retryable
+        self._requests = RetryingEmbeddings(embeddings, is_retryable, max_retries, base_delay, max_delay)
+
+    def embed(self, texts: List[str]) -> Iterator[EmbeddedBatch]:
+        """
+            Args:
+                texts: Texts to embed
+            Return:
+                Iterator of embedded batches, in completion order
+        """
+        pending = list(range(len(texts)))
+        if self.cache is not None and texts:
+            cached = get_cached(self.cache, self.model_id, texts)
+            hits = [index for index, vector in enumerate(cached) if vector is not None]
+            if hits:
+                yield EmbeddedBatch(hits, [cached[index] for index in hits])
+            pending = [index for index, vector in enumerate(cached) if vector is None]
+
+        batches = [pending[start:start + self.batch_size] for start in range(0, len(pending), self.batch_size)]
+        in_flight: Dict[Future, List[int]] = {}
+        executor = _get_executor(self.max_concurrency)
+        try:
+            for batch in batches:
+                # Queue no more batches than there are workers, so the pool is shared fairly
+                while len(in_flight) >= self.max_concurrency:
+                    yield from self._collect(in_flight, texts)
+                future = executor.submit(self._embed_with_retry, [texts[index] for index in batch])
+                in_flight[future] = batch
+            while in_flight:
+                yield from self._collect(in_flight, texts)
+        finally:
+            # Batches of a failed or abandoned embedding are not sent
+            for future in in_flight:
+                future.cancel()
+
+    def _collect(self, in_flight: Dict[Future, List[int]], texts: List[str]) -> Iterator[EmbeddedBatch]:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            batch = in_flight.pop(future)
+            vectors = future.result()
+            put_cached(self.cache, self.model_id, [texts[index] for index in batch], vectors)
+            yield EmbeddedBatch(batch, vectors)
+
+    def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        # Retry each request on its own so a throttled request does not
+        # repeat the requests of its batch that already succeeded
+        request_size = self._requests.request_size or len(texts)
+        vectors = []
+        for start in range(0, len(texts), request_size):
+            vectors.extend(self._requests.embed_documents(texts[start:start + request_size]))
+        return vectors
+
+def get_embedding_pipeline(embeddings: Embeddings, model_id: str,
+                           cache: Optional[EmbeddingCache] = None,
+                           is_retryable: Callable[[Exception], bool] = lambda error: False) -> EmbeddingPipeline:
+    """
+        Args:
+            embeddings: Embedding backend
+            model_id: Embedding model id, used as the cache namespace
+            cache: Optional embedding cache
+            is_retryable: Predicate telling throttling and transient errors apart
+        Return:
+            An embedding pipeline tuned from the [Embedding] configuration section
+    """
+    return EmbeddingPipeline(
+        embeddings, model_id, cache,
+        batch_size=int(config.get_option("Embedding", "batch_size", "32")),
+        max_concurrency=int(config.get_option("Embedding", "max_concurrency", "4")),
+        max_retries=int(config.get_option("Embedding", "max_retries", "6")),
+        is_retryable=is_retryable,
+    )
+
+def get_retrying_embeddings(embeddings: Embeddings,
+                            is_retryable: Callable[[Exception], bool] = lambda error: False) -> RetryingEmbeddings:
+    """Return the embedding backend retrying up to max_retries times, from the [Embedding] configuration section"""
+    return RetryingEmbeddings(embeddings, is_retryable,
+                              max_retries=int(config.get_option("Embedding", "max_retries", "6")))
@@ -0,0 +1,107 @@
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from ragctl import config
+import threading
+
+# Backend used when none is configured
+DEFAULT_BACKEND = "bedrock"
+
+# Backend of the documents embedded before the backend was recorded in the catalog
+LEGACY_BACKEND = "bedrock"
+
+class EmbeddingBackend(NamedTuple):
+    name: str
+    model_id: str
+    embeddings: Embeddings
+    # Namespace of the model's vectors in the embedding cache
+    cache_namespace: str
+    # Tells throttling and transient errors apart
+    is_retryable: Callable[[Exception], bool]
+
+class BackendFactory(NamedTuple):
+    # Model of the backend from the configuration file
+    default_model: Callable[[], str]
+    # Create the backend for a model id
+    create: Callable[[str], EmbeddingBackend]
+
+def _never_retry(error: Exception) -> bool:
+    return False
+
+def _bedrock_model() -> str:
+    from ragctl.embedding.bedrock import get_model_id
+    return get_model_id()
+
+def _create_bedrock(model_id: str) -> EmbeddingBackend:
+    from ragctl.embedding.bedrock import BedrockBatchEmbeddings, get_bedrock_client, is_retryable_error
+    # Vectors cached before backends were selectable are keyed by the bare model id
+    return EmbeddingBackend("bedrock", model_id, BedrockBatchEmbeddings(get_bedrock_client(), model_id),
+                            model_id, is_retryable_error)
+
+def _onnx_model() -> str:
+    from ragctl.embedding.onnx import get_model_path
+    return get_model_path()
+
+def _create_onnx(model_id: str) -> EmbeddingBackend:
+    from ragctl.embedding.onnx import OnnxEmbeddings
+    return EmbeddingBackend("onnx", model_id, OnnxEmbeddings.from_config(model_id),
+                            f"onnx:{model_id}", _never_retry)
+
+def _create_stub(model_id: str) -> EmbeddingBackend:
+    from ragctl.embedding.stub import StubEmbedding
+    return EmbeddingBackend("stub", model_id, StubEmbedding(), f"stub:{model_id}", _never_retry)
+
+# Embedding backends by name, as set with `backend` in the [Embedding] section
+_factories: Dict[str, BackendFactory] = {
+    "bedrock": BackendFactory(_bedrock_model, _create_bedrock),
+    "onnx": BackendFactory(_onnx_model, _create_onnx),
+    "stub": BackendFactory(lambda: "stub", _create_stub),
+}
+
+# Backends by (name, model id), created once per process
+_backends: Dict[Tuple[str, str], EmbeddingBackend] = {}
+_backends_lock = threading.Lock()
+
+def register_backend(name: str, default_model: Callable[[], str],
+                     create: Callable[[str], EmbeddingBackend]) -> None:
+    """
+        Make an embedding backend selectable in the configuration file
+        Args:
+            name: Backend name
+            default_model: Return the model id to use when none is recorded
+            create: Create the backend for a model id
+    """
+    _factories[name] = BackendFactory(default_model, create)
+
+def get_backend_names() -> Tuple[str, ...]:
+    return tuple(_factories)
+
+def get_backend_name() -> str:
+    """Return the embedding backend from the [Embedding] configuration section"""
+    return config.get_option("Embedding", "backend", DEFAULT_BACKEND)
+
+def resolve(name: Optional[str] = None, model_id: Optional[str] = None) -> Tuple[str, str]:
+    """
+        Args:
+            name: Backend name, or None for the configured backend
+            model_id: Model id, or None for the backend's configured model
+        Return:
+            The (backend, model id) pair
+    """
+    name = name or get_backend_name()
+    if name not in _factories:
+        raise ValueError(f"unknown embedding backend {name}, use one of {', '.join(_factories)}")
+    return name, model_id or _factories[name].default_model()
+
+def get_backend(name: Optional[str] = None, model_id: Optional[str] = None) -> EmbeddingBackend:
+    """
+        Return the process-wide embedding backend for a model, by default the
+        configured one. Local models are loaded once per process.
+    """
+    key = resolve(name, model_id)
+    backend = _backends.get(key)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(key)
+            if backend is None:
+                backend = _backends[key] = _factories[key[0]].create(key[1])
+    return backend
@@ -0,0 +1,33 @@
+from typing import List
+from langchain_core.embeddings import Embeddings
+import hashlib
+import math
+
+class StubEmbedding(Embeddings):
+    """
+        Local, deterministic embedding for tests and benchmarks. Each token is
+        hashed into one of `dimensions` buckets and the result is L2-normalized,
+        so texts sharing words get similar vectors without any network call.
+    """
+    model_id = "stub"
+
+    def __init__(self, dimensions: int = 256) -> None:
+        self.dimensions = dimensions
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return self._embed(text)
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for token in text.lower().split():
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
@@ -0,0 +1,41 @@
+import hashlib
+import os
+from typing import NamedTuple
+
+# Read files in fixed-size blocks so large documents never load into memory
+BLOCK_SIZE = 1024 * 1024
+
+class FileStat(NamedTuple):
+    path: str
+    size: int
+    mtime: int
+
+def get_file_stat(document_path: str) -> FileStat:
+    """
+        Args:
+            document_path: Path to the document
+        Return:
+            FileStat: absolute path, size in bytes and modification time in nanoseconds
+    """
+    stat = os.stat(document_path)
+    return FileStat(os.path.abspath(document_path), stat.st_size, stat.st_mtime_ns)
+
+def file_fingerprint(document_path: str, block_size: int = BLOCK_SIZE) -> str:
+    """
+        Compute the SHA-256 of the document content
+        Args:
+            document_path: Path to the document
+            block_size: Number of bytes read at a time
+        Return:
+            Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    with open(document_path, "rb", buffering=0) as file:
+        while True:
+            read = file.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
@@ -1,127 +1,127 @@
-import PyPDF2
-from docx import Document
-from docx.opc.exceptions import PackageNotFoundError
-from bs4 import BeautifulSoup
-import openpyxl
-import xlrd
+import codecs
 import csv
+import io
+import os
+import re
+import zipfile
+from typing import Any, Dict, NamedTuple
+
+# Number of bytes sniffed from the start of a document
+HEADER_SIZE = 64 * 1024
+
+PDF_MAGIC = b'%PDF-'
+ZIP_MAGIC = b'PK\x03\x04'
+OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+class DocumentFormat(NamedTuple):
+    format: str
+    metadata: Dict[str, Any]
+
+UNKNOWN_FORMAT = DocumentFormat('UNKNOWN', {})
 
 class ValidateDocumentFormat:
     def __init__(self, document_path: str):
         self.document = document_path
         self.document_type = ['PDF', 'DOCX', 'TXT', 'HTML', 'XLS' ,'XLSX', 'CSV']
+        self._detected = None
 
     def validate(self) -> bool:
-        for doc_type in self.document_type:
-           if self._is_valid_document_type(doc_type):
-               return True
-        return False
-    
+        return self.detect().format in self.document_type
+
     def get_document_format(self) -> str:
-        for doc_type in self.document_type:
-            if self._is_valid_document_type(doc_type):
-                return doc_type
-        return 'UNKNOWN'
-    
-    def _is_valid_document_type(self, document_type: str) -> bool:
-        match document_type:
-            case 'PDF':
-                return self._is_valid_pdf()
-            case 'DOCX':
-                return self._is_valid_docx()
-            case 'TXT':
-                return self._is_valid_text()
-            case 'HTML':
-                return self._is_valid_html()
-            case 'XLS':
-                return self._is_valid_xls()
-            case 'XLSX':
-                return self._is_valid_xlsx()
-            case 'CSV':
-                return self._is_valid_csv()
-            case _:
-                return False
-                
-    def _is_valid_pdf(self) -> bool:
-        try:
-            with open(self.document, 'rb') as file:
-                pdf = PyPDF2.PdfReader(file)
-                if len(pdf.pages) > 0:
-                    return True
-                else:
-                    return False
-        except PyPDF2.errors.PdfReadError as e:
-            return False
-    
-    def _is_valid_docx(self) -> bool:
-        try:
-            document = Document(self.document)
-            return True
-        except PackageNotFoundError:
-            return False
-        except Exception:
-            return False
-    
-    def _is_valid_text(self) -> bool:
+        return self.detect().format
+
+    def detect(self) -> DocumentFormat:
+        """
+        Detect the document format from its magic bytes or a bounded header.
+        The document is read once and the result is cached on the instance.
+
+        Returns:
+            DocumentFormat: The format and cheap metadata such as the page or sheet count.
+        """
+        if self._detected is None:
+            try:
+                self._detected = self._detect()
+            except Exception:
+                self._detected = UNKNOWN_FORMAT
+        return self._detected
+
+    def _detect(self) -> DocumentFormat:
+        with open(self.document, 'rb') as file:
+            header = file.read(HEADER_SIZE)
+            truncated = len(header) == HEADER_SIZE
+            if PDF_MAGIC in header[:1024]:
+                file.seek(0)
+                return self._detect_pdf(file)
+        if header.startswith(ZIP_MAGIC):
+            return self._detect_zip()
+        if header.startswith(OLE_MAGIC):
+            return self._detect_xls()
+        return self._detect_text(header, truncated)
+
+    def _detect_pdf(self, file) -> DocumentFormat:
+        import PyPDF2
         try:
-            with open(self.document, 'r', encoding='utf-8') as file:
-                text = file.read()
-                if len(text) > 0:
-                    return True
-                else:
-                    return False
-        except UnicodeDecodeError:
-            return False
-        except Exception:
-            return False
-    
-    def _is_valid_html(self) -> bool:
+            # Opening the reader only parses the xref; the page count is read
+            # from the /Count of the root /Pages node rather than by walking the page tree
+            pdf = PyPDF2.PdfReader(file)
+            count = pdf.trailer['/Root']['/Pages'].get('/Count')
+            pages = count if isinstance(count, int) else len(pdf.pages)
+        except (PyPDF2.errors.PdfReadError, KeyError):
+            return UNKNOWN_FORMAT
+        if pages > 0:
+            return DocumentFormat('PDF', {'pages': pages})
+        return UNKNOWN_FORMAT
+
+    def _detect_zip(self) -> DocumentFormat:
+        # DOCX and XLSX are zip packages, told apart by their main part
         try:
-            with open(self.document, 'r', encoding='utf-8') as file:
-                html = file.read()
-                soup = BeautifulSoup(html, 'html.parser')
-                if soup.find_all('html'):
-                    return True
-                else:
-                    return False
-        except UnicodeDecodeError:
-            return False
-        except Exception:
-            return False
-    
-    def _is_valid_xls(self) -> bool:
+            with zipfile.ZipFile(self.document) as package:
+                names = set(package.namelist())
+                if 'word/document.xml' in names:
+                    return DocumentFormat('DOCX', {})
+                if 'xl/workbook.xml' in names:
+                    workbook = package.read('xl/workbook.xml')
+                    sheets = len(re.findall(rb'<(?:\w+:)?sheet\b', workbook))
+                    if sheets > 0:
+                        return DocumentFormat('XLSX', {'sheets': sheets})
+        except zipfile.BadZipFile:
+            pass
+        return UNKNOWN_FORMAT
+
+    def _detect_xls(self) -> DocumentFormat:
+        import xlrd
         try:
-            workbook = xlrd.open_workbook(self.document)
-            if len(workbook.sheets()) > 0:
-                return True
-            else:
-                return False
+            workbook = xlrd.open_workbook(self.document, on_demand=True)
         except xlrd.XLRDError:
-            return False
-        except Exception:
-            return False
-    
-    def _is_valid_xlsx(self) -> bool:
+            return UNKNOWN_FORMAT
         try:
-            workbook = openpyxl.load_workbook(self.document)
-            if len(workbook.sheetnames) > 0:
-                return True
-            else:
-                return False
-        except openpyxl.utils.exceptions.InvalidFileException:
-            return False
-        except Exception:
-            return False
-    
-    def _is_valid_csv(self) -> bool:
+            sheets = workbook.nsheets
+        finally:
+            workbook.release_resources()
+        if sheets > 0:
+            return DocumentFormat('XLS', {'sheets': sheets})
+        return UNKNOWN_FORMAT
+
+    def _detect_text(self, header: bytes, truncated: bool) -> DocumentFormat:
+        # A multi-byte character may be cut at the end of a truncated header
         try:
-            with open(self.document, 'r', newline='') as file:
-                reader = csv.reader(file)
-                if next(reader):
-                    return True
-                else:
-                    return False
-        except csv.Error:
-            return False
-        except Exception:
-            return False
\ No newline at end of file
+            text = codecs.getincrementaldecoder('utf-8')().decode(header, final=not truncated)
+        except UnicodeDecodeError:
+            return UNKNOWN_FORMAT
+        if len(text) == 0 or '\x00' in text:
+            return UNKNOWN_FORMAT
+        start = text.lstrip().lower()
+        if start.startswith('<!doctype html') or '<html' in start[:1024]:
+            return DocumentFormat('HTML', {})
+        if os.path.splitext(self.document)[1].lower() in ('.csv', '.tsv'):
+            lines = text.splitlines()
+            if truncated and len(lines) > 1:
+                lines = lines[:-1]
+            try:
+                row = next(csv.reader(io.StringIO('\n'.join(lines))), None)
+            except csv.Error:
+                row = None
+            if row:
+                return DocumentFormat('CSV', {'columns': len(row)})
+        return DocumentFormat('TXT', {})
@@ -0,0 +1,147 @@
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from ragctl.query_document.cache import LRUCache
+import gzip
+import heapq
+import json
+import math
+import os
+
+# Folder of the per-document indexes inside the vector database folder
+INDEX_DIR = "bm25"
+
+INDEX_VERSION = 2
+
+# BM25 term frequency saturation and length normalization
+K1 = 1.5
+B = 0.75
+
+# Parsed indexes kept in memory, keyed by path and modification time
+_loaded = LRUCache(256)
+
+class LexicalHit(NamedTuple):
+    document_id: str
+    chunk_index: int
+    score: float
+
+def tokenize(filtered_text: str) -> List[str]:
+    """
+        Args:
+            filtered_text: Chunk or question text with the stop words removed
+        Return:
+            The lowercased index terms, without punctuation-only tokens
+    """
+    return [token.lower() for token in filtered_text.split() if any(char.isalnum() for char in token)]
+
+def get_index_path(vector_db_path: Path, document_id: str) -> Path:
+    return Path(vector_db_path) / INDEX_DIR / f"{document_id}.json.gz"
+
+class BM25IndexWriter:
+    """
+        Build the inverted index of one document chunk by chunk and write it
+        as gzipped JSON. Postings are flat [chunk index, term frequency, ...]
+        lists and the chunk lengths are indexed by chunk index. Chunks that
+        were not added, such as dropped near-duplicates, have no length and
+        are left out of the chunk count.
+    """
+    def __init__(self, document_id: str) -> None:
+        self.document_id = document_id
+        self._lengths: Dict[int, int] = {}
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+
+    def add(self, chunk_index: int, filtered_text: str) -> None:
+        terms = Counter(tokenize(filtered_text))
+        self._lengths[chunk_index] = sum(terms.values())
+        for term, frequency in terms.items():
+            self._postings[term].extend((chunk_index, frequency))
+
+    def write(self, path: Path) -> None:
+        last_chunk_index = max(self._lengths, default=-1)
+        index = {
+            "version": INDEX_VERSION,
+            "document_id": self.document_id,
+            "lengths": [self._lengths.get(chunk_index, 0) for chunk_index in range(last_chunk_index + 1)],
+            "chunk_count": len(self._lengths),
+            "postings": self._postings,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Replace the index atomically so readers never see a partial file
+        temporary_path = path.with_name(path.name + ".tmp")
+        with gzip.open(temporary_path, "wt", encoding="utf-8") as file:
+            json.dump(index, file, separators=(",", ":"))
+        os.replace(temporary_path, path)
+
+class BM25Index(NamedTuple):
+    document_id: str
+    lengths: List[int]
+    postings: Dict[str, List[int]]
+    chunk_count: int
+
+def load_index(path: Path) -> Optional[BM25Index]:
+    """
+        Return:
+            The index stored at path, or None if there is none
+    """
+    try:
+        key = (str(path), path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    index = _loaded.get(key)
+    if index is None:
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            data = json.load(file)
+        # Version 1 indexes have a length for every chunk
+        index = BM25Index(data["document_id"], data["lengths"], data["postings"],
+                          data.get("chunk_count", len(data["lengths"])))
+        _loaded.put(key, index)
+    return index
+
+def build_index(vector_db_path: Path, document_id: str, chunks: Iterable[Tuple[int, str]]) -> Optional[BM25Index]:
+    """
+        Write the index of a document from its stored (chunk index, filtered text) pairs
+        Return:
+            The new index
+    """
+    index_writer = BM25IndexWriter(document_id)
+    for chunk_index, filtered_text in chunks:
+        index_writer.add(chunk_index, filtered_text)
+    path = get_index_path(vector_db_path, document_id)
+    index_writer.write(path)
+    return load_index(path)
+
+def delete_index(vector_db_path: Path, document_id: str) -> None:
+    get_index_path(vector_db_path, document_id).unlink(missing_ok=True)
+
+def search(indexes: Iterable[BM25Index], terms: List[str], k: int) -> List[LexicalHit]:
+    """
+        Score the chunks of several documents against the query terms as one
+        corpus, so scores are comparable across documents.
+
+        Args:
+            indexes: Indexes of the documents to search
+            terms: Query terms, from tokenize()
+            k: Number of hits returned
+        Return:
+            The k best chunks, best first
+    """
+    indexes = list(indexes)
+    chunk_count = sum(index.chunk_count for index in indexes)
+    if chunk_count == 0 or not terms:
+        return []
+    average_length = sum(sum(index.lengths) for index in indexes) / chunk_count
+    scores: Dict[Tuple[str, int], float] = defaultdict(float)
+    for term in set(terms):
+        document_frequency = sum(len(index.postings.get(term, ())) // 2 for index in indexes)
+        if document_frequency == 0:
+            continue
+        idf = math.log(1 + (chunk_count - document_frequency + 0.5) / (document_frequency + 0.5))
+        for index in indexes:
+            postings = index.postings.get(term, ())
+            for position in range(0, len(postings), 2):
+                chunk_index, frequency = postings[position], postings[position + 1]
+                length_norm = 1 - B + B * index.lengths[chunk_index] / average_length
+                scores[(index.document_id, chunk_index)] += (
+                    idf * frequency * (K1 + 1) / (frequency + K1 * length_norm))
+    best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+    return [LexicalHit(document_id, chunk_index, score) for (document_id, chunk_index), score in best]
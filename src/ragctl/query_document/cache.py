@@ -0,0 +1,144 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, NamedTuple, Optional
+from ragctl import config
+import hashlib
+import struct
+import threading
+
+# Default number of entries kept by each query cache
+DEFAULT_CACHE_ENTRIES = 1024
+
+class LRUStats(NamedTuple):
+    entries: int
+    max_entries: int
+    hits: int
+    misses: int
+
+class LRUCache:
+    """
+        Thread-safe in-memory cache holding at most `max_entries` values,
+        evicting the least recently used one first
+    """
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES) -> None:
+        self._max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+            Args:
+                key: The cache key
+            Return:
+                The cached value, or None on a miss
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if self._max_entries == 0:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+            Remove the entries whose key matches the predicate
+            Return:
+                Number of entries removed
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> LRUStats:
+        with self._lock:
+            return LRUStats(len(self._entries), self._max_entries, self._hits, self._misses)
+
+def vector_digest(vector: List[float]) -> str:
+    # Compact cache key component for an embedding
+    return hashlib.sha256(struct.pack(f"{len(vector)}f", *vector)).hexdigest()
+
+def retrieval_key(document_ids: Optional[List[str]], revision: str, question_key: str, k: int,
+                  mode: str = "vector") -> tuple:
+    """
+        Args:
+            document_ids: Documents searched, or None for every document
+            revision: Digest of the searched documents' catalog revisions
+            question_key: The question embedding digest and/or query terms
+            k: Number of chunks retrieved
+            mode: Retrieval mode
+        Return:
+            Key of a retrieval result in the retrieval cache
+    """
+    return (tuple(sorted(document_ids)) if document_ids is not None else None, revision, question_key, k, mode)
+
+# Question embeddings and retrieval results, kept per process
+_question_embeddings = None
+_retrieval_results = None
+_caches_lock = threading.Lock()
+
+def get_question_embedding_cache() -> LRUCache:
+    """Return the process-wide cache of question embeddings, keyed by (model, normalized question)"""
+    global _question_embeddings
+    if _question_embeddings is None:
+        with _caches_lock:
+            if _question_embeddings is None:
+                _question_embeddings = LRUCache(int(config.get_option(
+                    "Query", "embedding_cache_entries", str(DEFAULT_CACHE_ENTRIES))))
+    return _question_embeddings
+
+def get_retrieval_cache() -> LRUCache:
+    """Return the process-wide cache of retrieval results, keyed by retrieval_key()"""
+    global _retrieval_results
+    if _retrieval_results is None:
+        with _caches_lock:
+            if _retrieval_results is None:
+                _retrieval_results = LRUCache(int(config.get_option(
+                    "Query", "result_cache_entries", str(DEFAULT_CACHE_ENTRIES))))
+    return _retrieval_results
+
+def invalidate_document(document_id: str) -> None:
+    """Drop the cached retrieval results that may include chunks of the document"""
+    if _retrieval_results is not None:
+        _retrieval_results.invalidate(lambda key: key[0] is None or document_id in key[0])
+
+def invalidate_all_documents() -> None:
+    """Drop every cached retrieval result"""
+    if _retrieval_results is not None:
+        _retrieval_results.invalidate(lambda key: True)
+
+def document_revision(documents: List[dict]) -> str:
+    """
+        Args:
+            documents: Catalog entries of the searched documents
+        Return:
+            Digest that changes when any of the documents is re-processed, deleted or added again
+    """
+    revisions = sorted(f"{doc['id']}:{doc['md5sum']}:{doc['embedded_at']}" for doc in documents)
+    return hashlib.sha256("\n".join(revisions).encode()).hexdigest()
+
+def get_query_cache_stats() -> dict:
+    """Return the statistics of the query caches of this process"""
+    return {
+        "question_embeddings": get_question_embedding_cache().stats()._asdict(),
+        "retrieval_results": get_retrieval_cache().stats()._asdict(),
+    }
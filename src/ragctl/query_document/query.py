@@ -1,42 +1,319 @@
 from langchain_chroma import Chroma
 from langchain.prompts import ChatPromptTemplate
+from langchain_core.documents import Document
 from langchain_community.llms.ollama import Ollama
-from ragctl.embedding.bedrock import AWSBedrockEmbedding
+from langchain_core.language_models.llms import LLM
+from ragctl import config, tracing
+from ragctl.data_chunk_process.chunk_process import DataChunkProcess
+from ragctl.embedding import registry
+from ragctl.embedding.cache import CachedEmbeddings, open_embedding_cache, normalize_text
+from ragctl.embedding.pipeline import get_retrying_embeddings
+from ragctl.lexical import bm25
+from ragctl.query_document.cache import (
+    get_question_embedding_cache, get_retrieval_cache, retrieval_key, vector_digest
+)
+from ragctl.vector_store import chroma, flat
+from ragctl.vector_store.engine import ENGINE_FLAT
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import threading
+import time
+
+# Local LLM answering the questions
+LLM_MODEL = "mistral"
+
+# LLM backends, as set with `llm` in the [Query] section
+LLM_OLLAMA = "ollama"
+LLM_STUB = "stub"
+LLMS = (LLM_OLLAMA, LLM_STUB)
+
+# Retrieval modes
+MODE_VECTOR = "vector"
+MODE_LEXICAL = "lexical"
+MODE_HYBRID = "hybrid"
+MODES = (MODE_VECTOR, MODE_LEXICAL, MODE_HYBRID)
+
+# Reciprocal-rank fusion constant, and candidates taken from each ranking per chunk returned
+RRF_K = 60
+HYBRID_CANDIDATES = 4
+
+# Query embeddings by (backend, model id) and LLM client, created once per process
+_query_embeddings: Dict[Tuple[str, str], CachedEmbeddings] = {}
+_llm = None
+_clients_lock = threading.Lock()
+
+def get_query_embeddings(backend: Optional[str] = None, model_id: Optional[str] = None) -> CachedEmbeddings:
+    """
+        Return the process-wide embedding used to embed questions for a model,
+        by default the configured one
+    """
+    key = registry.resolve(backend, model_id)
+    embeddings = _query_embeddings.get(key)
+    if embeddings is None:
+        with _clients_lock:
+            embeddings = _query_embeddings.get(key)
+            if embeddings is None:
+                embedding = registry.get_backend(*key)
+                # Question embeddings are retried like the chunks of processed documents
+                embeddings = _query_embeddings[key] = CachedEmbeddings(
+                    get_retrying_embeddings(embedding.embeddings, embedding.is_retryable),
+                    embedding.cache_namespace, open_embedding_cache())
+    return embeddings
+
+def get_llm() -> LLM:
+    """Return the process-wide LLM client of the backend set in the [Query] section"""
+    global _llm
+    if _llm is None:
+        with _clients_lock:
+            if _llm is None:
+                name = config.get_option("Query", "llm", LLM_OLLAMA)
+                if name == LLM_OLLAMA:
+                    _llm = Ollama(model=LLM_MODEL)
+                elif name == LLM_STUB:
+                    from ragctl.query_document.stub import StubLLM
+                    _llm = StubLLM()
+                else:
+                    raise ValueError(f"unknown LLM {name}, use one of {', '.join(LLMS)}")
+    return _llm
+
+class EmbeddingSpace(NamedTuple):
+    # Collection holding the chunks embedded with one model
+    collection: str
+    backend: Optional[str]
+    model_id: Optional[str]
+    document_ids: List[str]
 
 class QueryDocuments:
-    def __init__(self, question: str, document_path: str) -> None:
+    def __init__(self, question: str, vector_db_path: str, document_ids: Optional[List[str]] = None,
+                 k: int = 5, revision: Optional[str] = None, mode: str = MODE_VECTOR,
+                 corpus_ids: Optional[List[str]] = None,
+                 document_embeddings: Optional[Dict[str, Tuple[Optional[str], Optional[str]]]] = None,
+                 document_stores: Optional[Dict[str, Optional[str]]] = None) -> None:
         self.question = question
-        self.document_path = document_path
+        self.vector_db_path = vector_db_path
+        # Documents to search, or None for every document in the store
+        self.document_ids = document_ids
+        self.k = k
+        # Digest of the searched documents' catalog revisions, None to skip the retrieval cache
+        self.revision = revision
+        # One of MODES
+        self.mode = mode
+        # Every searched document, which lexical search needs even when document_ids is None
+        self.corpus_ids = corpus_ids if corpus_ids is not None else document_ids or []
+        # Searched documents grouped by the model they were embedded with, from the
+        # (backend, model id) recorded for each document
+        self.spaces = self._group_spaces(document_embeddings or {})
+        # Documents stored by the flat engine; the others are in Chroma
+        self.flat_ids = {document_id for document_id, engine in (document_stores or {}).items()
+                         if engine == ENGINE_FLAT}
+        # Documents the context came from, in rank order
+        self.sources: List[str] = []
+        # Seconds spent retrieving, until the first token and generating
+        self.timings = {}
     
-    def query(self) -> str:
+    def query(self, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+            Answer the question from the retrieved chunks.
+
+            Args:
+                on_token: Called with each piece of the answer as the LLM streams it, or None to wait for the whole answer
+            Return:
+                The formatted question, answer and sources
+        """
         print("Querying the document...")
+        start = time.perf_counter()
         # Create the prompt
         PROMPT_TEMPLATE = """Answer the question based only on the following context:
         {context}
 
         Question: {question}
         """
-        embedding = AWSBedrockEmbedding()
-        db = Chroma(persist_directory=self.document_path,
-                    embedding_function=embedding.get_aws_bedrock_embedding())
-        # Similarity search
-        docs = db.similarity_search(self.question, k=5)
+        with tracing.span("query.retrieve", mode=self.mode, k=self.k):
+            docs = self._retrieve()
+        retrieved = time.perf_counter()
         # Context
         context = "\n\n---\n\n".join([doc.page_content for doc in docs])
         # Prompt
         prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
         prompt = prompt_template.format_messages(context=context, question=self.question)
         # LLM
-        llm = Ollama(model="mistral")
+        llm = get_llm()
         # Response
-        response = llm.invoke(prompt)
-     
+        first_token = None
+        with tracing.span("query.generate", streamed=on_token is not None):
+            if on_token is None:
+                response = llm.invoke(prompt)
+            else:
+                # Hand the answer over as it is generated
+                tokens = []
+                for token in llm.stream(prompt):
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    tokens.append(token)
+                    on_token(token)
+                response = "".join(tokens)
+        generated = time.perf_counter()
+        self.timings = {
+            "retrieval_seconds": round(retrieved - start, 3),
+            "first_token_seconds": round(first_token - start, 3) if first_token is not None else None,
+            "generation_seconds": round(generated - retrieved, 3),
+            "total_seconds": round(generated - start, 3),
+        }
+
         # Source
-        #sources = [doc.metadata.get("source", None) for doc in docs]
+        sources = list(dict.fromkeys(doc.metadata.get("document_id") for doc in docs))
+        self.sources = [source for source in sources if source]
         # Format the response
         formatted_response = f"""
 Question: {self.question}
 
 Response: {response}
+
+Sources: {", ".join(self.sources)}
         """
-        return formatted_response
\ No newline at end of file
+        return formatted_response
+
+    def _group_spaces(self, document_embeddings: Dict[str, Tuple[Optional[str], Optional[str]]]) -> List[EmbeddingSpace]:
+        spaces: Dict[str, EmbeddingSpace] = {}
+        for document_id in self.corpus_ids:
+            backend, model_id = document_embeddings.get(document_id, (None, None))
+            name = chroma.collection_name(backend, model_id)
+            spaces.setdefault(name, EmbeddingSpace(name, backend, model_id, [])).document_ids.append(document_id)
+        return list(spaces.values()) or [EmbeddingSpace(chroma.COLLECTION_NAME, None, None, [])]
+
+    def _space_embeddings(self, space: EmbeddingSpace) -> CachedEmbeddings:
+        # Documents embedded before the backend was recorded used the legacy backend
+        return get_query_embeddings(space.backend or registry.LEGACY_BACKEND, space.model_id)
+
+    def _embed_question(self, embeddings: CachedEmbeddings) -> List[float]:
+        cache = get_question_embedding_cache()
+        key = (embeddings.model_id, normalize_text(self.question))
+        vector = cache.get(key)
+        if vector is None:
+            with tracing.span("query.embed_question", model=embeddings.model_id):
+                vector = embeddings.embed_query(self.question)
+            cache.put(key, vector)
+        return vector
+
+    def _query_terms(self) -> List[str]:
+        # Filter the question like the indexed chunks
+        with tracing.span("query.filter"):
+            return bm25.tokenize(DataChunkProcess(self.question).process()["filtered_text"])
+
+    def _retrieve(self) -> list:
+        # One question embedding per model the searched documents were embedded with
+        vectors = {space.collection: self._embed_question(self._space_embeddings(space))
+                   for space in self.spaces} if self.mode != MODE_LEXICAL else {}
+        terms = self._query_terms() if self.mode != MODE_VECTOR else None
+        cache = get_retrieval_cache()
+        key = None
+        if self.revision is not None:
+            question_key = " ".join([vector_digest(vectors[name]) for name in sorted(vectors)]
+                                    + (terms or []))
+            key = retrieval_key(self.document_ids, self.revision, question_key, self.k, self.mode)
+            docs = cache.get(key)
+            if docs is not None:
+                return docs
+        if self.mode == MODE_VECTOR:
+            docs = self._vector_search(vectors, self.k)
+        elif self.mode == MODE_LEXICAL:
+            docs = self._lexical_search(terms, self.k)
+        else:
+            candidates = self.k * HYBRID_CANDIDATES
+            docs = fuse_rankings([self._vector_search(vectors, candidates),
+                                  self._lexical_search(terms, candidates)], self.k)
+        if key is not None:
+            cache.put(key, docs)
+        return docs
+
+    def _vector_search(self, vectors: Dict[str, List[float]], k: int) -> List[Document]:
+        rankings = []
+        for space in self.spaces:
+            vector = vectors[space.collection]
+            chroma_ids = [document_id for document_id in space.document_ids if document_id not in self.flat_ids]
+            flat_ids = [document_id for document_id in space.document_ids if document_id in self.flat_ids]
+            if chroma_ids or not flat_ids:
+                db = Chroma(client=chroma.get_client(self.vector_db_path),
+                            collection_name=space.collection,
+                            embedding_function=self._space_embeddings(space))
+                # One similarity search over the chunks of all the documents embedded with the model.
+                # A collection only holds embedded documents when every document is searched.
+                document_ids = None if self.document_ids is None else chroma_ids
+                with tracing.span("vector_store.search", engine="chroma", collection=space.collection, k=k):
+                    rankings.append(db.similarity_search_by_vector(vector, k=k,
+                                                                   filter=chroma.document_filter(document_ids)))
+            if flat_ids:
+                with tracing.span("vector_store.search", engine="flat", documents=len(flat_ids), k=k):
+                    rankings.append([Document(page_content=hit.text, metadata=hit.metadata)
+                                     for hit in flat.search(self.vector_db_path, flat_ids, vector, k)])
+        # Distances of different models and engines cannot be compared, their ranks can
+        return rankings[0] if len(rankings) == 1 else fuse_rankings(rankings, k)
+
+    def _lexical_search(self, terms: List[str], k: int) -> List[Document]:
+        spaces = {}
+        indexes = []
+        for space in self.spaces:
+            for document_id in space.document_ids:
+                spaces[document_id] = space.collection
+                index = self._load_index(space.collection, document_id)
+                if index is not None:
+                    indexes.append(index)
+        ids_by_collection: Dict[str, List[str]] = {}
+        flat_hits: Dict[str, List[int]] = {}
+        ids = []
+        with tracing.span("lexical.search", documents=len(indexes), k=k):
+            hits = bm25.search(indexes, terms, k)
+        for hit in hits:
+            ids.append(f"{hit.document_id}-{hit.chunk_index}")
+            if hit.document_id in self.flat_ids:
+                flat_hits.setdefault(hit.document_id, []).append(hit.chunk_index)
+            else:
+                ids_by_collection.setdefault(spaces[hit.document_id], []).append(ids[-1])
+        # Only the text of the best chunks is read from the store
+        chunks = {}
+        for name, chunk_ids in ids_by_collection.items():
+            with tracing.span("vector_store.get", engine="chroma", collection=name, chunks=len(chunk_ids)):
+                stored = chroma.get_collection(self.vector_db_path, name).get(ids=chunk_ids,
+                                                                              include=["documents", "metadatas"])
+            chunks.update({chunk_id: Document(page_content=text, metadata=metadata or {})
+                           for chunk_id, text, metadata in zip(stored["ids"], stored["documents"],
+                                                               stored["metadatas"])})
+        for document_id, chunk_indexes in flat_hits.items():
+            with tracing.span("vector_store.get", engine="flat", document_id=document_id, chunks=len(chunk_indexes)):
+                stored = flat.get_chunks(self.vector_db_path, document_id, chunk_indexes)
+            chunks.update({f"{document_id}-{chunk_index}": Document(page_content=chunk["text"],
+                                                                    metadata=chunk["metadata"])
+                           for chunk_index, chunk in stored.items()})
+        return [chunks[chunk_id] for chunk_id in ids if chunk_id in chunks]
+
+    def _load_index(self, collection_name: str, document_id: str) -> Optional[bm25.BM25Index]:
+        index = bm25.load_index(bm25.get_index_path(self.vector_db_path, document_id))
+        if index is None and document_id not in self.flat_ids:
+            # Documents processed before lexical indexing are indexed on first use
+            with tracing.span("lexical.index", document_id=document_id):
+                collection = chroma.get_collection(self.vector_db_path, collection_name)
+                stored = collection.get(where={"document_id": document_id}, include=["documents", "metadatas"])
+                if not stored["ids"]:
+                    return None
+                index = bm25.build_index(self.vector_db_path, document_id,
+                                         ((metadata["chunk_index"], text)
+                                          for text, metadata in zip(stored["documents"], stored["metadatas"])))
+        return index
+
+def fuse_rankings(rankings: List[List[Document]], k: int) -> List[Document]:
+    """
+        Merge rankings of chunks with reciprocal-rank fusion
+        Args:
+            rankings: Chunks ranked by each retriever, best first
+            k: Number of chunks returned
+        Return:
+            The k chunks with the best fused score, best first
+    """
+    scores = {}
+    chunks = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = (doc.metadata.get("document_id"), doc.metadata.get("chunk_index"))
+            scores[key] = scores.get(key, 0.0) + 1 / (RRF_K + rank + 1)
+            chunks.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [chunks[key] for key in best]
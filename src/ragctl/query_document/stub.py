@@ -0,0 +1,31 @@
+from typing import Any, Iterator, List, Optional
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+class StubLLM(LLM):
+    """
+        Local, deterministic LLM for tests and benchmarks. The answer only
+        depends on the prompt size and is streamed one word at a time, so
+        queries can be measured without a running model.
+    """
+    model: str = "stub"
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _answer(self, prompt: str) -> List[str]:
+        return f"Stub answer to a prompt of {len(prompt)} characters.".split(" ")
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None,
+              run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> str:
+        return " ".join(self._answer(prompt))
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        for index, word in enumerate(self._answer(prompt)):
+            chunk = GenerationChunk(text=word if index == 0 else f" {word}")
+            if run_manager is not None:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
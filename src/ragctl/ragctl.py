@@ -1,15 +1,25 @@
 # ragctl/ragctl.py
 
-from typing import Dict, NamedTuple, Any, List
+from typing import Dict, NamedTuple, Any, List, Optional, Callable
 from pathlib import Path
-from ragctl.database import DatabaseHandler
-from ragctl import SUCCESS, DB_READ_ERROR, DB_WRITE_ERROR, DOC_ID_ERROR, DOC_EMBEDDING_ERROR, DOC_NOT_FOUND_ERROR,DOC_PROCESS_ERROR
+from ragctl.blob_store import BlobStore
+from ragctl.database import DatabaseHandler, STATE_PENDING, STATE_PARTIAL, STATE_EMBEDDED, STATE_FAILED
+from ragctl import ERRORS, SUCCESS, DB_READ_ERROR, DB_WRITE_ERROR, DOC_ID_ERROR, DOC_EMBEDDING_ERROR, DOC_NOT_FOUND_ERROR,DOC_PROCESS_ERROR
+from ragctl import tracing
 from ragctl.helper.validate_doc import ValidateDocumentFormat
-from ragctl.document_process.process_doc import ProcessDocument
-from ragctl.query_document.query import QueryDocuments
+from ragctl.helper.fingerprint import FileStat, file_fingerprint, get_file_stat
+from ragctl.query_document.cache import document_revision, invalidate_all_documents, invalidate_document
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+import json
 import os
 import shutil
-import hashlib
+import time
+
+# Number of processed documents recorded in the database per transaction
+CATALOG_UPDATE_BATCH = 50
+
+# Hex digits of the content hash a document id ends with, more when another document has them
+DOCUMENT_ID_LENGTH = 4
 
 # Create a NamedTuple to store the Document result
 class DocumentResult(NamedTuple):
@@ -17,90 +27,185 @@ class DocumentResult(NamedTuple):
     error: int
 
 class RagDocOperations:
-    def __init__(self, db_path: Path) -> None:
+    def __init__(self, db_path: Path, docs_path: Optional[Path] = None,
+                 vector_db_path: Optional[Path] = None) -> None:
         self._db_handler = DatabaseHandler(db_path)
         # Set the documents folder path
-        self._docs_path = Path(__file__).parent / "documents"
+        self._docs_path = Path(docs_path) if docs_path else Path(__file__).parent / "documents"
+        # Added documents, stored once per content hash
+        self._blobs = BlobStore(self._docs_path, self._db_handler)
         # Set the vector database path
-        self._vector_db_path = Path(__file__).parent / "vector_db"
+        self._vector_db_path = Path(vector_db_path) if vector_db_path else Path(__file__).parent / "vector_db"
+        # Catalog revision the open vector store reflects
+        self._catalog_revision = None
     
     # Method: Add list of documents to the database
-    def add_docs(self, documents_path: List[str]) -> DocumentResult:
+    def add_docs(self, documents_path: List[str], jobs: int = 1,
+                 on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 tags: Optional[List[str]] = None) -> DocumentResult:
+        """
+        Hash, validate and store documents on a pool of `jobs` threads and add
+        them to the database in a single commit, labelled with `tags`.
+        Per-document results are passed to `on_result` as they finish.
+        """
+        result = []
+        new_documents = []
+        pending = {}
+
+        def abandon(error: int) -> DocumentResult:
+            # Stored documents that will not be added hold blob references, so
+            # wait for the stores still running and release them all
+            for future, (stage, _, _) in list(pending.items()):
+                if stage == "store":
+                    try:
+                        stored = future.result()
+                    except Exception:
+                        stored = None
+                    if stored is not None:
+                        new_documents.append(stored)
+            pending.clear()
+            for document_info in new_documents:
+                try:
+                    self._blobs.release(document_info['md5sum'])
+                except Exception:
+                    # Left for delete-all to remove
+                    pass
+            return DocumentResult({}, error)
+
         try:
-            result = []
-            for document in documents_path:
-                # Check if the document exists
-                if not os.path.exists(document):
-                    result.append({
-                        "document": document,
-                        "status": 1,
-                        "message": "Document path does'nt exists"
-                    })
-                    continue
-                
-                # Check if the document is in valid format
-                if not ValidateDocumentFormat(document).validate():
-                    result.append({
-                        "document": document,
-                        "status": 1,
-                        "message": "Invalid document format"
-                    })
-                    continue
-                
-                # Find the document type
-                document_format = ValidateDocumentFormat(document).get_document_format()
-
-                # Get the document hash
-                doc_hash = hashlib.sha256(document.encode()).hexdigest()
-                
-                # Check if the document already exists in the database
-                read_document = self._db_handler.read()
-                if any(doc['md5sum'] == doc_hash for doc in read_document.data):
-                    result.append({
-                        "document": document,
-                        "status": 1,
-                        "message": "Document already exists"
-                    })
-                    continue
-                # Create a folder inside documents folder with the doc_hash last 4 characters
-                doc_folder = self._docs_path / doc_hash[-4:]
-                os.makedirs(doc_folder, exist_ok=True)
-                
-                # Get the document size
-                doc_size = self._get_document_size(document)
-                
-                # Get the document basename
-                doc_basename = os.path.basename(document)
-
-                # Prepare the document info
-                document_info = {
-                    "id" : doc_hash[-4:],
-                    "md5sum": doc_hash,
-                    "size": doc_size,
-                    "name": doc_basename,
-                    "path": f"{doc_folder}/{doc_basename}",
-                    "embedded": "False",
-                    "type": document_format
+            batch_hashes = set()
+            batch_ids = set()
+
+            def report(document: str, status: int, message: str) -> None:
+                document_result = {
+                    "document": document,
+                    "status": status,
+                    "message": message
                 }
-                # Copy the document to the documents folder
-                shutil.copy(document, document_info['path'])
+                result.append(document_result)
+                if on_result is not None:
+                    on_result(document_result)
 
-                # Add the document to the database
-                read_db = self._db_handler.read()
-                if read_db.error:
-                    return DocumentResult({}, DB_READ_ERROR)
-                read_db.data.append(document_info)
-                write_db = self._db_handler.write(read_db.data)
+            def fingerprint(document: str) -> str:
+                with tracing.span("document.hash", document=document):
+                    return file_fingerprint(document)
+
+            jobs = max(1, jobs)
+            documents = iter(documents_path)
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                while True:
+                    # Keep a bounded number of documents in flight
+                    while len(pending) < jobs * 2:
+                        document = next(documents, None)
+                        if document is None:
+                            break
+                        # Check if the document exists
+                        if not os.path.exists(document):
+                            report(document, 1, "Document path does'nt exists")
+                            continue
+                        # Skip rehashing when the same file was already added unchanged
+                        file_stat = get_file_stat(document)
+                        find_document = self._db_handler.find_by_source(file_stat.path)
+                        if find_document.error:
+                            return abandon(DB_READ_ERROR)
+                        if any(doc['source_size'] == file_stat.size and doc['source_mtime'] == file_stat.mtime
+                               for doc in find_document.data):
+                            report(document, 1, "Document already exists")
+                            continue
+                        # Get the document hash from its content
+                        future = executor.submit(tracing.propagate(fingerprint), document)
+                        pending[future] = ("hash", document, file_stat)
+                    if not pending:
+                        break
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage, document, file_stat = pending.pop(future)
+                        try:
+                            stage_result = future.result()
+                        except OSError as e:
+                            report(document, 1, f"Document read error: {e}")
+                            continue
+                        except ValueError as e:
+                            # Storage settings the blob store cannot use
+                            report(document, 1, f"Document store error: {e}")
+                            continue
+
+                        if stage == "hash":
+                            doc_hash = stage_result
+                            # Check if the document already exists in the database or in this batch
+                            find_document = self._db_handler.find_by_hash(doc_hash)
+                            if find_document.error:
+                                return abandon(DB_READ_ERROR)
+                            if find_document.data or doc_hash in batch_hashes:
+                                report(document, 1, "Document already exists")
+                                continue
+                            # The document id is the end of the hash, taking more of it when that end is in use
+                            for id_length in range(DOCUMENT_ID_LENGTH, len(doc_hash) + 1):
+                                document_id = doc_hash[-id_length:]
+                                find_document = self._db_handler.get(document_id)
+                                if find_document.error:
+                                    return abandon(DB_READ_ERROR)
+                                if not find_document.data and document_id not in batch_ids:
+                                    break
+                            batch_hashes.add(doc_hash)
+                            batch_ids.add(document_id)
+                            # Validate and store the document
+                            future = executor.submit(tracing.propagate(self._store_document),
+                                                     document, file_stat, doc_hash, document_id, tags)
+                            pending[future] = ("store", document, file_stat)
+                        elif stage_result is None:
+                            report(document, 1, "Invalid document format")
+                        else:
+                            new_documents.append(stage_result)
+                            report(document, 0, "Document added successfully")
+
+            # Add the new documents to the database in a single commit
+            if new_documents:
+                with tracing.span("catalog.write", documents=len(new_documents)):
+                    write_db = self._db_handler.insert(new_documents)
                 if write_db.error:
-                    return DocumentResult({}, DB_WRITE_ERROR)
-                result.append({
-                        "document": document,
-                        "status": 0,
-                        "message": "Document added successfully"
-                    })
+                    return abandon(DB_WRITE_ERROR)
             return DocumentResult(result, SUCCESS)
         except Exception as e:
-            return DocumentResult({}, DB_WRITE_ERROR)
+            return abandon(DB_WRITE_ERROR)
+
+    # Method: Validate a document and store it in the blob store
+    def _store_document(self, document: str, file_stat: FileStat, doc_hash: str, document_id: str,
+                        tags: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        # Detect the document type once and check it is a valid format
+        with tracing.span("document.validate", document=document):
+            validator = ValidateDocumentFormat(document)
+            if not validator.validate():
+                return None
+            document_format = validator.detect()
+
+        # Get the document size
+        doc_size = self._get_document_size(document)
+        
+        # Get the document basename
+        doc_basename = os.path.basename(document)
+
+        # Prepare the document info
+        document_info = {
+            "id" : document_id,
+            "md5sum": doc_hash,
+            "size": doc_size,
+            "name": doc_basename,
+            "path": None,
+            "state": STATE_PENDING,
+            "checkpoint": 0,
+            "type": document_format.format,
+            "format_meta": json.dumps(document_format.metadata),
+            "source": file_stat.path,
+            "source_size": file_stat.size,
+            "source_mtime": file_stat.mtime,
+            "tags": ",".join(dict.fromkeys(tags)) if tags else None
+        }
+        # Link or copy the document to the blob store, once per content
+        with tracing.span("document.store", document=document, size=doc_size, link=self._blobs.link):
+            document_info['path'] = str(self._blobs.add(document, doc_hash))
+        return document_info
     
     # Method: Get the size of document
     def _get_document_size(self, document_path: str) -> int:
@@ -137,20 +242,23 @@ class RagDocOperations:
     def delete_all_documents(self) -> DocumentResult:
         try:
             # Check if the database is empty
-            read_db = self._db_handler.read()
-            if len(read_db.data) == 0:
+            if self._db_handler.count() == 0:
                 return DocumentResult({}, DOC_NOT_FOUND_ERROR)
             # Delete all the documents from the database
             write_to_db = self._db_handler.write([])
             if write_to_db.error:
                 return DocumentResult({}, DB_WRITE_ERROR)
             # Delete all the documents from the document folder
+            self._db_handler.clear_blobs()
             for file in os.listdir(self._docs_path):
-                if file != "README.md":
+                if (self._docs_path / file).is_dir() and file != "__pycache__":
                     shutil.rmtree(self._docs_path / file)
             # Delete all the documents from the database folder
+            from ragctl.vector_store import chroma
+            chroma.clear_store(self._vector_db_path)
+            invalidate_all_documents()
             for file in os.listdir(self._vector_db_path):
-                if file != "README.md":
+                if file not in ("README.md", chroma.STORE_DIR):
                     shutil.rmtree(self._vector_db_path / file)
             return DocumentResult({}, SUCCESS)
         except Exception as e:
@@ -160,106 +268,344 @@ class RagDocOperations:
     # Method: Delete the particular document
     def delete_document(self, document_id: str) -> DocumentResult:
         try:
-            read_db = self._db_handler.read()
+            read_db = self._db_handler.get(document_id)
             if read_db.error:
                 return DocumentResult({}, DB_READ_ERROR)
             
             # Check if document id exists
-            document_id_found = False
-            for doc in read_db.data:
-                if doc['id'] == document_id:
-                    document_id_found = True
-                    break
-            if not document_id_found:
+            if not read_db.data:
                 return DocumentResult({}, DOC_ID_ERROR)
+            doc = read_db.data[0]
             
             # Delete the document from the database
-            updated_data = [doc for doc in read_db.data if doc['id'] != document_id]
-            write_to_db = self._db_handler.write(updated_data)
+            write_to_db = self._db_handler.delete(document_id)
             if write_to_db.error:
                 return DocumentResult({}, DB_WRITE_ERROR)
-            # Delete the document from the document folder and vector database
+            # Delete the document from the blob store, or its folder when added before it, and vector database
+            self._blobs.release(doc['md5sum'])
             if os.path.exists(self._docs_path / document_id):
                 shutil.rmtree(self._docs_path / document_id)
-            if os.path.exists(self._vector_db_path / document_id):
-                shutil.rmtree(self._vector_db_path / document_id)
+            from ragctl.lexical import bm25
+            self._delete_vectors(document_id)
+            bm25.delete_index(self._vector_db_path, document_id)
+            invalidate_document(document_id)
             return DocumentResult({}, SUCCESS)
         except Exception as e:
             print(e)
             return DocumentResult({}, DB_READ_ERROR)
     
     # Method: Process the added document and store it in the vector database
-    def process_document(self, document_id: str) -> DocumentResult:
+    def process_document(self, document_id: str, vector_store: Optional[str] = None,
+                         chunking: Optional[str] = None) -> DocumentResult:
         try:
-            read_db = self._db_handler.read()
+            read_db = self._db_handler.get(document_id)
             if read_db.error:
                 return DocumentResult({}, DB_READ_ERROR)
 
             # Check if the document id exists
-            document_id_found = False
-            document_format = None
-            document_hash = None
-            document_path = None
-
-            for doc in read_db.data:
-                if doc['id'] == document_id:
-                    if doc['embedded'] == "True":
-                        return DocumentResult({}, DOC_EMBEDDING_ERROR)
-                    document_id_found = True
-                    # Get the document information
-                    document_format = ValidateDocumentFormat(doc['path']).get_document_format()
-                    document_hash = doc['md5sum']
-                    document_path = doc['path']
-                    break
-            if not document_id_found:
+            if not read_db.data:
                 return DocumentResult({}, DOC_ID_ERROR)
+            doc = read_db.data[0]
+            if doc['state'] == STATE_EMBEDDED:
+                return DocumentResult({}, DOC_EMBEDDING_ERROR)
+            # Get the document information, detected when the document was added
+            document_format = doc['type'] or ValidateDocumentFormat(doc['path']).get_document_format()
+            document_hash = doc['md5sum']
+            with tracing.span("document.open", document_id=document_id):
+                document_path = str(self._blobs.open(document_hash, doc['path']))
             
             # Process the document and store it in the vector database
+            with tracing.span("import", module="ragctl.document_process"):
+                from ragctl.document_process.process_doc import ProcessDocument
+            embedding, vector_store, chunking, checkpoint = self._prepare_processing(doc, vector_store, chunking)
             process_doc = ProcessDocument(document_path, self._vector_db_path,
-                                              document_hash, document_format)
+                                              document_hash, document_format,
+                                              document_id=document_id,
+                                              checkpoint=checkpoint,
+                                              on_checkpoint=self._checkpoint_writer(document_id),
+                                              embedding=embedding, vector_store=vector_store,
+                                              chunking=chunking)
             if process_doc.process():
                 # Update the document status in the database
-                for doc in read_db.data:
-                    if doc['id'] == document_id:
-                        doc['embedded'] = "True"
-                        write_db = self._db_handler.write(read_db.data)
-                        if write_db.error:
-                            return DocumentResult({}, DB_WRITE_ERROR)
-                        break
-                return DocumentResult({}, SUCCESS)
+                with tracing.span("catalog.write", documents=1):
+                    write_db = self._db_handler.update(document_id, {"state": STATE_EMBEDDED,
+                                                                     "checkpoint": process_doc.checkpoint,
+                                                                     "embedded_at": time.time()})
+                invalidate_document(document_id)
+                if write_db.error:
+                    return DocumentResult({}, DB_WRITE_ERROR)
+                return DocumentResult({"chunks": process_doc.chunk_count,
+                                       "duplicates": process_doc.duplicate_count,
+                                       "warning": self._compress_blob(document_id, document_hash)}, SUCCESS)
             else:
-                return DocumentResult({}, DOC_PROCESS_ERROR)
+                # Keep the checkpoint so the next run resumes from it
+                self._db_handler.update(document_id, {"state": STATE_FAILED})
+                return DocumentResult({"message": process_doc.error}, DOC_PROCESS_ERROR)
         except Exception as e:
-            return DocumentResult({}, DOC_PROCESS_ERROR)
+            return DocumentResult({"message": f"{type(e).__name__}: {e}"}, DOC_PROCESS_ERROR)
     
+    # Method: Record the embedding model, vector store and chunking a document is processed with
+    def _prepare_processing(self, doc: Dict[str, Any], vector_store: Optional[str] = None,
+                            chunking: Optional[str] = None) -> tuple:
+        """
+        Return the configured embedding backend, the vector store engine, the
+        chunking (the `chunking` strategy with its configured sizes, by default
+        the configured strategy) and the checkpoint to resume the document
+        from. Chunks stored with another model, engine or chunking are
+        dropped, so processing starts over.
+        """
+        from ragctl.chunking.splitters import get_chunking, parse_spec
+        from ragctl.embedding import registry
+        from ragctl.vector_store.engine import LEGACY_ENGINE, get_engine_name
+        with tracing.span("embedding.load"):
+            embedding = registry.get_backend()
+        vector_store = vector_store or get_engine_name()
+        chunking = get_chunking(chunking)
+        checkpoint = doc['checkpoint']
+        recorded = (registry.resolve(doc['embedding_backend'] or registry.LEGACY_BACKEND, doc['embedding_model']),
+                    doc['vector_store'] or LEGACY_ENGINE, parse_spec(doc['chunking']))
+        if recorded != ((embedding.name, embedding.model_id), vector_store, chunking):
+            self._delete_vectors(doc['id'])
+            checkpoint = 0
+        self._db_handler.update(doc['id'], {"checkpoint": checkpoint,
+                                            "embedding_backend": embedding.name,
+                                            "embedding_model": embedding.model_id,
+                                            "vector_store": vector_store,
+                                            "chunking": str(chunking)})
+        return embedding, vector_store, chunking, checkpoint
+
+    # Method: Delete the vectors of a document from every vector store engine
+    def _delete_vectors(self, document_id: str) -> None:
+        from ragctl.vector_store import chroma, flat
+        chroma.delete_document(self._vector_db_path, document_id)
+        flat.delete_document(self._vector_db_path, document_id)
+
+    # Method: Compress the blob of an embedded document
+    def _compress_blob(self, document_id: str, document_hash: str) -> Optional[str]:
+        """
+        Compress the blob of a document once it is embedded, as it is only
+        read again if the document is processed again. Compression only saves
+        space, so a failure does not fail the document.
+
+        Return:
+            A warning when the blob could not be compressed, otherwise None
+        """
+        try:
+            with tracing.span("document.compress", document_id=document_id):
+                self._blobs.compress(document_hash)
+        except Exception as e:
+            return f"Compress document failed: {type(e).__name__}: {e}"
+        return None
+
+    # Method: Record the processing progress of a document
+    def _checkpoint_writer(self, document_id: str) -> Callable[[int], None]:
+        def write_checkpoint(checkpoint: int) -> None:
+            # Chunks before the checkpoint are stored and skipped by the next run
+            self._db_handler.update(document_id, {"state": STATE_PARTIAL, "checkpoint": checkpoint})
+        return write_checkpoint
+
+    # Method: Process several documents with parsing and embedding overlapped
+    def process_documents(self, document_ids: Optional[List[str]] = None, jobs: int = 2, embed_jobs: int = 2,
+                          on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+                          vector_store: Optional[str] = None, chunking: Optional[str] = None) -> DocumentResult:
+        """
+        Process the given documents, or every document not embedded yet.
+        Up to `jobs` documents are loaded, split and filtered at once while
+        the windows of earlier documents are embedded on `embed_jobs` shared
+        threads. The database is updated in batches. Per-document results
+        are passed to `on_result` as they finish. The vectors are stored with
+        the `vector_store` engine and the documents split with the `chunking`
+        strategy, by default the configured ones.
+        """
+        try:
+            if document_ids is None:
+                read_db = self._db_handler.find_unembedded()
+                if read_db.error:
+                    return DocumentResult({}, DB_READ_ERROR)
+                documents = read_db.data
+            else:
+                documents = []
+                for document_id in dict.fromkeys(document_ids):
+                    read_db = self._db_handler.get(document_id)
+                    if read_db.error:
+                        return DocumentResult({}, DB_READ_ERROR)
+                    documents.extend(read_db.data or [{"id": document_id, "state": None}])
+
+            with tracing.span("import", module="ragctl.document_process"):
+                from ragctl.document_process.process_doc import ProcessDocument
+            results = []
+            updates = {}
+            chunk_count = 0
+            duplicate_count = 0
+
+            def report(document_id: str, status: int, message: str, warning: Optional[str] = None) -> None:
+                document_result = {
+                    "document": document_id,
+                    "status": status,
+                    "message": message,
+                    "warning": warning
+                }
+                results.append(document_result)
+                if on_result is not None:
+                    on_result(document_result)
+
+            def process_one(doc: Dict[str, Any], embed_executor: ThreadPoolExecutor) -> tuple:
+                document_format = doc['type'] or ValidateDocumentFormat(doc['path']).get_document_format()
+                embedding, engine, spec, checkpoint = self._prepare_processing(doc, vector_store, chunking)
+                with tracing.span("document.open", document_id=doc['id']):
+                    document_path = str(self._blobs.open(doc['md5sum'], doc['path']))
+                process_doc = ProcessDocument(document_path, self._vector_db_path, doc['md5sum'],
+                                              document_format, embed_executor,
+                                              document_id=doc['id'],
+                                              checkpoint=checkpoint,
+                                              on_checkpoint=self._checkpoint_writer(doc['id']),
+                                              embedding=embedding, vector_store=engine, chunking=spec)
+                if not process_doc.process():
+                    raise RuntimeError(f"{ERRORS[DOC_PROCESS_ERROR]}: {process_doc.error}")
+                return process_doc, self._compress_blob(doc['id'], doc['md5sum'])
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(1, embed_jobs)) as embed_executor, \
+                    ThreadPoolExecutor(max_workers=max(1, jobs)) as parse_executor:
+                futures = {}
+                for doc in documents:
+                    if doc['state'] is None:
+                        report(doc['id'], 1, ERRORS[DOC_ID_ERROR])
+                    elif doc['state'] == STATE_EMBEDDED:
+                        report(doc['id'], 1, ERRORS[DOC_EMBEDDING_ERROR])
+                    else:
+                        futures[parse_executor.submit(tracing.propagate(process_one), doc, embed_executor)] = doc['id']
+                for future in as_completed(futures):
+                    document_id = futures[future]
+                    try:
+                        process_doc, warning = future.result()
+                    except Exception as e:
+                        # Keep the checkpoint so the next run resumes from it
+                        updates[document_id] = {"state": STATE_FAILED}
+                        report(document_id, 1, str(e))
+                    else:
+                        chunk_count += process_doc.chunk_count
+                        duplicate_count += process_doc.duplicate_count
+                        updates[document_id] = {"state": STATE_EMBEDDED, "checkpoint": process_doc.checkpoint,
+                                                "embedded_at": time.time()}
+                        invalidate_document(document_id)
+                        report(document_id, 0, "Document processed successfully", warning)
+                    # Update the document status in the database in batches
+                    if len(updates) >= CATALOG_UPDATE_BATCH:
+                        with tracing.span("catalog.write", documents=len(updates)):
+                            written = self._db_handler.update_many(updates)
+                        if written.error:
+                            return DocumentResult({}, DB_WRITE_ERROR)
+                        updates = {}
+            if updates:
+                with tracing.span("catalog.write", documents=len(updates)):
+                    written = self._db_handler.update_many(updates)
+                if written.error:
+                    return DocumentResult({}, DB_WRITE_ERROR)
+
+            elapsed = time.perf_counter() - start
+            processed = sum(1 for result in results if result['status'] == 0)
+            summary = {
+                "documents": processed,
+                "failed": len(results) - processed,
+                "chunks": chunk_count,
+                "duplicates": duplicate_count,
+                "seconds": round(elapsed, 3),
+                "documents_per_second": round(processed / elapsed, 3) if elapsed else 0.0,
+                "chunks_per_second": round(chunk_count / elapsed, 3) if elapsed else 0.0,
+            }
+            return DocumentResult({"results": results, "summary": summary}, SUCCESS)
+        except Exception as e:
+            return DocumentResult({}, DOC_PROCESS_ERROR)
+
+    # Method: Open the clients and stores used by queries ahead of time
+    def warm_up(self) -> None:
+        from ragctl.query_document.query import get_llm, get_query_embeddings
+        from ragctl.vector_store import chroma
+        get_query_embeddings()
+        get_llm()
+        chroma.get_collection(self._vector_db_path)
+        self._catalog_revision = self._db_handler.revision()
+
+    # Method: Check if another process changed the catalog since the vector store was opened
+    def is_stale(self) -> bool:
+        return self._db_handler.revision() != self._catalog_revision
+
+    # Method: Reopen the vector store after another process changed the catalog
+    def refresh(self) -> bool:
+        """
+        Reopen the vector store if the catalog changed. Chroma closes the
+        stores of the whole process, so no query may be using them.
+        """
+        revision = self._db_handler.revision()
+        if revision == self._catalog_revision:
+            return False
+        # Documents were processed or deleted by another process
+        from ragctl.vector_store import chroma
+        chroma.reopen_store(self._vector_db_path)
+        self._catalog_revision = revision
+        return True
+
     # Method: Query the vector database
-    def query_document(self, document_id:str, query: str) -> dict:
+    def query_document(self, document_id: str, query: str) -> dict:
+        return self.query_documents(query, document_ids=[document_id])
+
+    # Method: Query several documents at once
+    def query_documents(self, query: str, document_ids: Optional[List[str]] = None,
+                        tags: Optional[List[str]] = None, k: int = 5,
+                        on_token: Optional[Callable[[str], None]] = None, mode: str = "vector") -> dict:
+        """
+        Answer a question from the given documents, the documents carrying
+        any of the tags, or every embedded document. The chunks of all the
+        documents are searched at once and the top `k` are used as context.
+        With `on_token`, the answer is streamed to it as it is generated.
+        `mode` selects vector, lexical (BM25) or hybrid retrieval.
+        """
         try:
-            # Read the database
-            read_db = self._db_handler.read()
-            if read_db.error:
-                return {"error": DB_READ_ERROR}
-
-            # Check if the document id exists and embedding is True
-            document_id_found = False
-            vector_db_path = None
-            for doc in read_db.data:
-                if doc['id'] == document_id:
-                    if doc['embedded'] == "False":
+            if document_ids:
+                documents = []
+                for document_id in dict.fromkeys(document_ids):
+                    read_db = self._db_handler.get(document_id)
+                    if read_db.error:
+                        return {"error": DB_READ_ERROR}
+                    # Check if the document id exists and is embedded
+                    if not read_db.data:
+                        return {"error": DOC_ID_ERROR}
+                    if read_db.data[0]['state'] != STATE_EMBEDDED:
                         return {"error": DOC_EMBEDDING_ERROR}
-                    document_id_found = True
-                    vector_db_path = os.path.join(self._vector_db_path, doc['id'])
-                    break
-            if not document_id_found:
-                return {"error": DOC_ID_ERROR}
-            
+                    documents.extend(read_db.data)
+            else:
+                read_db = self._db_handler.find_by_tags(tags) if tags else self._db_handler.read()
+                if read_db.error:
+                    return {"error": DB_READ_ERROR}
+                documents = [doc for doc in read_db.data if doc['state'] == STATE_EMBEDDED]
+                if not documents:
+                    return {"error": DOC_NOT_FOUND_ERROR}
+            search_ids = [doc['id'] for doc in documents]
+            if not document_ids and not tags and len(documents) == len(read_db.data):
+                # Every document is embedded, so the search needs no filter
+                search_ids = None
+
             # Query the vector database
-            query_doc = QueryDocuments(f"{query}", vector_db_path)
-            result = query_doc.query()
+            with tracing.span("import", module="ragctl.query_document"):
+                from ragctl.vector_store import chroma
+                from ragctl.query_document.query import QueryDocuments
+            for doc in documents:
+                chroma.import_legacy_store(self._vector_db_path, doc['id'])
+            query_doc = QueryDocuments(f"{query}", self._vector_db_path, search_ids, k,
+                                       revision=document_revision(documents), mode=mode,
+                                       corpus_ids=[doc['id'] for doc in documents],
+                                       document_embeddings={doc['id']: (doc['embedding_backend'], doc['embedding_model'])
+                                                            for doc in documents},
+                                       document_stores={doc['id']: doc['vector_store'] for doc in documents})
+            with tracing.span("query.answer", mode=mode, k=k, documents=len(documents)):
+                result = query_doc.query(on_token)
             return {
                 "result": result,
+                "sources": query_doc.sources,
+                "timings": query_doc.timings,
                 "error": SUCCESS
             }
         except Exception as e:
             print(f"Error querying document: {e}")
-            return {"error": DB_READ_ERROR}
\ No newline at end of file
+            return {"error": DB_READ_ERROR}
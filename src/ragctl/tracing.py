@@ -0,0 +1,180 @@
+# ragctl/tracing.py
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+import contextvars
+import threading
+import time
+
+# Spans are only measured while a profile or an exporter is active, so the
+# stages pay nothing otherwise. OpenTelemetry is imported when exporting.
+
+class StageStats(NamedTuple):
+    name: str
+    calls: int
+    seconds: float
+    max_seconds: float
+    errors: int
+
+class Profile:
+    """
+        Time spent in each stage, summed over its spans. Spans run on
+        several threads, so stages can add up to more than the wall time.
+    """
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        # Stages in the order they were first seen
+        self._stages: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            stats = self._stages.get(name) or StageStats(name, 0, 0.0, 0.0, 0)
+            self._stages[name] = StageStats(name, stats.calls + 1, stats.seconds + seconds,
+                                            max(stats.max_seconds, seconds), stats.errors + int(error))
+
+    def stages(self) -> List[StageStats]:
+        with self._lock:
+            return list(self._stages.values())
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+_profile: Optional[Profile] = None
+_tracer = None
+_provider = None
+
+def start_profile() -> Profile:
+    """Start summing the time of every span of this process"""
+    global _profile
+    _profile = Profile()
+    return _profile
+
+def start_export(path: Path) -> None:
+    """
+        Export every span of this process through the OpenTelemetry SDK,
+        one JSON object per line appended to the file
+        Args:
+            path: The file the spans are written to
+    """
+    global _tracer, _provider
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from ragctl import __app_name__, __version__
+    file = open(path, "a", encoding="utf-8")
+    _provider = TracerProvider(resource=Resource.create({"service.name": __app_name__,
+                                                        "service.version": __version__}))
+    _provider.add_span_processor(BatchSpanProcessor(
+        ConsoleSpanExporter(out=file, formatter=lambda span: span.to_json(indent=None) + "\n")))
+    _tracer = _provider.get_tracer(__app_name__, __version__)
+
+def stop() -> Optional[Profile]:
+    """
+        Stop measuring spans and flush the exported ones
+        Return:
+            The profile, if one was started
+    """
+    global _profile, _tracer, _provider
+    profile, provider = _profile, _provider
+    _profile = _tracer = _provider = None
+    if provider is not None:
+        # Flushes the pending spans and closes the file
+        provider.shutdown()
+    return profile
+
+def is_active() -> bool:
+    return _profile is not None or _tracer is not None
+
+def _attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    # OpenTelemetry attributes are strings, numbers and booleans
+    return {key: value if isinstance(value, (str, bool, int, float)) else str(value)
+            for key, value in attributes.items() if value is not None}
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[None]:
+    """
+        Time a stage. An exception raised in the stage is recorded on the
+        span and raised again.
+        Args:
+            name: Stage name, such as document.embed
+            attributes: Details of the span, such as the document id
+    """
+    if not is_active():
+        yield
+        return
+    profile, tracer = _profile, _tracer
+    start = time.perf_counter()
+    failed = False
+    try:
+        if tracer is not None:
+            with tracer.start_as_current_span(name, attributes=_attributes(attributes)):
+                yield
+        else:
+            yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        if profile is not None:
+            profile.add(name, time.perf_counter() - start, failed)
+
+def record(name: str, seconds: float, error: Optional[BaseException] = None, **attributes: Any) -> None:
+    """Record a stage timed by the caller as a span ending now, failed if error is set"""
+    if _profile is not None:
+        _profile.add(name, seconds, error is not None)
+    if _tracer is not None:
+        end = time.time_ns()
+        recorded = _tracer.start_span(name, attributes=_attributes(attributes), start_time=end - int(seconds * 1e9))
+        if error is not None:
+            from opentelemetry.trace import Status, StatusCode
+            recorded.record_exception(error)
+            recorded.set_status(Status(StatusCode.ERROR, f"{type(error).__name__}: {error}"))
+        recorded.end(end_time=end)
+
+def propagate(function: Callable) -> Callable:
+    """
+        Run a function handed to another thread in the current context, so
+        its spans are children of the current span
+    """
+    if _tracer is None:
+        return function
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(function, *args, **kwargs)
+
+class Timer:
+    """
+        Time a stage that runs in several pieces, such as a lazy loader
+        pulled by the next stage, and record the total as one span
+    """
+    def __init__(self, name: str, **attributes: Any) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.seconds = 0.0
+        # Exception raised in one of the pieces
+        self.error: Optional[BaseException] = None
+
+    def __enter__(self) -> "Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc_value: Optional[BaseException], traceback: Any) -> None:
+        self.seconds += time.perf_counter() - self._start
+        if exc_value is not None:
+            self.error = exc_value
+
+    def iterate(self, iterable: Iterable) -> Iterator:
+        """Yield the items, timing only the time spent producing them"""
+        iterator = iter(iterable)
+        while True:
+            with self:
+                item = next(iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+    def record(self) -> None:
+        record(self.name, self.seconds, self.error, **self.attributes)
+
+_DONE = object()
@@ -0,0 +1,185 @@
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import chromadb
+import hashlib
+import shutil
+import threading
+
+# Folder of the shared store inside the vector database folder
+STORE_DIR = "chroma"
+
+# Collection holding the chunks of the documents embedded with the default model
+COLLECTION_NAME = "documents"
+
+# Embedding backend and model of the chunks in COLLECTION_NAME
+DEFAULT_EMBEDDING = ("bedrock", "amazon.titan-embed-text-v1")
+
+# Collection name of the legacy per-document stores written by langchain
+LEGACY_COLLECTION_NAME = "langchain"
+
+# Chunks copied from a legacy store at a time
+IMPORT_BATCH_SIZE = 1000
+
+# Clients and their open collections by store path, opened once per process.
+# Chroma does not support opening them from several threads at once.
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store_path(vector_db_path: Path) -> Path:
+    return Path(vector_db_path) / STORE_DIR
+
+def collection_name(backend: Optional[str], model_id: Optional[str]) -> str:
+    """
+        Vectors of different models cannot be compared, so each embedding
+        model has its own collection.
+
+        Args:
+            backend: Embedding backend of the chunks, None for documents embedded before it was recorded
+            model_id: Embedding model of the chunks
+        Return:
+            Name of the collection holding the chunks
+    """
+    if backend is None or (backend, model_id) == DEFAULT_EMBEDDING:
+        return COLLECTION_NAME
+    digest = hashlib.sha1(f"{backend}\0{model_id}".encode()).hexdigest()[:12]
+    return f"{COLLECTION_NAME}-{backend}-{digest}"
+
+def _open_store(vector_db_path: Path, name: str) -> tuple:
+    store_path = str(get_store_path(vector_db_path).resolve())
+    store = _stores.get(store_path)
+    if store is None or name not in store[1]:
+        with _stores_lock:
+            store = _stores.get(store_path)
+            if store is None:
+                store = _stores[store_path] = (chromadb.PersistentClient(path=store_path), {})
+            if name not in store[1]:
+                collection = store[0].get_or_create_collection(name)
+                # Load the segments before the collection is used from several threads
+                collection.count()
+                store[1][name] = collection
+    return store
+
+def get_client(vector_db_path: Path):
+    """Return the client of the shared store in the vector database folder"""
+    return _open_store(vector_db_path, COLLECTION_NAME)[0]
+
+def get_collection(vector_db_path: Path, name: str = COLLECTION_NAME):
+    """Return a collection holding the chunks of every document embedded with one model"""
+    return _open_store(vector_db_path, name)[1][name]
+
+def reopen_store(vector_db_path: Path) -> None:
+    """
+        Drop the open client of the shared store, so the next use reads the
+        chunks other processes wrote since it was opened
+    """
+    with _stores_lock:
+        if _stores.pop(str(get_store_path(vector_db_path).resolve()), None) is not None:
+            # Chroma keeps one instance per store path for the whole process
+            chromadb.api.client.SharedSystemClient.clear_system_cache()
+
+def clear_store(vector_db_path: Path) -> None:
+    """Delete the chunks of every document from the shared store"""
+    client = get_client(vector_db_path)
+    with _stores_lock:
+        for collection in client.list_collections():
+            client.delete_collection(collection.name)
+        _stores.pop(str(get_store_path(vector_db_path).resolve()), None)
+
+def document_filter(document_ids: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+    """
+        Args:
+            document_ids: Documents to search, or None for every document
+        Return:
+            Chroma metadata filter restricting a search to the documents
+    """
+    if document_ids is None:
+        return None
+    if len(document_ids) == 1:
+        return {"document_id": document_ids[0]}
+    return {"document_id": {"$in": list(document_ids)}}
+
+def delete_document(vector_db_path: Path, document_id: str) -> None:
+    """Delete the chunks of a document from the shared store and its legacy store, if any"""
+    for collection in get_client(vector_db_path).list_collections():
+        get_collection(vector_db_path, collection.name).delete(where={"document_id": document_id})
+    shutil.rmtree(Path(vector_db_path) / document_id, ignore_errors=True)
+
+def import_legacy_store(vector_db_path: Path, document_id: str) -> bool:
+    """
+        Move the chunks of a document embedded into its own store, as older
+        versions did, into the shared store. The legacy store is removed once
+        its chunks are copied.
+
+        Args:
+            vector_db_path: The vector database folder
+            document_id: The document id
+        Return:
+            True if a legacy store was imported
+    """
+    legacy_path = Path(vector_db_path) / document_id
+    if not (legacy_path / "chroma.sqlite3").exists():
+        return False
+    legacy_client = chromadb.PersistentClient(path=str(legacy_path))
+    try:
+        legacy = legacy_client.get_collection(LEGACY_COLLECTION_NAME)
+    except ValueError:
+        legacy = None
+    if legacy is not None:
+        collection = get_collection(vector_db_path)
+        offset = 0
+        while True:
+            chunks = legacy.get(include=["embeddings", "documents", "metadatas"],
+                                limit=IMPORT_BATCH_SIZE, offset=offset)
+            if not chunks["ids"]:
+                break
+            # Stores written by resumable processing already number their chunks
+            metadatas = [{"chunk_index": offset + index, **(metadata or {}), "document_id": document_id}
+                         for index, metadata in enumerate(chunks["metadatas"])]
+            collection.upsert(
+                ids=[f"{document_id}-{metadata['chunk_index']}" for metadata in metadatas],
+                embeddings=chunks["embeddings"],
+                documents=chunks["documents"],
+                metadatas=metadatas)
+            offset += len(chunks["ids"])
+    shutil.rmtree(legacy_path)
+    return True
+
+class ChromaDocumentWriter:
+    """
+        Store the chunks of one document in the shared collection of its
+        embedding model
+    """
+    def __init__(self, vector_db_path: Path, document_id: str, name: str = COLLECTION_NAME) -> None:
+        self.vector_db_path = vector_db_path
+        self.document_id = document_id
+        self.name = name
+
+    def reset(self, checkpoint: int) -> None:
+        """Drop the chunks stored at and after the checkpoint by an interrupted run"""
+        # Chunks stored by an interrupted run of an older version count towards the checkpoint
+        import_legacy_store(self.vector_db_path, self.document_id)
+        self.collection = get_collection(self.vector_db_path, self.name)
+        if checkpoint == 0:
+            # Start over: drop the vectors left by an interrupted run
+            self.collection.delete(where={"document_id": self.document_id})
+        else:
+            # Reconcile the vectors written past the checkpoint before the last run stopped
+            self.collection.delete(where={"$and": [{"document_id": self.document_id},
+                                                   {"chunk_index": {"$gte": checkpoint}}]})
+
+    def upsert(self, chunk_indexes: List[int], vectors: List[List[float]], texts: List[str],
+               metadatas: List[Dict[str, Any]]) -> None:
+        # Chunk ids are stable, so a chunk embedded again replaces its vector
+        self.collection.upsert(ids=[f"{self.document_id}-{chunk_index}" for chunk_index in chunk_indexes],
+                               embeddings=vectors, documents=texts, metadatas=metadatas)
+
+    def stored_chunks(self, below: int) -> Iterator[Tuple[int, str]]:
+        """Yield the (chunk index, text) pairs stored before the checkpoint"""
+        stored = self.collection.get(where={"$and": [{"document_id": self.document_id},
+                                                     {"chunk_index": {"$lt": below}}]},
+                                     include=["documents", "metadatas"])
+        for text, metadata in zip(stored["documents"], stored["metadatas"]):
+            yield metadata["chunk_index"], text
+
+    def finish(self) -> None:
+        pass
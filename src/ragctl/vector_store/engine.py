@@ -0,0 +1,20 @@
+from ragctl import config
+
+# Vector store engines
+ENGINE_CHROMA = "chroma"
+ENGINE_FLAT = "flat"
+ENGINES = (ENGINE_CHROMA, ENGINE_FLAT)
+
+# Engine of the documents embedded before the engine was recorded in the catalog
+LEGACY_ENGINE = ENGINE_CHROMA
+
+# Vector quantizations of the flat engine
+QUANTIZATIONS = ("none", "float16", "int8")
+
+def get_engine_name() -> str:
+    """Return the vector store engine from the [VectorStore] configuration section"""
+    return config.get_option("VectorStore", "engine", ENGINE_CHROMA)
+
+def get_quantization() -> str:
+    """Return the flat engine quantization from the [VectorStore] configuration section"""
+    return config.get_option("VectorStore", "quantization", "none")
@@ -0,0 +1,259 @@
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from ragctl.query_document.cache import LRUCache
+import heapq
+import json
+import numpy as np
+import os
+import shutil
+import uuid
+
+# Folder of the per-document stores inside the vector database folder
+STORE_DIR = "flat"
+
+STORE_VERSION = 1
+
+# Rows scored at a time, bounding the memory of a search
+SEARCH_BLOCK_ROWS = 1024
+
+# Stored vector type of each quantization
+STORED_DTYPES = {"none": np.float32, "float16": np.float16, "int8": np.int8}
+
+# Stores kept open in memory, keyed by path and modification time
+_opened = LRUCache(256)
+
+class FlatHit(NamedTuple):
+    document_id: str
+    chunk_index: int
+    score: float
+    text: str
+    metadata: Dict[str, Any]
+
+def get_store_path(vector_db_path: Path, document_id: str) -> Path:
+    return Path(vector_db_path) / STORE_DIR / document_id
+
+def _replace(path: Path, write: Callable[[BinaryIO], Any]) -> None:
+    # Write through a temporary file so readers never see a partial file
+    temporary_path = path.with_name(path.name + ".tmp")
+    with open(temporary_path, "wb") as file:
+        write(file)
+    os.replace(temporary_path, path)
+
+def quantize(vectors: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+        Args:
+            vectors: float32 vectors, one per row
+            quantization: none, float16 or int8
+        Return:
+            The stored vectors, and the per-vector scales of int8 vectors
+    """
+    if quantization == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return vectors.astype(STORED_DTYPES[quantization]), None
+
+class FlatDocumentWriter:
+    """
+        Store the chunks of one document in its own folder. Vectors are
+        written as float32 parts as windows are embedded, and merged into one
+        quantized .npy file, searched memory-mapped, once every chunk is stored.
+    """
+    def __init__(self, vector_db_path: Path, document_id: str, quantization: str = "none") -> None:
+        if quantization not in STORED_DTYPES:
+            raise ValueError(f"unknown quantization {quantization}, use one of {', '.join(STORED_DTYPES)}")
+        self.document_id = document_id
+        self.quantization = quantization
+        self.path = get_store_path(vector_db_path, document_id)
+        self.parts_path = self.path / "parts"
+
+    def reset(self, checkpoint: int) -> None:
+        """Drop the chunks stored at and after the checkpoint by an interrupted run"""
+        if checkpoint == 0:
+            shutil.rmtree(self.path, ignore_errors=True)
+        else:
+            # Each part holds chunks of one window, all at or after the window start
+            for part in self._parts():
+                if int(part.stem.split("-")[0]) >= checkpoint:
+                    part.unlink()
+                    part.with_suffix(".json").unlink(missing_ok=True)
+        self.parts_path.mkdir(parents=True, exist_ok=True)
+
+    def upsert(self, chunk_indexes: List[int], vectors: List[List[float]], texts: List[str],
+               metadatas: List[Dict[str, Any]]) -> None:
+        part = self.parts_path / f"{min(chunk_indexes)}-{uuid.uuid4().hex}.npz"
+        # The texts are written first; a part counts once its vectors exist
+        with open(part.with_suffix(".json"), "w", encoding="utf-8") as file:
+            json.dump([{"text": text, "metadata": metadata} for text, metadata in zip(texts, metadatas)], file)
+        _replace(part, lambda file: np.savez(file, chunk_indexes=np.array(chunk_indexes, dtype=np.int64),
+                                             vectors=np.array(vectors, dtype=np.float32)))
+
+    def stored_chunks(self, below: int) -> Iterator[Tuple[int, str]]:
+        """Yield the (chunk index, text) pairs stored before the checkpoint"""
+        for part in self._parts():
+            with np.load(part) as data:
+                chunk_indexes = data["chunk_indexes"].tolist()
+            with open(part.with_suffix(".json"), encoding="utf-8") as file:
+                chunks = json.load(file)
+            for chunk_index, chunk in zip(chunk_indexes, chunks):
+                if chunk_index < below:
+                    yield chunk_index, chunk["text"]
+
+    def finish(self) -> None:
+        """Merge the parts into the searchable store and remove them"""
+        parts = []
+        for part in self._parts():
+            with np.load(part) as data:
+                parts.append((part, data["chunk_indexes"]))
+        count = sum(len(chunk_indexes) for _, chunk_indexes in parts)
+        dimensions = 0
+        if parts:
+            with np.load(parts[0][0]) as data:
+                dimensions = data["vectors"].shape[1]
+        # Rows are ordered by chunk index
+        order = np.argsort(np.concatenate([chunk_indexes for _, chunk_indexes in parts])) if parts else []
+        rows = np.empty(count, dtype=np.int64)
+        rows[order] = np.arange(count)
+        vectors = np.lib.format.open_memmap(self.path / "vectors.npy.tmp", mode="w+",
+                                            dtype=STORED_DTYPES[self.quantization],
+                                            shape=(count, dimensions))
+        scales = np.ones(count, dtype=np.float32)
+        chunk_indexes = np.empty(count, dtype=np.int64)
+        chunks: List[Optional[Dict[str, Any]]] = [None] * count
+        start = 0
+        for part, part_indexes in parts:
+            part_rows = rows[start:start + len(part_indexes)]
+            with np.load(part) as data:
+                stored, part_scales = quantize(data["vectors"], self.quantization)
+            vectors[part_rows] = stored
+            if part_scales is not None:
+                scales[part_rows] = part_scales
+            chunk_indexes[part_rows] = part_indexes
+            with open(part.with_suffix(".json"), encoding="utf-8") as file:
+                for row, chunk in zip(part_rows, json.load(file)):
+                    chunks[row] = chunk
+            start += len(part_indexes)
+        vectors.flush()
+        del vectors
+        os.replace(self.path / "vectors.npy.tmp", self.path / "vectors.npy")
+        _replace(self.path / "scales.npy", lambda file: np.save(file, scales))
+        _replace(self.path / "chunk_indexes.npy", lambda file: np.save(file, chunk_indexes))
+        # Chunk texts as JSON lines, with the offset of each line for random access
+        offsets = np.zeros(count + 1, dtype=np.int64)
+
+        def write_chunks(file: BinaryIO) -> None:
+            for row, chunk in enumerate(chunks):
+                file.write(json.dumps(chunk).encode("utf-8") + b"\n")
+                offsets[row + 1] = file.tell()
+        _replace(self.path / "chunks.jsonl", write_chunks)
+        _replace(self.path / "offsets.npy", lambda file: np.save(file, offsets))
+        # The metadata file is written last and marks the store complete
+        meta = {"version": STORE_VERSION, "document_id": self.document_id, "count": count,
+                "dimensions": int(dimensions), "quantization": self.quantization}
+        _replace(self.path / "meta.json", lambda file: file.write(json.dumps(meta).encode("utf-8")))
+        shutil.rmtree(self.parts_path, ignore_errors=True)
+
+    def _parts(self) -> List[Path]:
+        if not self.parts_path.exists():
+            return []
+        return sorted(self.parts_path.glob("*.npz"))
+
+class FlatStore:
+    """
+        A document's vectors, memory-mapped. Opening one reads a few small
+        files and maps the vectors; pages are loaded as searches touch them.
+    """
+    def __init__(self, path: Path, meta: Dict[str, Any]) -> None:
+        self.path = path
+        self.document_id = meta["document_id"]
+        self.quantization = meta["quantization"]
+        self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        self.scales = np.load(path / "scales.npy", mmap_mode="r")
+        self.chunk_indexes = np.load(path / "chunk_indexes.npy", mmap_mode="r")
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Return the dot product of the query with every stored vector"""
+        scores = np.empty(len(self.vectors), dtype=np.float32)
+        for start in range(0, len(self.vectors), SEARCH_BLOCK_ROWS):
+            block = self.vectors[start:start + SEARCH_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+        if self.quantization == "int8":
+            scores *= self.scales
+        return scores
+
+    def top_k(self, query: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        """Return the (score, row) pairs of the k best rows, best first"""
+        scores = self.scores(query)
+        if len(scores) > k:
+            rows = np.argpartition(-scores, k - 1)[:k]
+        else:
+            rows = np.arange(len(scores))
+        rows = rows[np.argsort(-scores[rows])]
+        return [(float(scores[row]), int(row)) for row in rows]
+
+    def chunk(self, row: int) -> Dict[str, Any]:
+        with open(self.path / "chunks.jsonl", "rb") as file:
+            file.seek(int(self.offsets[row]))
+            return json.loads(file.read(int(self.offsets[row + 1] - self.offsets[row])))
+
+    def row_of(self, chunk_index: int) -> Optional[int]:
+        row = int(np.searchsorted(self.chunk_indexes, chunk_index))
+        if row < len(self.chunk_indexes) and self.chunk_indexes[row] == chunk_index:
+            return row
+        return None
+
+def open_store(vector_db_path: Path, document_id: str) -> Optional[FlatStore]:
+    """
+        Return:
+            The complete store of the document, or None if there is none
+    """
+    path = get_store_path(vector_db_path, document_id)
+    try:
+        key = (str(path), (path / "meta.json").stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    store = _opened.get(key)
+    if store is None:
+        store = FlatStore(path, json.loads((path / "meta.json").read_text()))
+        _opened.put(key, store)
+    return store
+
+def search(vector_db_path: Path, document_ids: Iterable[str], vector: List[float], k: int) -> List[FlatHit]:
+    """
+        Exact dot-product search over the stores of several documents
+        embedded with the same model.
+
+        Return:
+            The k best chunks, best first
+    """
+    query = np.asarray(vector, dtype=np.float32)
+    candidates = []
+    for document_id in document_ids:
+        store = open_store(vector_db_path, document_id)
+        if store is not None:
+            candidates.extend((score, row, store) for score, row in store.top_k(query, k))
+    best = heapq.nlargest(k, candidates, key=lambda candidate: candidate[0])
+    hits = []
+    for score, row, store in best:
+        chunk = store.chunk(row)
+        hits.append(FlatHit(store.document_id, int(store.chunk_indexes[row]), score,
+                            chunk["text"], chunk["metadata"]))
+    return hits
+
+def get_chunks(vector_db_path: Path, document_id: str, chunk_indexes: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """
+        Return:
+            The text and metadata of the stored chunks, by chunk index
+    """
+    store = open_store(vector_db_path, document_id)
+    chunks = {}
+    if store is not None:
+        for chunk_index in chunk_indexes:
+            row = store.row_of(chunk_index)
+            if row is not None:
+                chunks[chunk_index] = store.chunk(row)
+    return chunks
+
+def delete_document(vector_db_path: Path, document_id: str) -> None:
+    shutil.rmtree(get_store_path(vector_db_path, document_id), ignore_errors=True)
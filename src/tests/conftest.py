@@ -0,0 +1,123 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import json
+import sys
+import threading
+import time
+import pytest
+
+# Import ragctl from the source tree when it is not installed
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ragctl import config
+
+class BedrockStandIn(ThreadingHTTPServer):
+    """
+        Local HTTP stand-in for the Bedrock runtime InvokeModel API. Titan
+        requests embed one text, Cohere requests a list of texts. The first
+        `throttle` requests are answered with a ThrottlingException.
+    """
+    def __init__(self, dimensions: int = 8, delay: float = 0.01) -> None:
+        super().__init__(("127.0.0.1", 0), _BedrockHandler)
+        self.dimensions = dimensions
+        self.delay = delay
+        self.throttle = 0
+        self.error = None
+        self.requests = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def vector(self, text: str) -> list:
+        return [float(len(text))] + [float(ord(character)) for character in text[:self.dimensions - 1].ljust(
+            self.dimensions - 1)]
+
+class _BedrockHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        server: BedrockStandIn = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            throttled = server.throttled < server.throttle
+            if throttled:
+                server.throttled += 1
+        try:
+            time.sleep(server.delay)
+            if throttled:
+                self._send(429, {"message": "Too many requests"}, "ThrottlingException")
+            elif server.error:
+                self._send(400, {"message": "invalid input"}, server.error)
+            elif "texts" in body:
+                self._send(200, {"embeddings": [server.vector(text) for text in body["texts"]]})
+            else:
+                self._send(200, {"embedding": server.vector(body["inputText"]), "inputTextTokenCount": 1})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status: int, payload: dict, error_type: str = None) -> None:
+        out = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        if error_type:
+            self.send_header("x-amzn-ErrorType", f"{error_type}:")
+        self.end_headers()
+        self.wfile.write(out)
+
+@pytest.fixture
+def ragctl_config(tmp_path, monkeypatch):
+    """
+        Point the configuration file and the embedding cache at a temporary
+        folder. Returns a function setting options in the configuration file.
+    """
+    monkeypatch.setattr(config, "CONFIG_PATH", tmp_path)
+    monkeypatch.setattr(config, "CONFIG_FILE", tmp_path / "config.ini")
+    monkeypatch.setattr(config, "EMBEDDING_CACHE_FILE", tmp_path / "embedding_cache.db")
+
+    def set_options(section: str, **options) -> None:
+        import configparser
+        parser = configparser.ConfigParser()
+        parser.read(config.CONFIG_FILE)
+        if not parser.has_section(section):
+            parser.add_section(section)
+        for option, value in options.items():
+            parser[section][option] = str(value)
+        with open(config.CONFIG_FILE, "w") as config_file:
+            parser.write(config_file)
+    return set_options
+
+@pytest.fixture
+def bedrock(ragctl_config, monkeypatch):
+    """Run a Bedrock stand-in and send the process-wide Bedrock client to it"""
+    from ragctl.embedding import bedrock as bedrock_module
+    server = BedrockStandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+    ragctl_config("AWS", endpoint_url=server.url, region="us-east-1")
+    monkeypatch.setattr(bedrock_module, "_bedrock_client", None)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _split_words(data_chunks, executor=None, batch_size=None):
+    for data_chunk in data_chunks:
+        yield {"data_chunk": data_chunk, "filtered_text": " ".join(data_chunk.split())}
+
+@pytest.fixture
+def split_words(monkeypatch):
+    """Split chunks on whitespace in place of the stop word filter, which needs the NLTK data"""
+    from ragctl.data_chunk_process.chunk_process import DataChunkProcess
+    monkeypatch.setattr(DataChunkProcess, "process_batch", staticmethod(_split_words))
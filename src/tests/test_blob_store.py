@@ -0,0 +1,43 @@
+import pytest
+from ragctl import SUCCESS
+from ragctl.blob_store import BlobStore
+from ragctl.database import DatabaseHandler
+from ragctl.ragctl import RagDocOperations
+
+@pytest.mark.parametrize("options", [{"compression": "gzip"}, {"link": "symlink"}])
+def test_rejects_unknown_settings(tmp_path, ragctl_config, options):
+    ragctl_config("Storage", **options)
+    with pytest.raises(ValueError):
+        BlobStore(tmp_path / "documents", DatabaseHandler(tmp_path / "db.json"))
+
+@pytest.fixture
+def operations(tmp_path, ragctl_config, split_words):
+    ragctl_config("Embedding", backend="stub", cache_max_mb=0)
+    ragctl_config("VectorStore", engine="flat")
+    ragctl_config("Storage", link="copy", compression="zstd")
+    path = tmp_path / "document.txt"
+    path.write_text("\n\n".join(f"Paragraph {index} talks about topic {index}." for index in range(20)))
+    operations = RagDocOperations(tmp_path / "db.json", tmp_path / "documents", tmp_path / "vector_db")
+    added, error = operations.add_docs([str(path)])
+    assert error == SUCCESS
+    return operations, operations._db_handler.read().data[0]["id"]
+
+def _failing_compress(self, blob_hash):
+    raise OSError("no space left on device")
+
+def test_compression_failure_is_a_warning(operations, monkeypatch):
+    operations, document_id = operations
+    monkeypatch.setattr(BlobStore, "compress", _failing_compress)
+    processed, error = operations.process_document(document_id)
+    assert error == SUCCESS
+    assert processed["warning"] == "Compress document failed: OSError: no space left on device"
+    assert operations._db_handler.get(document_id).data[0]["state"] == "embedded"
+
+def test_compression_failure_in_a_batch_is_a_warning(operations, monkeypatch):
+    operations, document_id = operations
+    monkeypatch.setattr(BlobStore, "compress", _failing_compress)
+    processed, error = operations.process_documents([document_id])
+    assert error == SUCCESS
+    assert processed["summary"]["failed"] == 0
+    assert processed["results"][0]["warning"] == "Compress document failed: OSError: no space left on device"
+    assert operations._db_handler.get(document_id).data[0]["state"] == "embedded"
@@ -0,0 +1,66 @@
+import pytest
+from ragctl.chunking.splitters import ChunkingSpec
+from ragctl.document_process.process_doc import ProcessDocument
+from ragctl.embedding.registry import EmbeddingBackend
+from ragctl.embedding.stub import StubEmbedding
+from ragctl.vector_store import flat
+
+class FailingEmbedding(StubEmbedding):
+    """Stub embedding failing once it embedded `fail_after` batches, recording the texts it embedded"""
+    def __init__(self, fail_after: int = None) -> None:
+        super().__init__(dimensions=16)
+        self.fail_after = fail_after
+        self.texts = []
+
+    def embed_documents(self, texts):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise RuntimeError("embedding service unavailable")
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+def _backend(embeddings: StubEmbedding) -> EmbeddingBackend:
+    return EmbeddingBackend("stub", "stub", embeddings, "stub:stub", lambda error: False)
+
+@pytest.fixture
+def document(tmp_path, ragctl_config, split_words):
+    # Small windows, no near-duplicate dropping, and a cache that keeps nothing
+    ragctl_config("Processing", window_size=4, dedup_threshold=0)
+    ragctl_config("Embedding", cache_max_mb=0)
+    path = tmp_path / "document.txt"
+    path.write_text("\n\n".join(f"Paragraph {index} talks about topic {index} in its own words."
+                                for index in range(30)))
+    return path
+
+def _process(document, tmp_path, embeddings, checkpoint=0, checkpoints=None) -> ProcessDocument:
+    process_doc = ProcessDocument(str(document), tmp_path / "vdb", "0" * 60 + "abcd", "TXT",
+                                  checkpoint=checkpoint, on_checkpoint=checkpoints.append if checkpoints is not None else None,
+                                  embedding=_backend(embeddings), vector_store="flat",
+                                  chunking=ChunkingSpec("sentence", 100, 0))
+    process_doc.process()
+    return process_doc
+
+def test_resumes_from_the_last_checkpoint(document, tmp_path):
+    checkpoints = []
+    failed = _process(document, tmp_path, FailingEmbedding(fail_after=3), checkpoints=checkpoints)
+    assert failed.error == "RuntimeError: embedding service unavailable"
+    assert failed.checkpoint > 0 and failed.checkpoint % 4 == 0
+    assert checkpoints[-1] == failed.checkpoint
+
+    embeddings = FailingEmbedding()
+    resumed = _process(document, tmp_path, embeddings, checkpoint=failed.checkpoint)
+    assert resumed.error is None
+    store = flat.open_store(tmp_path / "vdb", "abcd")
+    assert store.chunk_indexes.tolist() == list(range(resumed.checkpoint))
+    # Only the chunks after the checkpoint are embedded again
+    assert len(embeddings.texts) == resumed.checkpoint - failed.checkpoint
+
+def _stored_texts(vector_db_path) -> list:
+    store = flat.open_store(vector_db_path, "abcd")
+    return [store.chunk(row)["text"] for row in range(len(store.chunk_indexes))]
+
+def test_resumed_store_matches_a_full_run(document, tmp_path):
+    failed = _process(document, tmp_path, FailingEmbedding(fail_after=2))
+    resumed = _process(document, tmp_path, FailingEmbedding(), checkpoint=failed.checkpoint)
+    full = _process(document, tmp_path / "full", FailingEmbedding())
+    assert full.checkpoint == resumed.checkpoint
+    assert _stored_texts(tmp_path / "full" / "vdb") == _stored_texts(tmp_path / "vdb")
@@ -0,0 +1,57 @@
+import pytest
+from ragctl.data_chunk_process.dedup import NearDuplicateIndex, get_dedup_index
+
+def _page(number: int, topic: str) -> str:
+    return (f"Quarterly report of the {topic} team covering revenue costs hiring and the plans "
+            f"agreed for the next quarter by every regional office page {number}")
+
+def test_exact_duplicates():
+    index = NearDuplicateIndex()
+    assert index.add(0, "the same chunk text") is None
+    assert index.add(1, "the same chunk text") == 0
+
+def test_near_duplicates_differing_by_a_page_number():
+    index = NearDuplicateIndex()
+    assert index.add(0, _page(1, "sales")) is None
+    assert index.add(1, _page(2, "sales")) == 0
+    assert index.add(2, _page(3, "sales")) == 0
+
+def test_distinct_chunks_are_kept():
+    index = NearDuplicateIndex()
+    texts = [f"chunk {number} describes {topic} in detail with its own examples"
+             for number, topic in enumerate(["storage", "networking", "billing", "security", "support"])]
+    texts.append(_page(1, "sales"))
+    assert [index.add(key, text) for key, text in enumerate(texts)] == [None] * len(texts)
+
+def test_empty_chunks_are_compared_by_text():
+    index = NearDuplicateIndex()
+    assert index.add(0, "") is None
+    assert index.add(1, "") == 0
+
+def test_configured_index(ragctl_config):
+    assert get_dedup_index().threshold == 0.75
+    ragctl_config("Processing", dedup_threshold=0)
+    assert get_dedup_index() is None
+    ragctl_config("Processing", dedup_threshold=0.9, dedup_permutations=32)
+    index = get_dedup_index()
+    assert (index.threshold, index.bands * index.rows) == (0.9, 32)
+
+@pytest.mark.parametrize("options", [{"dedup_threshold": 1.5}, {"dedup_permutations": 0}])
+def test_rejects_bad_settings(ragctl_config, options):
+    ragctl_config("Processing", **options)
+    with pytest.raises(ValueError):
+        get_dedup_index()
+
+@pytest.mark.parametrize("threshold", [0.01, 0.5, 0.75, 1.0])
+def test_every_threshold_has_an_lsh_layout(threshold):
+    index = NearDuplicateIndex(threshold)
+    assert index.bands * index.rows == 64
+    assert index.add(0, "some chunk text") is None
+
+def test_estimates_the_jaccard_similarity():
+    words = [f"word{number}" for number in range(200)]
+    index = NearDuplicateIndex(permutations=256)
+    first = index._signature(" ".join(words))
+    # 149 of the 199 bigrams of each are shared, 249 bigrams in all
+    second = index._signature(" ".join(words[:150] + [f"other{number}" for number in range(50)]))
+    assert abs((first == second).mean() - 149 / 249) < 0.1
@@ -0,0 +1,73 @@
+import numpy as np
+import sqlite3
+from ragctl.embedding import cache
+from ragctl.embedding.cache import CachedEmbeddings, EmbeddingCache, get_embedding_cache
+from ragctl.embedding.stub import StubEmbedding
+
+# Size of a cached 4-dimension float32 vector
+VECTOR_SIZE = 16
+
+def _vectors(count: int, value: float = 1.0) -> list:
+    return [[value + index] * 4 for index in range(count)]
+
+def test_hit_and_miss(tmp_path):
+    embedding_cache = EmbeddingCache(tmp_path / "cache.db")
+    embedding_cache.put_many("model", ["a", "b"], _vectors(2))
+    assert embedding_cache.get_many("model", ["a", "c", "b"]) == [[1.0] * 4, None, [2.0] * 4]
+    stats = embedding_cache.stats()
+    assert (stats.entries, stats.size, stats.hits, stats.misses) == (2, 2 * VECTOR_SIZE, 2, 1)
+
+def test_keys_are_per_model_and_normalized_text(tmp_path):
+    embedding_cache = EmbeddingCache(tmp_path / "cache.db")
+    embedding_cache.put_many("model", ["some  text\n"], _vectors(1))
+    assert embedding_cache.get_many("model", ["some text"]) == [[1.0] * 4]
+    assert embedding_cache.get_many("other", ["some text"]) == [None]
+
+def test_evicts_least_recently_used(tmp_path):
+    embedding_cache = EmbeddingCache(tmp_path / "cache.db", max_size=4 * VECTOR_SIZE)
+    embedding_cache.put_many("model", ["a", "b", "c", "d"], _vectors(4))
+    # Reading a makes b the least recently used
+    embedding_cache.get_many("model", ["a"])
+    embedding_cache.put_many("model", ["e"], _vectors(1))
+    found = embedding_cache.get_many("model", ["a", "b", "c", "d", "e"])
+    assert [vector is not None for vector in found] == [True, False, True, True, True]
+    assert embedding_cache.stats().size == 4 * VECTOR_SIZE
+
+def test_size_survives_reopening(tmp_path):
+    EmbeddingCache(tmp_path / "cache.db").put_many("model", ["a", "b", "c"], _vectors(3))
+    reopened = EmbeddingCache(tmp_path / "cache.db", max_size=2 * VECTOR_SIZE)
+    assert reopened.stats().size == 3 * VECTOR_SIZE
+    reopened.put_many("model", ["d"], _vectors(1))
+    assert reopened.stats().entries == 2
+
+def test_clear(tmp_path):
+    embedding_cache = EmbeddingCache(tmp_path / "cache.db")
+    embedding_cache.put_many("model", ["a"], _vectors(1))
+    embedding_cache.get_many("model", ["a"])
+    embedding_cache.clear()
+    assert embedding_cache.stats() == (0, 0, embedding_cache.stats().max_size, 0, 0)
+
+def test_one_cache_per_process(ragctl_config, monkeypatch):
+    monkeypatch.setattr(cache, "_caches", {})
+    assert get_embedding_cache() is get_embedding_cache()
+
+def test_cached_embeddings_only_embed_misses(tmp_path):
+    stub = StubEmbedding(dimensions=4)
+    embeddings = CachedEmbeddings(stub, "stub", EmbeddingCache(tmp_path / "cache.db"))
+    first = embeddings.embed_documents(["a b", "c d"])
+    # Vectors are cached as float32
+    assert np.allclose(embeddings.embed_documents(["c d", "a b"]), [first[1], first[0]])
+    assert stub.calls == 1
+
+def test_embeds_uncached_when_the_cache_fails(tmp_path):
+    class BrokenCache:
+        def get_many(self, model_id, texts):
+            raise sqlite3.OperationalError("database is locked")
+
+        def put_many(self, model_id, texts, vectors):
+            raise sqlite3.OperationalError("database is locked")
+
+    stub = StubEmbedding(dimensions=4)
+    embeddings = CachedEmbeddings(stub, "stub", BrokenCache())
+    assert embeddings.embed_documents(["a b"]) == stub.embed_documents(["a b"])
+    assert embeddings.embed_query("a b") == stub.embed_query("a b")
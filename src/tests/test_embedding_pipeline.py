@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+import pytest
+from ragctl.embedding import pipeline
+from ragctl.embedding.bedrock import BedrockBatchEmbeddings, get_bedrock_client, is_retryable_error
+from ragctl.embedding.pipeline import EmbeddingPipeline
+
+def _pipeline(model_id: str = "amazon.titan-embed-text-v1", **options) -> EmbeddingPipeline:
+    options.setdefault("base_delay", 0)
+    return EmbeddingPipeline(BedrockBatchEmbeddings(get_bedrock_client(), model_id), model_id,
+                             is_retryable=is_retryable_error, **options)
+
+def _embed(embedding_pipeline: EmbeddingPipeline, texts: list) -> list:
+    vectors = [None] * len(texts)
+    for batch in embedding_pipeline.embed(texts):
+        for index, vector in zip(batch.indexes, batch.vectors):
+            vectors[index] = vector
+    return vectors
+
+def test_embeds_every_text_in_batches(bedrock):
+    texts = [f"chunk {index}" for index in range(20)]
+    vectors = _embed(_pipeline(batch_size=4, max_concurrency=3), texts)
+    assert vectors == [bedrock.vector(text) for text in texts]
+    # Titan takes one text per request
+    assert bedrock.requests == 20
+    assert bedrock.max_in_flight <= 3
+
+def test_cohere_takes_a_batch_per_request(bedrock):
+    texts = [f"chunk {index}" for index in range(10)]
+    vectors = _embed(_pipeline("cohere.embed-english-v3", batch_size=5), texts)
+    assert vectors == [bedrock.vector(text) for text in texts]
+    assert bedrock.requests == 2
+
+def test_retries_throttled_requests_once_each(bedrock):
+    bedrock.throttle = 5
+    texts = [f"chunk {index}" for index in range(8)]
+    vectors = _embed(_pipeline(batch_size=2, max_concurrency=2), texts)
+    assert vectors == [bedrock.vector(text) for text in texts]
+    # Only the pipeline retries, the Bedrock client sends each attempt once
+    assert bedrock.requests == len(texts) + 5
+
+def test_gives_up_after_max_retries(bedrock):
+    bedrock.throttle = 100
+    with pytest.raises(ClientError) as error:
+        _embed(_pipeline(max_retries=2), ["chunk"])
+    assert error.value.response["Error"]["Code"] == "ThrottlingException"
+    assert bedrock.requests == 3
+
+def test_does_not_retry_other_errors(bedrock):
+    bedrock.error = "ValidationException"
+    with pytest.raises(ClientError):
+        _embed(_pipeline(), ["chunk"])
+    assert bedrock.requests == 1
+
+def test_pipelines_share_the_concurrency_bound(bedrock, monkeypatch):
+    monkeypatch.setattr(pipeline, "_executors", {})
+    bedrock.delay = 0.02
+    texts = [f"chunk {index}" for index in range(12)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: _embed(_pipeline(max_concurrency=2), texts), range(4)))
+    assert all(vectors == [bedrock.vector(text) for text in texts] for vectors in results)
+    assert bedrock.max_in_flight <= 2
@@ -0,0 +1,68 @@
+from langchain_core.documents import Document
+from ragctl.lexical import bm25
+from ragctl.lexical.bm25 import BM25IndexWriter, load_index, search, tokenize
+from ragctl.query_document.query import fuse_rankings
+
+def _index(tmp_path, document_id: str, chunks: list) -> bm25.BM25Index:
+    writer = BM25IndexWriter(document_id)
+    for chunk_index, text in enumerate(chunks):
+        writer.add(chunk_index, text)
+    path = bm25.get_index_path(tmp_path, document_id)
+    writer.write(path)
+    return load_index(path)
+
+def test_tokenize_drops_punctuation():
+    assert tokenize("Storage , quotas ( GB ) 42 .") == ["storage", "quotas", "gb", "42"]
+
+def test_index_round_trips(tmp_path):
+    index = _index(tmp_path, "abcd", ["storage quotas", "network storage storage"])
+    assert index.document_id == "abcd"
+    assert index.lengths == [2, 3]
+    assert index.postings["storage"] == [0, 1, 1, 2]
+    assert load_index(tmp_path / "missing.json.gz") is None
+
+def test_ranks_chunks_by_bm25(tmp_path):
+    index = _index(tmp_path, "abcd", ["billing invoices", "storage quotas limits", "storage", "network routes"])
+    hits = search([index], tokenize("storage quotas"), k=3)
+    assert [hit.chunk_index for hit in hits] == [1, 2]
+    assert hits[0].score > hits[1].score
+
+def test_rare_terms_weigh_more(tmp_path):
+    index = _index(tmp_path, "abcd", ["storage common", "storage common", "storage rare", "common"])
+    assert search([index], ["common", "rare"], k=1)[0].chunk_index == 2
+
+def test_scores_documents_as_one_corpus(tmp_path):
+    first = _index(tmp_path, "aaaa", ["storage quotas", "billing"])
+    second = _index(tmp_path, "bbbb", ["storage", "network", "routes"])
+    hits = search([first, second], ["storage", "quotas"], k=5)
+    assert [(hit.document_id, hit.chunk_index) for hit in hits] == [("aaaa", 0), ("bbbb", 0)]
+    assert search([first, second], [], k=5) == []
+
+def test_skipped_chunks_are_not_counted(tmp_path):
+    chunks = {0: "storage quotas", 1: "billing invoices", 2: "network routes"}
+    full = _index(tmp_path, "aaaa", list(chunks.values()))
+    # Chunks 1 and 3 to 9 were dropped as near-duplicates and never added
+    writer = BM25IndexWriter("bbbb")
+    writer.add(0, chunks[0])
+    writer.add(2, chunks[2])
+    writer.add(10, chunks[1])
+    writer.write(bm25.get_index_path(tmp_path, "bbbb"))
+    skipped = load_index(bm25.get_index_path(tmp_path, "bbbb"))
+    assert (full.chunk_count, skipped.chunk_count) == (3, 3)
+    assert len(skipped.lengths) == 11
+    assert search([skipped], ["storage"], k=1)[0].score == search([full], ["storage"], k=1)[0].score
+
+def _chunk(document_id: str, chunk_index: int) -> Document:
+    return Document(page_content=f"{document_id}-{chunk_index}",
+                    metadata={"document_id": document_id, "chunk_index": chunk_index})
+
+def test_reciprocal_rank_fusion():
+    vector = [_chunk("a", 0), _chunk("a", 1), _chunk("b", 0)]
+    lexical = [_chunk("a", 1), _chunk("c", 0), _chunk("b", 0)]
+    fused = fuse_rankings([vector, lexical], k=3)
+    # Chunks found by both retrievers come first, then the best ranked of the others
+    assert [chunk.page_content for chunk in fused] == ["a-1", "b-0", "a-0"]
+
+def test_fusion_of_one_ranking_keeps_its_order():
+    ranking = [_chunk("a", index) for index in range(4)]
+    assert fuse_rankings([ranking], k=2) == ranking[:2]
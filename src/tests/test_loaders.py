@@ -0,0 +1,78 @@
+import pytest
+from ragctl.document_process import loaders
+from ragctl.document_process.loaders import group_records, load_csv, load_html, load_xlsx
+
+def test_groups_records_into_pages_of_whole_records():
+    records = [(number, f"record {number} " + "x" * 20) for number in range(1, 11)]
+    pages = list(group_records(records, {"source": "table"}, size=100))
+    assert "\n".join(page.page_content for page in pages) == "\n".join(text for _, text in records)
+    assert all(len(page.page_content) <= 100 for page in pages)
+    assert [page.metadata["row"] for page in pages] == [1, 4, 7, 10]
+    assert pages[0].metadata["source"] == "table"
+
+def test_record_larger_than_a_page_makes_its_own_page():
+    pages = list(group_records([(1, "short"), (2, "x" * 50), (3, "short")], {}, size=20))
+    assert [page.page_content for page in pages] == ["short", "x" * 50, "short"]
+
+def test_csv_records_are_labelled_with_the_header(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text("name;city;age\n\nAda;London;36\nAlan;;41\n", encoding="utf-8")
+    pages = list(load_csv(str(path), size=500))
+    assert [page.page_content for page in pages] == ["name: Ada; city: London; age: 36\nname: Alan; age: 41"]
+    assert pages[0].metadata["row"] == 3
+
+def test_csv_with_a_header_alone(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text("name,city\n", encoding="utf-8")
+    assert [page.page_content for page in load_csv(str(path), size=500)] == ["name; city"]
+
+def test_csv_encodings(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_bytes("name,city\nZoë,Málaga\n".encode("cp1252"))
+    assert [page.page_content for page in load_csv(str(path), size=500)] == ["name: Zoë; city: Málaga"]
+    path.write_bytes("name,city\nZoë,Málaga\n".encode("utf-8-sig"))
+    assert [page.page_content for page in load_csv(str(path), size=500)] == ["name: Zoë; city: Málaga"]
+
+def test_csv_bytes_that_do_not_decode_are_replaced(tmp_path, monkeypatch):
+    monkeypatch.setattr(loaders, "CSV_SNIFF_SIZE", 16)
+    path = tmp_path / "table.csv"
+    path.write_bytes(b"name,city\nAda,London\nZo\xeb,M\xe1laga\n")
+    pages = list(load_csv(str(path), size=500))
+    assert pages[0].page_content == "name: Ada; city: London\nname: Zo\ufffd; city: M\ufffdlaga"
+
+def test_xlsx_sheets_are_loaded_one_after_the_other(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "People"
+    workbook.active.append(["name", "score"])
+    workbook.active.append(["Ada", 3.0])
+    places = workbook.create_sheet("Places")
+    places.append(["city"])
+    places.append(["London"])
+    path = tmp_path / "book.xlsx"
+    workbook.save(path)
+    pages = list(load_xlsx(str(path), size=500))
+    assert [(page.metadata["sheet"], page.page_content) for page in pages] == [
+        ("People", "name: Ada; score: 3"), ("Places", "city: London")]
+
+def test_html_text_without_scripts(tmp_path):
+    path = tmp_path / "page.html"
+    path.write_text("<html><head><title>Title</title><script>var x = 1;</script></head><body>"
+                    "<h1>Heading</h1><p>First &amp; <b>bold</b> paragraph.</p>"
+                    "<table><tr><th>name</th><th>city</th></tr><tr><td>Ada</td><td>London</td></tr></table>"
+                    "</body></html>", encoding="utf-8")
+    pages = list(load_html(str(path)))
+    assert [page.page_content for page in pages] == [
+        "Title\n\nHeading\n\nFirst & bold paragraph.\n\nname | city\n\nAda | London"]
+
+def test_html_is_streamed_in_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(loaders, "HTML_READ_SIZE", 64)
+    monkeypatch.setattr(loaders, "HTML_PAGE_SIZE", 200)
+    path = tmp_path / "page.html"
+    paragraphs = [f"Paragraph {index} of the page with a few more words." for index in range(20)]
+    path.write_text("<body>" + "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs) + "</body>",
+                    encoding="utf-8")
+    pages = list(load_html(str(path)))
+    assert len(pages) > 1
+    assert [page.metadata["page"] for page in pages] == list(range(len(pages)))
+    assert "\n\n".join(page.page_content for page in pages) == "\n\n".join(paragraphs)
@@ -0,0 +1,90 @@
+import pytest
+from ragctl.benchmark.chunking import synthetic_pages
+from ragctl.chunking.splitters import (
+    LEGACY_CHUNKING, CharacterSplitter, ChunkingSpec, SentenceSplitter, TokenSplitter, get_chunking,
+    get_splitter, parse_spec
+)
+
+PAGES = synthetic_pages(5, page_kb=2)
+
+def test_spec_round_trips_through_the_catalog():
+    spec = ChunkingSpec("sentence", 400, 40)
+    assert parse_spec(str(spec)) == spec
+    assert parse_spec(None) == LEGACY_CHUNKING
+
+def test_configured_chunking(ragctl_config):
+    assert get_chunking() == ChunkingSpec("recursive", 500, 80)
+    ragctl_config("Chunking", strategy="character", chunk_size=300, chunk_overlap=30)
+    assert get_chunking() == ChunkingSpec("character", 300, 30)
+    assert get_chunking("sentence") == ChunkingSpec("sentence", 300, 30)
+
+def test_rejects_bad_chunking(ragctl_config):
+    with pytest.raises(ValueError):
+        get_chunking("paragraph")
+    ragctl_config("Chunking", chunk_size=100, chunk_overlap=100)
+    with pytest.raises(ValueError):
+        get_chunking()
+
+@pytest.mark.parametrize("strategy", ["recursive", "character", "sentence"])
+def test_chunks_fit_the_chunk_size(strategy):
+    splitter = get_splitter(ChunkingSpec(strategy, 200, 0))
+    for page in PAGES:
+        chunks = splitter.split_text(page)
+        assert chunks
+        assert max(map(len, chunks)) <= 200
+
+def test_character_chunks_keep_words_whole():
+    page = PAGES[0]
+    words = set(page.split())
+    for chunk in CharacterSplitter(120, 20).split_text(page):
+        assert set(chunk.split()) <= words
+
+def test_character_chunks_overlap():
+    chunks = CharacterSplitter(50, 20).split_text(" ".join(f"word{index}" for index in range(40)))
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split()[0] in previous.split()
+
+def test_sentence_chunks_end_at_sentences_and_keep_paragraphs():
+    text = "One short sentence. Another one here.\n\nA new paragraph starts. It ends here."
+    assert SentenceSplitter(60, 0).split_text(text) == [
+        "One short sentence. Another one here.",
+        "A new paragraph starts. It ends here.",
+    ]
+    assert SentenceSplitter(200, 0).split_text(text) == [
+        "One short sentence. Another one here.\n\nA new paragraph starts. It ends here."]
+
+def test_sentence_chunks_carry_the_last_sentences_as_overlap():
+    text = " ".join(f"Sentence number {index} is here." for index in range(6))
+    chunks = SentenceSplitter(70, 30).split_text(text)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.endswith(chunk.split(". ")[0] + ".")
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(100, 60), (200, 80), (500, 80)])
+def test_sentence_chunks_with_overlap_fit_the_chunk_size(chunk_size, chunk_overlap):
+    splitter = SentenceSplitter(chunk_size, chunk_overlap)
+    for page in synthetic_pages(20, page_kb=2, seed=1):
+        assert max(map(len, splitter.split_text(page))) <= chunk_size
+
+def test_long_sentences_are_split_by_words():
+    sentence = " ".join(["word"] * 100) + "."
+    chunks = SentenceSplitter(50, 0).split_text(sentence)
+    assert len(chunks) > 1
+    assert max(map(len, chunks)) <= 50
+
+@pytest.fixture
+def tokenizer_path(tmp_path):
+    tokenizers = pytest.importorskip("tokenizers")
+    vocabulary = {"[UNK]": 0, **{word: index + 1 for index, word in enumerate(sorted(set(" ".join(PAGES).split())))}}
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocabulary, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.WhitespaceSplit()
+    path = tmp_path / "tokenizer.json"
+    tokenizer.save(str(path))
+    return str(path)
+
+def test_token_chunks_fit_the_token_size(tokenizer_path):
+    splitter = TokenSplitter(16, 4, tokenizer_path)
+    chunks = splitter.split_text(PAGES[0])
+    assert max(map(splitter.length, chunks)) <= 16
+    # Consecutive chunks share the overlap tokens
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.split()[-4:] == chunk.split()[:4]
@@ -0,0 +1,14 @@
+from pathlib import Path
+import os
+from ragctl.benchmark.startup import DEFAULT_BUDGET_MS, check_startup
+
+# Three times the benchmark budget by default, so a loaded CI machine does not fail the suite
+BUDGET_MS = float(os.environ.get("RAGCTL_STARTUP_BUDGET_MS", 3 * DEFAULT_BUDGET_MS))
+
+def test_list_starts_without_heavy_modules(monkeypatch):
+    # The probes run in fresh interpreters, which import ragctl from the source tree too
+    source = str(Path(__file__).resolve().parent.parent)
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(filter(None, [source, os.environ.get("PYTHONPATH")])))
+    result = check_startup(BUDGET_MS, runs=3)
+    assert result.heavy_modules == []
+    assert result.passed, f"ragctl list imports in {result.import_ms:.0f} ms, over the {BUDGET_MS:.0f} ms budget"
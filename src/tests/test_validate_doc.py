@@ -0,0 +1,31 @@
+import pytest
+from ragctl.helper.validate_doc import ValidateDocumentFormat
+
+def _detect(path) -> tuple:
+    detected = ValidateDocumentFormat(str(path)).detect()
+    return detected.format, detected.metadata
+
+def test_pdf_page_count(tmp_path):
+    PyPDF2 = pytest.importorskip("PyPDF2")
+    writer = PyPDF2.PdfWriter()
+    for _ in range(12):
+        writer.add_blank_page(100, 100)
+    path = tmp_path / "document.pdf"
+    with open(path, "wb") as file:
+        writer.write(file)
+    assert _detect(path) == ("PDF", {"pages": 12})
+
+def test_corrupt_pdf_is_unknown(tmp_path):
+    path = tmp_path / "document.pdf"
+    path.write_bytes(b"%PDF-1.7\nnot a pdf")
+    assert _detect(path)[0] == "UNKNOWN"
+
+@pytest.mark.parametrize("name,content,expected", [
+    ("notes.txt", "Plain text notes.", ("TXT", {})),
+    ("page.html", "<!DOCTYPE html><html><body>Hi</body></html>", ("HTML", {})),
+    ("table.csv", "name,city,age\nAda,London,36\n", ("CSV", {"columns": 3})),
+])
+def test_text_formats(tmp_path, name, content, expected):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    assert _detect(path) == expected